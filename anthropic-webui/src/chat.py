@@ -1,6 +1,7 @@
 import time
 import uuid
 from collections.abc import AsyncIterator, Iterable
+from json.encoder import encode_basestring
 
 from anthropic import AsyncAnthropic
 from anthropic.types import (
@@ -95,6 +96,43 @@ async def create_chat_completion(
     return completion
 
 
+class ChunkEncoder:
+    """Encodes the text deltas of a stream as server-sent chat completion chunks.
+
+    All chunks of a stream share one id and creation time, as in OpenAI's API.
+    The event is serialized once with a placeholder delta, so encoding a delta
+    only escapes its text instead of building and serializing a pydantic model
+    per token.
+    """
+
+    # Serialized as `"\u0000"`, which no JSON encoding of other fields contains
+    _PLACEHOLDER = "\0"
+
+    def __init__(
+        self, model: str, id: str | None = None, created: int | None = None
+    ) -> None:
+        self.id = id or f"msg-{uuid.uuid4()}"
+        self.created = int(time.time()) if created is None else created
+        self.model = model
+
+        template = self._event(ChoiceDelta(content=self._PLACEHOLDER))
+        self._prefix, self._suffix = template.split('"\\u0000"')
+        self.stop = self._event(ChoiceDelta(), finish_reason="stop")
+
+    def _event(self, delta: ChoiceDelta, finish_reason: str | None = None) -> str:
+        chunk = ChatCompletionChunk(
+            id=self.id,
+            choices=[Choice(index=0, delta=delta, finish_reason=finish_reason)],
+            created=self.created,
+            model=self.model,
+            object="chat.completion.chunk",
+        )
+        return f"data: {chunk.model_dump_json()}\n\n"
+
+    def delta(self, text: str) -> str:
+        return self._prefix + encode_basestring(text) + self._suffix
+
+
 async def create_chat_completion_stream(
     client: AsyncAnthropic,
     model: str,
@@ -106,24 +144,11 @@ async def create_chat_completion_stream(
             messages=get_anthropic_messages(messages),
             model=model,
         ) as stream:
+            encoder = ChunkEncoder(model)
             async for text in stream.text_stream:
-                chunk = ChatCompletionChunk(
-                    id=f"msg-{uuid.uuid4()}",
-                    choices=[Choice(index=0, delta=ChoiceDelta(content=text))],
-                    created=int(time.time()),
-                    model=model,
-                    object="chat.completion.chunk",
-                )
-                yield f"data: {chunk.model_dump_json()}\n\n"
+                yield encoder.delta(text)
 
             # Send a final chunk to indicate the stream has ended
-            chunk = ChatCompletionChunk(
-                id=f"msg-{uuid.uuid4()}",
-                choices=[Choice(index=0, delta=ChoiceDelta(), finish_reason="stop")],
-                created=int(time.time()),
-                model=model,
-                object="chat.completion.chunk",
-            )
-            yield f"data: {chunk.model_dump_json()}\n\n"
+            yield encoder.stop
 
     return stream_content()
@@ -0,0 +1,65 @@
+import time
+import uuid
+from collections.abc import Callable
+from typing import Any
+
+from absl import app, flags
+from openai.types.chat import ChatCompletionChunk
+from openai.types.chat.chat_completion_chunk import Choice, ChoiceDelta
+
+from src.chat import ChunkEncoder
+
+FLAGS = flags.FLAGS
+flags.DEFINE_integer("num_tokens", 200_000, "Number of text deltas to encode")
+flags.DEFINE_integer("repeats", 3, "Runs per encoder. The fastest is reported")
+
+MODEL = "claude-3-5-sonnet-20240620"
+# Typical streamed deltas: short words, punctuation, whitespace and code
+DELTAS = [" the", " model", ",", "\n", " `x`", ' "quoted"', " café", "\t{", "}"]
+
+
+def encode_pydantic(texts: list[str]) -> list[str]:
+    # The previous implementation: a new chunk model per delta
+    events = []
+    for text in texts:
+        chunk = ChatCompletionChunk(
+            id=f"msg-{uuid.uuid4()}",
+            choices=[Choice(index=0, delta=ChoiceDelta(content=text))],
+            created=int(time.time()),
+            model=MODEL,
+            object="chat.completion.chunk",
+        )
+        events.append(f"data: {chunk.model_dump_json()}\n\n")
+    return events
+
+
+def encode_template(texts: list[str]) -> list[str]:
+    encoder = ChunkEncoder(MODEL)
+    return [encoder.delta(text) for text in texts]
+
+
+def tokens_per_second(
+    encode: Callable[[list[str]], list[str]], texts: list[str]
+) -> float:
+    fastest = float("inf")
+    for _ in range(FLAGS.repeats):
+        start = time.process_time()
+        encode(texts)
+        fastest = min(fastest, time.process_time() - start)
+    return len(texts) / fastest
+
+
+def main(argv: Any) -> None:
+    del argv  # Unused
+
+    texts = [DELTAS[i % len(DELTAS)] for i in range(FLAGS.num_tokens)]
+    baseline = tokens_per_second(encode_pydantic, texts)
+    template = tokens_per_second(encode_template, texts)
+    print(f"{'encoder':<10} {'tokens/s per core':>18}")
+    print(f"{'pydantic':<10} {baseline:>18,.0f}")
+    print(f"{'template':<10} {template:>18,.0f}")
+    print(f"speedup: {template / baseline:.1f}x")
+
+
+if __name__ == "__main__":
+    app.run(main)
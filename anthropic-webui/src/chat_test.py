@@ -9,9 +9,11 @@ from anthropic.types import (
     TextBlockParam,
 )
 from anthropic.types.image_block_param import Source
-from openai.types.chat import ChatCompletionUserMessageParam
+from openai.types.chat import ChatCompletionChunk, ChatCompletionUserMessageParam
+from openai.types.chat.chat_completion_chunk import Choice, ChoiceDelta
 
 from src.chat import (
+    ChunkEncoder,
     create_chat_completion,
     create_chat_completion_stream,
     get_anthropic_image_source,
@@ -178,3 +180,30 @@ async def test_create_chat_completion_stream(mock_anthropic: AsyncMock) -> None:
     # Check the final chunk
     final_chunk = json.loads(chunks[-1].split("data: ")[1])
     assert final_chunk["choices"][0]["finish_reason"] == "stop"
+
+    # All chunks of a stream share its id and creation time
+    chunks_data = [json.loads(chunk.split("data: ")[1]) for chunk in chunks]
+    assert len({(c["id"], c["created"]) for c in chunks_data}) == 1
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["Test", "", 'say "hi"\n\t\\', "caf\u00e9 \U0001f600", "\x00\x1f\u2028"],
+)
+def test_chunk_encoder_matches_pydantic(text: str) -> None:
+    encoder = ChunkEncoder(model="claude-3-5-sonnet-20240620", id="msg-1", created=1)
+    expected = ChatCompletionChunk(
+        id="msg-1",
+        choices=[Choice(index=0, delta=ChoiceDelta(content=text))],
+        created=1,
+        model="claude-3-5-sonnet-20240620",
+        object="chat.completion.chunk",
+    )
+
+    event = encoder.delta(text)
+
+    assert event.startswith("data: ")
+    assert event.endswith("\n\n")
+    assert json.loads(event.removeprefix("data: ")) == json.loads(
+        expected.model_dump_json()
+    )
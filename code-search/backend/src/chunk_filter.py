@@ -0,0 +1,80 @@
+import functools
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+from qdrant_client.http import models
+
+
+@dataclass(frozen=True)
+class ChunkFilter:
+    """Restricts a search to code chunks of a module, kind of symbol or directory.
+
+    Pushed down into Qdrant as a filter on indexed payload fields, and applied
+    to the in-process indexes as a mask over their chunks.
+    """
+
+    # Rust module path such as `collection::operations::types`
+    module: str | None = None
+    # Kind of the symbol a chunk defines such as `function` or `struct`
+    code_type: str | None = None
+    # Directory such as `lib/segment`, matched by whole path components
+    path_prefix: str | None = None
+
+    def __post_init__(self) -> None:
+        if self.path_prefix is not None:
+            object.__setattr__(self, "path_prefix", self.path_prefix.strip("/") or None)
+
+    def __bool__(self) -> bool:
+        return any([self.module, self.code_type, self.path_prefix])
+
+    def to_qdrant(self) -> models.Filter | None:
+        if not self:
+            return None
+        conditions = [
+            models.FieldCondition(key=key, match=models.MatchValue(value=value))
+            for key, value in [
+                ("module", self.module),
+                ("code_type", self.code_type),
+                ("path_prefixes", self.path_prefix),
+            ]
+            if value
+        ]
+        return models.Filter(must=conditions)
+
+
+class FilterMasks:
+    """Masks of the chunks matching a filter, for indexes stored column-wise.
+
+    Masks are computed with one pass over the chunks and cached, as
+    clients filter by a few directories and modules.
+    """
+
+    def __init__(self, columns: dict[str, list[Any]], cache_size: int = 256) -> None:
+        self.columns = columns
+        self.num_docs = len(columns["file_path"])
+        self.mask = functools.lru_cache(maxsize=cache_size)(self._mask)
+
+    def _mask(self, where: ChunkFilter) -> np.ndarray:
+        mask = np.ones(self.num_docs, dtype=bool)
+        for field, value, match in [
+            ("module", where.module, str.__eq__),
+            ("code_type", where.code_type, str.__eq__),
+            (
+                "file_path",
+                where.path_prefix and where.path_prefix + "/",
+                str.startswith,
+            ),
+        ]:
+            if not value:
+                continue
+            # Indexes built before symbol metadata existed match nothing
+            column = self.columns.get(field) or [None] * self.num_docs
+            mask &= np.fromiter(
+                (x is not None and match(x, value) for x in column),
+                dtype=bool,
+                count=self.num_docs,
+            )
+        # Shared by every search with the same filter
+        mask.setflags(write=False)
+        return mask
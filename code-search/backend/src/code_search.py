@@ -1,7 +1,22 @@
+import asyncio
+from collections.abc import AsyncIterator
 from typing import Any
 
 from openai import AsyncOpenAI
 from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+
+from src.chunk_filter import ChunkFilter
+from src.lexical_search import (
+    LexicalHit,
+    LexicalIndex,
+    is_identifier_query,
+    reciprocal_rank_fusion,
+)
+from src.metrics import LEXICAL_ANSWERS, QUERY_CACHE_LOOKUPS, timed
+from src.query_cache import QueryEmbeddingCache, normalize_query
+from src.query_embedder import QueryEmbedder
+from src.vector_index import VectorHit, VectorIndex
 
 
 class CodeSearcher:
@@ -10,48 +25,367 @@ class CodeSearcher:
         qdrant: AsyncQdrantClient,
         openai: AsyncOpenAI,
         embedding_model: str = "text-embedding-3-small",
+        cache: QueryEmbeddingCache | None = None,
+        embedder: QueryEmbedder | None = None,
+        lexical: LexicalIndex | None = None,
+        vectors: VectorIndex | None = None,
+        embedding_dim: int | None = None,
     ):
         self.qdrant = qdrant
         self.openai = openai
         self.embedding_model = embedding_model
+        self.cache = cache
+        self.embedder = embedder or QueryEmbedder(openai, model=embedding_model)
+        self.lexical = lexical
+        self.vectors = vectors
+        # Collections indexed with truncated embeddings are searched with
+        # query embeddings truncated the same way
+        self.embedding_dim = embedding_dim
+
+    async def embed(self, query: str) -> list[float]:
+        """Embeds the query, skipping the OpenAI round-trip on cache hits."""
+        return (await self.embed_many([query]))[0]
+
+    async def embed_many(self, queries: list[str]) -> list[list[float]]:
+        """Embeds queries, sending all cache misses in as few requests as possible."""
+        queries = [normalize_query(query) for query in queries]
+        embeddings: list[list[float] | None] = [None] * len(queries)
+        if self.cache is not None:
+            embeddings = [self.cache.get(self.embedding_model, q) for q in queries]
+
+        misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if self.cache is not None:
+            QUERY_CACHE_LOOKUPS.labels("hit").inc(len(queries) - len(misses))
+            QUERY_CACHE_LOOKUPS.labels("miss").inc(len(misses))
+        if not misses:
+            return embeddings
+
+        # Queued together, so the embedder batches them into one request
+        with timed("embed"):
+            missed = await asyncio.gather(
+                *(self.embedder.embed(queries[i]) for i in misses)
+            )
+        for i, embedding in zip(misses, missed):
+            embeddings[i] = embedding
+            if self.cache is not None:
+                self.cache.put(self.embedding_model, queries[i], embedding)
+        return embeddings
 
     async def search(
-        self, query: str, collection_name: str, limit: int = 5
+        self,
+        query: str,
+        collection_name: str,
+        limit: int = 5,
+        hnsw_ef: int | None = None,
+        oversampling: float | None = None,
+        where: ChunkFilter | None = None,
     ) -> list[dict[str, Any]]:
-        embedding_response = await self.openai.embeddings.create(
-            input=query, model=self.embedding_model
+        """Searches code snippets semantically similar to the query.
+
+        `hnsw_ef` trades latency for recall of the HNSW search. On quantized
+        collections, `oversampling` fetches that many times `limit` candidates
+        with the quantized vectors before rescoring them with the originals.
+
+        With a lexical index, identifier-like queries found verbatim in the code
+        are answered from it without embedding the query. Other queries merge
+        the lexical and vector results by reciprocal rank fusion.
+
+        With an in-process vector index, it is searched exactly instead of
+        Qdrant and `collection_name`, `hnsw_ef` and `oversampling` are ignored.
+
+        `where` restricts every search to the chunks matching the filter.
+        """
+        lexical_hits = await self.lexical_search(query, collection_name, limit, where)
+        if is_lexical_answer(query, lexical_hits):
+            LEXICAL_ANSWERS.inc()
+            return self.lexical_results(lexical_hits)
+
+        vector_results = await self.vector_search(
+            query, collection_name, limit, hnsw_ef, oversampling, where
         )
-        embedding = embedding_response.data[0].embedding
+        return self.fuse(vector_results, lexical_hits, limit)
+
+    async def search_stream(
+        self,
+        query: str,
+        collection_name: str,
+        limit: int = 5,
+        hnsw_ef: int | None = None,
+        oversampling: float | None = None,
+        where: ChunkFilter | None = None,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Searches like `search`, yielding results as soon as they are known.
+
+        Lexical matches, which need neither the embedding nor the vector
+        search, are yielded first as `{"stage": "lexical", "result": [...]}`.
+        The last event is always `{"stage": "final", "result": [...]}` with the
+        same results as `search`, superseding any earlier ones.
+        """
+        lexical_hits = await self.lexical_search(query, collection_name, limit, where)
+        if lexical_hits:
+            lexical_results = self.lexical_results(lexical_hits)
+            if is_lexical_answer(query, lexical_hits):
+                LEXICAL_ANSWERS.inc()
+                yield {"stage": "final", "result": lexical_results}
+                return
+            yield {"stage": "lexical", "result": lexical_results}
 
-        points = await self.qdrant.search(
-            collection_name=collection_name,
-            query_vector=embedding,
-            limit=limit,
-            with_payload=True,
+        vector_results = await self.vector_search(
+            query, collection_name, limit, hnsw_ef, oversampling, where
         )
+        yield {
+            "stage": "final",
+            "result": self.fuse(vector_results, lexical_hits, limit),
+        }
 
-        results = []
-        for point in points:
-            payload = point.payload
-            if point.payload is None:
-                continue
-            results.append(
-                {
-                    # "code_type": None,
-                    "context": {
-                        "file_name": payload["file_name"],
-                        "file_path": payload["file_path"],
-                        # "module": None,
-                        "snippet": payload["text"],
-                        # "struct_name": None,
-                    },
-                    # "docstring": None,
-                    # "line": None,
-                    "line_from": payload["start_line"],
-                    "line_to": payload["end_line"],
-                    # "name": None,
-                    # "signature": None,
-                }
+    async def vector_search(
+        self,
+        query: str,
+        collection_name: str,
+        limit: int,
+        hnsw_ef: int | None,
+        oversampling: float | None,
+        where: ChunkFilter | None,
+    ) -> list[dict[str, Any]]:
+        embedding = (await self.embed(query))[: self.embedding_dim]
+
+        if self.vectors is not None:
+            # Off the event loop, as the scan takes milliseconds on large corpora
+            with timed("vector_search"):
+                hits = await asyncio.to_thread(
+                    self.vectors.search, embedding, limit, where
+                )
+            return self.vector_results(hits)
+
+        with timed("vector_search", upstream="qdrant"):
+            points = await self.qdrant.search(
+                collection_name=collection_name,
+                query_vector=embedding,
+                query_filter=where.to_qdrant() if where else None,
+                limit=limit,
+                with_payload=True,
+                search_params=search_params(hnsw_ef, oversampling),
             )
+        return format_results(points)
 
+    async def search_batch(
+        self,
+        queries: list[str],
+        collection_name: str,
+        limit: int = 5,
+        hnsw_ef: int | None = None,
+        oversampling: float | None = None,
+        where: ChunkFilter | None = None,
+    ) -> list[list[dict[str, Any]]]:
+        """Searches many queries with one embeddings request and one vector search.
+
+        Returns the results of every query in order, as `search` would.
+        """
+        results: list[list[dict[str, Any]]] = [[] for _ in queries]
+        lexical_hits = await asyncio.gather(
+            *(
+                self.lexical_search(query, collection_name, limit, where)
+                for query in queries
+            )
+        )
+        pending = []
+        for i, (query, hits) in enumerate(zip(queries, lexical_hits)):
+            if is_lexical_answer(query, hits):
+                LEXICAL_ANSWERS.inc()
+                results[i] = self.lexical_results(hits)
+            else:
+                pending.append(i)
+        if not pending:
+            return results
+
+        embeddings = [
+            embedding[: self.embedding_dim]
+            for embedding in await self.embed_many([queries[i] for i in pending])
+        ]
+        if self.vectors is not None:
+            with timed("vector_search"):
+                batch = await asyncio.to_thread(
+                    self.vectors.search_batch, embeddings, limit, where
+                )
+            for i, hits in zip(pending, batch):
+                results[i] = self.fuse(
+                    self.vector_results(hits), lexical_hits[i], limit
+                )
+            return results
+
+        params = search_params(hnsw_ef, oversampling)
+        query_filter = where.to_qdrant() if where else None
+        with timed("vector_search", upstream="qdrant"):
+            batch = await self.qdrant.search_batch(
+                collection_name=collection_name,
+                requests=[
+                    models.SearchRequest(
+                        vector=embedding,
+                        filter=query_filter,
+                        limit=limit,
+                        with_payload=True,
+                        params=params,
+                    )
+                    for embedding in embeddings
+                ],
+            )
+        for i, points in zip(pending, batch):
+            results[i] = self.fuse(format_results(points), lexical_hits[i], limit)
         return results
+
+    async def lexical_search(
+        self,
+        query: str,
+        collection_name: str,
+        limit: int,
+        where: ChunkFilter | None = None,
+    ) -> list[LexicalHit]:
+        """Lexical matches of the query, with the payloads of their chunks.
+
+        The lexical index does not hold the text of the chunks. It is read from
+        the in-process vector index if there is one, or else from Qdrant, to
+        check which candidates contain the query verbatim and to return it.
+        """
+        if self.lexical is None:
+            return []
+        with timed("lexical"):
+            matches = self.lexical.search(query, limit, where)
+        exact = await self.exact_matches(
+            query.strip(), collection_name, matches.candidates, limit
+        )
+        hits = matches.hits([d for d in matches.candidates if d in exact], limit)
+        texts = exact | await self.chunk_texts(
+            collection_name, [hit.doc_id for hit in hits if hit.doc_id not in exact]
+        )
+        # Chunks deleted since the lexical index was written have no text
+        hits = [hit for hit in hits if hit.doc_id in texts]
+        for hit in hits:
+            hit.payload = {
+                **self.lexical.payload(hit.doc_id),
+                "text": texts[hit.doc_id],
+            }
+        return hits
+
+    async def exact_matches(
+        self, query: str, collection_name: str, candidates: list[int], limit: int
+    ) -> dict[int, str]:
+        """Texts of at most `limit` candidate chunks containing `query` verbatim."""
+        if not candidates:
+            return {}
+        if self.vectors is not None:
+            texts = {}
+            with timed("lexical"):
+                for doc_id in candidates:
+                    text = self.vector_text(doc_id)
+                    if text is not None and query in text:
+                        texts[doc_id] = text
+                        if len(texts) == limit:
+                            break
+            return texts
+
+        doc_ids = {self.lexical.point_id(doc_id): doc_id for doc_id in candidates}
+        with timed("lexical_text", upstream="qdrant"):
+            points, _ = await self.qdrant.scroll(
+                collection_name=collection_name,
+                # Without a full-text index on `text`, Qdrant matches substrings
+                scroll_filter=models.Filter(
+                    must=[
+                        models.HasIdCondition(has_id=list(doc_ids)),
+                        models.FieldCondition(
+                            key="text", match=models.MatchText(text=query)
+                        ),
+                    ]
+                ),
+                limit=limit,
+                with_payload=["text"],
+                with_vectors=False,
+            )
+        return {doc_ids[point.id]: point.payload["text"] for point in points}
+
+    async def chunk_texts(
+        self, collection_name: str, doc_ids: list[int]
+    ) -> dict[int, str]:
+        """Texts of lexical index chunks, from the vector index or else Qdrant."""
+        texts = {}
+        missing = {}
+        for doc_id in doc_ids:
+            text = self.vector_text(doc_id) if self.vectors is not None else None
+            if text is None:
+                missing[self.lexical.point_id(doc_id)] = doc_id
+            else:
+                texts[doc_id] = text
+        if missing:
+            with timed("lexical_text", upstream="qdrant"):
+                points = await self.qdrant.retrieve(
+                    collection_name=collection_name,
+                    ids=list(missing),
+                    with_payload=["text"],
+                    with_vectors=False,
+                )
+            texts.update({missing[point.id]: point.payload["text"] for point in points})
+        return texts
+
+    def vector_text(self, doc_id: int) -> str | None:
+        payload = self.lexical.payload(doc_id)
+        return self.vectors.text(
+            payload["file_path"], payload["start_line"], payload["end_line"]
+        )
+
+    def lexical_results(self, hits: list[LexicalHit]) -> list[dict[str, Any]]:
+        return [format_result(hit.payload) for hit in hits]
+
+    def vector_results(self, hits: list[VectorHit]) -> list[dict[str, Any]]:
+        return [format_result(self.vectors.payload(hit.doc_id)) for hit in hits]
+
+    def fuse(
+        self,
+        vector_results: list[dict[str, Any]],
+        lexical_hits: list[LexicalHit],
+        limit: int,
+    ) -> list[dict[str, Any]]:
+        if not lexical_hits:
+            return vector_results
+        with timed("fuse"):
+            return reciprocal_rank_fusion(
+                [vector_results, self.lexical_results(lexical_hits)], limit=limit
+            )
+
+
+def search_params(
+    hnsw_ef: int | None, oversampling: float | None
+) -> models.SearchParams:
+    return models.SearchParams(
+        hnsw_ef=hnsw_ef,
+        quantization=models.QuantizationSearchParams(
+            rescore=True, oversampling=oversampling
+        ),
+    )
+
+
+def is_lexical_answer(query: str, hits: list[LexicalHit]) -> bool:
+    # Symbol names found verbatim are better answered lexically
+    return bool(hits) and hits[0].exact and is_identifier_query(query)
+
+
+def format_result(payload: dict[str, Any]) -> dict[str, Any]:
+    # Chunks indexed before symbol metadata existed lack it
+    return {
+        "code_type": payload.get("code_type"),
+        "context": {
+            "file_name": payload["file_name"],
+            "file_path": payload["file_path"],
+            "module": payload.get("module"),
+            "snippet": payload["text"],
+            "struct_name": payload.get("struct_name"),
+        },
+        # "docstring": None,
+        # "line": None,
+        "line_from": payload["start_line"],
+        "line_to": payload["end_line"],
+        "name": payload.get("name"),
+        "signature": payload.get("signature"),
+    }
+
+
+def format_results(points: list[models.ScoredPoint]) -> list[dict[str, Any]]:
+    return [format_result(point.payload) for point in points if point.payload]
@@ -0,0 +1,414 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
+import pytest
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+
+from src.chunk_filter import ChunkFilter
+from src.code_search import CodeSearcher, search_params
+from src.lexical_search import LexicalIndex
+from src.query_cache import QueryEmbeddingCache
+from src.vector_index import VectorIndex
+
+
+def mock_openai() -> MagicMock:
+    openai = MagicMock()
+    openai.embeddings.create = AsyncMock(
+        return_value=MagicMock(data=[MagicMock(index=0, embedding=[0.1, 0.2])])
+    )
+    return openai
+
+
+LEXICAL_TEXT = "let map = HashMap::with_capacity(16);"
+
+
+def mock_qdrant() -> MagicMock:
+    qdrant = MagicMock()
+    # The chunk of `lexical_index`, whose text is read from Qdrant
+    chunk = MagicMock(id=0, payload={"text": LEXICAL_TEXT})
+    qdrant.scroll = AsyncMock(return_value=([chunk], None))
+    qdrant.retrieve = AsyncMock(return_value=[chunk])
+    qdrant.search = AsyncMock(
+        return_value=[
+            MagicMock(
+                payload={
+                    "file_name": "lib.rs",
+                    "file_path": "src/lib.rs",
+                    "text": "fn main() {}",
+                    "start_line": 1,
+                    "end_line": 2,
+                    "name": "main",
+                    "signature": "fn main()",
+                    "code_type": "function",
+                    "struct_name": None,
+                    "module": "crate",
+                }
+            )
+        ]
+    )
+    return qdrant
+
+
+@pytest.mark.asyncio
+async def test_search() -> None:
+    openai = mock_openai()
+    qdrant = mock_qdrant()
+    searcher = CodeSearcher(qdrant=qdrant, openai=openai)
+
+    result = await searcher.search(query="main", collection_name="qdrant-code")
+
+    assert result == [
+        {
+            "code_type": "function",
+            "context": {
+                "file_name": "lib.rs",
+                "file_path": "src/lib.rs",
+                "module": "crate",
+                "snippet": "fn main() {}",
+                "struct_name": None,
+            },
+            "line_from": 1,
+            "line_to": 2,
+            "name": "main",
+            "signature": "fn main()",
+        }
+    ]
+    assert qdrant.search.call_args.kwargs["query_vector"] == [0.1, 0.2]
+
+
+@pytest.mark.asyncio
+async def test_search_caches_query_embeddings() -> None:
+    openai = mock_openai()
+    cache = QueryEmbeddingCache()
+    searcher = CodeSearcher(qdrant=mock_qdrant(), openai=openai, cache=cache)
+
+    await searcher.search(query="geo filter", collection_name="qdrant-code")
+    await searcher.search(query=" geo  filter ", collection_name="qdrant-code")
+
+    openai.embeddings.create.assert_awaited_once_with(
+        input=["geo filter"], model="text-embedding-3-small"
+    )
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_search_params() -> None:
+    params = search_params(hnsw_ef=128, oversampling=2.0)
+
+    assert params.hnsw_ef == 128
+    assert params.quantization == models.QuantizationSearchParams(
+        rescore=True, oversampling=2.0
+    )
+    # Unset parameters fall back to Qdrant's defaults
+    assert search_params(hnsw_ef=None, oversampling=None).hnsw_ef is None
+
+
+@pytest.mark.asyncio
+async def test_search_passes_search_params() -> None:
+    qdrant = mock_qdrant()
+    searcher = CodeSearcher(qdrant=qdrant, openai=mock_openai())
+
+    await searcher.search(
+        query="main", collection_name="qdrant-code", hnsw_ef=64, oversampling=3.0
+    )
+
+    assert qdrant.search.call_args.kwargs["search_params"] == search_params(
+        hnsw_ef=64, oversampling=3.0
+    )
+
+
+@pytest.mark.asyncio
+async def test_search_batch() -> None:
+    openai = MagicMock()
+    openai.embeddings.create = AsyncMock(
+        return_value=MagicMock(
+            data=[MagicMock(index=i, embedding=[float(i)]) for i in range(2)]
+        )
+    )
+    qdrant = mock_qdrant()
+    qdrant.search_batch = AsyncMock(
+        return_value=[qdrant.search.return_value, [], []],
+    )
+    cache = QueryEmbeddingCache()
+    cache.put("text-embedding-3-small", "cached", [9.0])
+    searcher = CodeSearcher(qdrant=qdrant, openai=openai, cache=cache)
+
+    result = await searcher.search_batch(
+        queries=["main", "cached", "lib"], collection_name="qdrant-code", limit=3
+    )
+
+    # Cache misses are embedded in a single request
+    openai.embeddings.create.assert_awaited_once_with(
+        input=["main", "lib"], model="text-embedding-3-small"
+    )
+    requests = qdrant.search_batch.call_args.kwargs["requests"]
+    assert [request.vector for request in requests] == [[0.0], [9.0], [1.0]]
+    assert all(request.limit == 3 for request in requests)
+    assert result == [
+        await CodeSearcher(qdrant=mock_qdrant(), openai=mock_openai()).search(
+            query="main", collection_name="qdrant-code"
+        ),
+        [],
+        [],
+    ]
+
+
+def lexical_index() -> LexicalIndex:
+    return LexicalIndex(
+        ids=[0],
+        docs={
+            "file_path": ["src/cap.rs"],
+            "file_name": ["cap.rs"],
+            "start_line": [3],
+            "end_line": [4],
+        },
+        postings={token: [0] for token in ["src", "cap", "rs", "let", "map"]}
+        | {"hashmap": [0], "with_capacity": [0]},
+        token_pattern=r"[A-Za-z_][A-Za-z0-9_]*",
+    )
+
+
+@pytest.mark.asyncio
+async def test_search_identifier_skips_embedding() -> None:
+    openai = mock_openai()
+    qdrant = mock_qdrant()
+    searcher = CodeSearcher(qdrant=qdrant, openai=openai, lexical=lexical_index())
+
+    result = await searcher.search(
+        query="HashMap::with_capacity", collection_name="qdrant-code"
+    )
+
+    assert [r["context"]["file_path"] for r in result] == ["src/cap.rs"]
+    openai.embeddings.create.assert_not_awaited()
+    qdrant.search.assert_not_awaited()
+
+
+def two_chunk_index() -> LexicalIndex:
+    # Both chunks contain the identifiers of `HashMap::with_capacity`
+    return LexicalIndex(
+        ids=[1, 2],
+        docs={
+            "file_path": ["src/a.rs", "src/b.rs"],
+            "file_name": ["a.rs", "b.rs"],
+            "start_line": [1, 1],
+            "end_line": [2, 2],
+        },
+        postings={"hashmap": [0, 1], "with_capacity": [0, 1]},
+        token_pattern=r"[A-Za-z_][A-Za-z0-9_]*",
+    )
+
+
+@pytest.mark.asyncio
+async def test_search_checks_exact_matches_in_qdrant() -> None:
+    openai = mock_openai()
+    qdrant = AsyncQdrantClient(":memory:")
+    await qdrant.create_collection(
+        "qdrant-code",
+        vectors_config=models.VectorParams(size=2, distance=models.Distance.COSINE),
+    )
+    await qdrant.upsert(
+        "qdrant-code",
+        points=[
+            models.PointStruct(id=point_id, vector=[1.0, 0.0], payload={"text": text})
+            for point_id, text in [
+                (1, "// with_capacity of a HashMap"),
+                (2, "HashMap::with_capacity(8)"),
+            ]
+        ],
+    )
+    searcher = CodeSearcher(qdrant=qdrant, openai=openai, lexical=two_chunk_index())
+
+    result = await searcher.search(
+        query="HashMap::with_capacity", collection_name="qdrant-code"
+    )
+
+    assert [r["context"]["snippet"] for r in result] == [
+        "HashMap::with_capacity(8)",
+        "// with_capacity of a HashMap",
+    ]
+    openai.embeddings.create.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_search_checks_exact_matches_in_vector_index() -> None:
+    qdrant = mock_qdrant()
+    vectors = VectorIndex(
+        np.asarray([[0.0, 1.0], [1.0, 0.0]], dtype=np.float32),
+        payloads={
+            "file_path": ["src/b.rs", "src/a.rs"],
+            "file_name": ["b.rs", "a.rs"],
+            "start_line": [1, 1],
+            "end_line": [2, 2],
+            "text": ["HashMap::with_capacity(8)", "// with_capacity of a HashMap"],
+        },
+    )
+    searcher = CodeSearcher(
+        qdrant=qdrant, openai=mock_openai(), lexical=two_chunk_index(), vectors=vectors
+    )
+
+    hits = await searcher.lexical_search(
+        "HashMap::with_capacity", collection_name="qdrant-code", limit=5
+    )
+
+    assert [(hit.payload["file_path"], hit.exact) for hit in hits] == [
+        ("src/b.rs", True),
+        ("src/a.rs", False),
+    ]
+    qdrant.scroll.assert_not_awaited()
+    qdrant.retrieve.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_search_merges_lexical_and_vector_results() -> None:
+    openai = mock_openai()
+    searcher = CodeSearcher(
+        qdrant=mock_qdrant(), openai=openai, lexical=lexical_index()
+    )
+
+    result = await searcher.search(
+        query="map with capacity", collection_name="qdrant-code"
+    )
+
+    assert [r["context"]["file_path"] for r in result] == ["src/lib.rs", "src/cap.rs"]
+    openai.embeddings.create.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_search_in_process_vector_index() -> None:
+    openai = mock_openai()
+    qdrant = mock_qdrant()
+    vectors = VectorIndex(
+        np.asarray([[0.0, 1.0], [1.0, 2.0]], dtype=np.float32),
+        payloads={
+            "file_path": ["src/a.rs", "src/b.rs"],
+            "file_name": ["a.rs", "b.rs"],
+            "start_line": [1, 5],
+            "end_line": [3, 9],
+            "text": ["fn a() {}", "fn b() {}"],
+        },
+    )
+    searcher = CodeSearcher(qdrant=qdrant, openai=openai, vectors=vectors)
+
+    result = await searcher.search(query="b", collection_name="qdrant-code", limit=1)
+    batch = await searcher.search_batch(
+        queries=["b"], collection_name="qdrant-code", limit=1
+    )
+
+    assert [
+        (r["context"]["file_path"], r["line_from"], r["line_to"]) for r in result
+    ] == [("src/b.rs", 5, 9)]
+    assert batch == [result]
+    qdrant.search.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_search_stream_yields_lexical_results_first() -> None:
+    openai = mock_openai()
+    searcher = CodeSearcher(
+        qdrant=mock_qdrant(), openai=openai, lexical=lexical_index()
+    )
+
+    events = [
+        event
+        async for event in searcher.search_stream(
+            query="map with capacity", collection_name="qdrant-code"
+        )
+    ]
+
+    assert [event["stage"] for event in events] == ["lexical", "final"]
+    assert [r["context"]["file_path"] for r in events[0]["result"]] == ["src/cap.rs"]
+    assert events[1]["result"] == await searcher.search(
+        query="map with capacity", collection_name="qdrant-code"
+    )
+
+
+@pytest.mark.asyncio
+async def test_search_stream_lexical_answer_skips_embedding() -> None:
+    openai = mock_openai()
+    searcher = CodeSearcher(
+        qdrant=mock_qdrant(), openai=openai, lexical=lexical_index()
+    )
+
+    events = [
+        event
+        async for event in searcher.search_stream(
+            query="HashMap::with_capacity", collection_name="qdrant-code"
+        )
+    ]
+
+    assert [event["stage"] for event in events] == ["final"]
+    openai.embeddings.create.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_search_stream_without_lexical_index() -> None:
+    searcher = CodeSearcher(qdrant=mock_qdrant(), openai=mock_openai())
+
+    events = [
+        event
+        async for event in searcher.search_stream(
+            query="main", collection_name="qdrant-code"
+        )
+    ]
+
+    assert events == [
+        {
+            "stage": "final",
+            "result": await searcher.search(
+                query="main", collection_name="qdrant-code"
+            ),
+        }
+    ]
+
+
+@pytest.mark.asyncio
+async def test_search_filter_is_pushed_down() -> None:
+    qdrant = mock_qdrant()
+    searcher = CodeSearcher(qdrant=qdrant, openai=mock_openai())
+
+    await searcher.search(
+        query="main",
+        collection_name="qdrant-code",
+        where=ChunkFilter(code_type="function", path_prefix="lib/segment/"),
+    )
+
+    assert qdrant.search.call_args.kwargs["query_filter"] == models.Filter(
+        must=[
+            models.FieldCondition(
+                key="code_type", match=models.MatchValue(value="function")
+            ),
+            models.FieldCondition(
+                key="path_prefixes", match=models.MatchValue(value="lib/segment")
+            ),
+        ]
+    )
+
+
+@pytest.mark.asyncio
+async def test_search_filters_in_process_indexes() -> None:
+    qdrant = mock_qdrant()
+    vectors = VectorIndex(
+        np.asarray([[0.0, 1.0], [1.0, 2.0]], dtype=np.float32),
+        payloads={
+            "file_path": ["lib/a/src/lib.rs", "lib/b/src/lib.rs"],
+            "file_name": ["lib.rs", "lib.rs"],
+            "start_line": [1, 1],
+            "end_line": [3, 3],
+            "text": ["fn a() {}", "fn b() {}"],
+            "module": ["a", "b"],
+            "code_type": ["function", "function"],
+        },
+    )
+    searcher = CodeSearcher(
+        qdrant=qdrant, openai=mock_openai(), lexical=lexical_index(), vectors=vectors
+    )
+
+    result = await searcher.search(
+        query="map with capacity",
+        collection_name="qdrant-code",
+        where=ChunkFilter(path_prefix="lib/a"),
+    )
+
+    assert [r["context"]["file_path"] for r in result] == ["lib/a/src/lib.rs"]
+    qdrant.search.assert_not_awaited()
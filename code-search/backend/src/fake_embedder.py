@@ -0,0 +1,48 @@
+import hashlib
+import re
+
+import numpy as np
+
+# Words of identifiers, e.g. `HashMap::with_capacity` is hash, map, with, capacity
+_WORD = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+
+
+def fake_embedding(text: str, dim: int) -> np.ndarray:
+    """Deterministic unit vector of the words in `text`, hashed into `dim` buckets.
+
+    The same vectors as the ingestion's fake embeddings server, so that
+    collections ingested with it can be searched without OpenAI. Texts without
+    words get a vector seeded by their hash.
+    """
+    words = [word.lower() for word in _WORD.findall(text)]
+    if not words:
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        seed = int.from_bytes(digest[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(dim, dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in words:
+        digest = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest())
+        # The sign bit keeps unrelated words from adding up in the same bucket
+        vector[digest % dim] += 1.0 if digest >> 63 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = 1.0
+        return vector
+    return vector / norm
+
+
+class FakeQueryEmbedder:
+    """Embeds queries locally with `fake_embedding`, in place of `QueryEmbedder`."""
+
+    def __init__(self, dim: int) -> None:
+        self.dim = dim
+        self.num_queries = 0
+
+    async def embed(self, query: str) -> list[float]:
+        self.num_queries += 1
+        return fake_embedding(query, self.dim).tolist()
+
+    def stats(self) -> dict[str, int]:
+        return {"queries": self.num_queries, "coalesced": 0, "requests": 0}
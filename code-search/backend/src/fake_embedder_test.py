@@ -0,0 +1,26 @@
+import importlib.util
+import os
+
+import numpy as np
+import pytest
+
+from src.fake_embedder import fake_embedding
+
+# The ingestion's fake embeddings server, which the backend cannot import
+FAKE_OPENAI = os.path.join(
+    os.path.dirname(__file__), "..", "..", "ingestion", "src", "fake_openai.py"
+)
+
+
+def test_matches_ingestion_fake_embeddings() -> None:
+    if not os.path.exists(FAKE_OPENAI):
+        pytest.skip("The ingestion is not checked out next to the backend")
+    spec = importlib.util.spec_from_file_location("fake_openai", FAKE_OPENAI)
+    fake_openai = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(fake_openai)
+
+    for text in ["HashMap::with_capacity", "fn parse_config() {}", "{}", ""]:
+        for dim in [8, 1536]:
+            np.testing.assert_array_equal(
+                fake_embedding(text, dim), fake_openai.fake_embedding(text, dim)
+            )
@@ -1,26 +1,81 @@
+from typing import Any
+
 from qdrant_client import AsyncQdrantClient
 from qdrant_client.http import models
 
+from src.metrics import timed
+
 
 class FileFetcher:
-    def __init__(self, qdrant: AsyncQdrantClient) -> None:
+    """Fetches files, or ranges of their lines, from the file collection.
+
+    Files are stored as blocks of consecutive lines, each with the 1-based
+    inclusive `startline` and `endline` of the block. Only the blocks
+    overlapping the requested range are transferred from Qdrant.
+    """
+
+    def __init__(self, qdrant: AsyncQdrantClient, page_size: int = 64) -> None:
         self.qdrant = qdrant
+        self.page_size = page_size
 
     async def fetch(
-        self, path: str, collection_name: str, limit: int = 5
-    ) -> list[dict]:
+        self,
+        path: str,
+        collection_name: str,
+        start_line: int | None = None,
+        end_line: int | None = None,
+    ) -> list[dict[str, Any]]:
+        conditions = [
+            models.FieldCondition(key="path", match=models.MatchValue(value=path))
+        ]
+        if start_line is not None:
+            conditions.append(
+                models.FieldCondition(key="endline", range=models.Range(gte=start_line))
+            )
+        if end_line is not None:
+            conditions.append(
+                models.FieldCondition(key="startline", range=models.Range(lte=end_line))
+            )
+
         # https://github.com/qdrant/qdrant-client/blob/d18cb1702f4cf8155766c7b32d1e4a68af11cd6a/qdrant_client/async_qdrant_client.py#L829
-        points, _ = await self.qdrant.scroll(
-            collection_name=collection_name,
-            scroll_filter=models.Filter(
-                must=[
-                    models.FieldCondition(
-                        key="path",
-                        match=models.MatchValue(value=path),
-                    )
-                ]
-            ),
-            limit=limit,
-        )
-
-        return [point.payload for point in points if point.payload is not None]
+        blocks = []
+        offset = None
+        with timed("file_scroll", upstream="qdrant"):
+            while True:
+                points, offset = await self.qdrant.scroll(
+                    collection_name=collection_name,
+                    scroll_filter=models.Filter(must=conditions),
+                    limit=self.page_size,
+                    offset=offset,
+                    with_vectors=False,
+                )
+                blocks.extend(point.payload for point in points if point.payload)
+                if offset is None:
+                    break
+        if not blocks:
+            return []
+
+        with timed("file_merge"):
+            return merge_blocks(path, blocks, start_line, end_line)
+
+
+def merge_blocks(
+    path: str,
+    blocks: list[dict[str, Any]],
+    start_line: int | None,
+    end_line: int | None,
+) -> list[dict[str, Any]]:
+    """Joins the blocks of a file and slices the lines to the requested range."""
+    blocks.sort(key=lambda block: block["startline"])
+    first_line = blocks[0]["startline"]
+    code = [line for block in blocks for line in block["code"]]
+    start = max(start_line or first_line, first_line)
+    end = min(end_line or blocks[-1]["endline"], blocks[-1]["endline"])
+    return [
+        {
+            "path": path,
+            "code": code[start - first_line : end - first_line + 1],
+            "startline": start,
+            "endline": end,
+        }
+    ]
@@ -0,0 +1,100 @@
+import pytest
+import pytest_asyncio
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+
+from src.file_fetch import FileFetcher
+
+COLLECTION = "qdrant-file"
+LINES = [f"line {i}\n" for i in range(1, 11)]
+
+
+@pytest_asyncio.fixture
+async def qdrant() -> AsyncQdrantClient:
+    client = AsyncQdrantClient(":memory:")
+    await client.create_collection(collection_name=COLLECTION, vectors_config={})
+    # lib.rs in blocks of 4 lines, uploaded out of order
+    blocks = [
+        {
+            "path": "src/lib.rs",
+            "code": LINES[start : start + 4],
+            "startline": start + 1,
+            "endline": min(start + 4, len(LINES)),
+        }
+        for start in [8, 0, 4]
+    ]
+    blocks.append(
+        {
+            "path": "src/main.rs",
+            "code": ["fn main() {}\n"],
+            "startline": 1,
+            "endline": 1,
+        }
+    )
+    await client.upsert(
+        collection_name=COLLECTION,
+        points=[
+            models.PointStruct(id=i, vector={}, payload=block)
+            for i, block in enumerate(blocks)
+        ],
+    )
+    return client
+
+
+@pytest.mark.asyncio
+async def test_fetch_file(qdrant: AsyncQdrantClient) -> None:
+    fetcher = FileFetcher(qdrant, page_size=2)
+
+    result = await fetcher.fetch("src/lib.rs", collection_name=COLLECTION)
+
+    assert result == [
+        {"path": "src/lib.rs", "code": LINES, "startline": 1, "endline": 10}
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "start_line, end_line, expected_start, expected_end",
+    [
+        (3, 6, 3, 6),
+        (5, 8, 5, 8),
+        (9, None, 9, 10),
+        (None, 2, 1, 2),
+        (7, 100, 7, 10),
+    ],
+)
+async def test_fetch_line_range(
+    qdrant: AsyncQdrantClient,
+    start_line: int | None,
+    end_line: int | None,
+    expected_start: int,
+    expected_end: int,
+) -> None:
+    fetcher = FileFetcher(qdrant)
+
+    result = await fetcher.fetch(
+        "src/lib.rs",
+        collection_name=COLLECTION,
+        start_line=start_line,
+        end_line=end_line,
+    )
+
+    assert result == [
+        {
+            "path": "src/lib.rs",
+            "code": LINES[expected_start - 1 : expected_end],
+            "startline": expected_start,
+            "endline": expected_end,
+        }
+    ]
+
+
+@pytest.mark.asyncio
+async def test_fetch_missing(qdrant: AsyncQdrantClient) -> None:
+    fetcher = FileFetcher(qdrant)
+
+    assert await fetcher.fetch("src/missing.rs", collection_name=COLLECTION) == []
+    assert (
+        await fetcher.fetch("src/lib.rs", collection_name=COLLECTION, start_line=11)
+        == []
+    )
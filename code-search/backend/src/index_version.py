@@ -0,0 +1,70 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.exceptions import ApiException
+
+logger = logging.getLogger(__name__)
+
+
+class IndexVersion:
+    """Identifies the version of the indexed corpus, to invalidate cached results.
+
+    A full rebuild moves the Qdrant aliases to a new collection, while an
+    incremental run updates the live collection in place and then rewrites the
+    ingestion's output files, such as its manifest. The version is a digest of
+    the collections behind `aliases` and the modification times of `files`,
+    checked at most every `ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        qdrant: AsyncQdrantClient,
+        aliases: list[str],
+        files: list[str],
+        ttl: float = 5.0,
+    ) -> None:
+        self.qdrant = qdrant
+        self.aliases = aliases
+        self.files = files
+        self.ttl = ttl
+        self._version: str | None = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> str:
+        if self._version is not None and time.monotonic() - self._checked_at < self.ttl:
+            return self._version
+        # Concurrent requests share a single check
+        async with self._lock:
+            if self._version is None or time.monotonic() - self._checked_at >= self.ttl:
+                self._version = await self._check()
+                self._checked_at = time.monotonic()
+            return self._version
+
+    async def _check(self) -> str:
+        try:
+            collections = {
+                description.alias_name: description.collection_name
+                for description in (await self.qdrant.get_aliases()).aliases
+            }
+        except ApiException as e:
+            # Searches served in process do not depend on Qdrant being up
+            logger.warning(f"Failed to resolve aliases {self.aliases}: {e}")
+            collections = {}
+        parts = [f"{alias}={collections.get(alias)}" for alias in self.aliases]
+        for path in self.files:
+            mtime = file_mtime(path)
+            parts.append(f"{path}@{'missing' if mtime is None else mtime}")
+        return hashlib.sha1("\n".join(parts).encode()).hexdigest()[:16]
+
+
+def file_mtime(path: str) -> int | None:
+    """Modification time of `path` in nanoseconds, or None if it does not exist."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+
+from src.index_version import IndexVersion
+
+
+async def point_alias(qdrant: AsyncQdrantClient, alias: str, collection: str) -> None:
+    await qdrant.create_collection(collection, vectors_config={})
+    await qdrant.update_collection_aliases(
+        change_aliases_operations=[
+            models.CreateAliasOperation(
+                create_alias=models.CreateAlias(
+                    collection_name=collection, alias_name=alias
+                )
+            )
+        ]
+    )
+
+
+@pytest.mark.asyncio
+async def test_version_changes_with_alias_and_files(tmp_path) -> None:
+    qdrant = AsyncQdrantClient(":memory:")
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text("{}")
+    await point_alias(qdrant, "qdrant-code", "qdrant-code-v1")
+    version = IndexVersion(
+        qdrant, aliases=["qdrant-code"], files=[str(manifest)], ttl=0
+    )
+
+    v1 = await version.get()
+    assert await version.get() == v1
+
+    await point_alias(qdrant, "qdrant-code", "qdrant-code-v2")
+    v2 = await version.get()
+    os.utime(manifest, ns=(0, 0))
+    v3 = await version.get()
+    manifest.unlink()
+    v4 = await version.get()
+
+    assert len({v1, v2, v3, v4}) == 4
+
+
+@pytest.mark.asyncio
+async def test_version_is_rechecked_after_ttl(tmp_path) -> None:
+    qdrant = AsyncQdrantClient(":memory:")
+    await point_alias(qdrant, "qdrant-code", "qdrant-code-v1")
+    version = IndexVersion(qdrant, aliases=["qdrant-code"], files=[], ttl=3600)
+
+    v1 = await version.get()
+    await point_alias(qdrant, "qdrant-code", "qdrant-code-v2")
+
+    assert await version.get() == v1
+    version.ttl = 0
+    assert await version.get() != v1
+
+
+@pytest.mark.asyncio
+async def test_version_without_qdrant(tmp_path) -> None:
+    qdrant = AsyncQdrantClient("http://localhost:1", timeout=1)
+    version = IndexVersion(qdrant, aliases=["qdrant-code"], files=[], ttl=0)
+
+    assert await version.get() == await version.get()
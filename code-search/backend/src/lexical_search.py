@@ -0,0 +1,160 @@
+import gzip
+import json
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
+from src.chunk_filter import ChunkFilter, FilterMasks
+
+# Format version written by the ingestion's `lexical_index`
+VERSION = 2
+# Candidates checked for an exact occurrence of the query
+MAX_EXACT_CANDIDATES = 5_000
+
+_QUERY_WORD = r"[\w:.<>&*'!\[\]()\-]+"
+_IDENTIFIER_QUERY = re.compile(rf"{_QUERY_WORD}(\s+{_QUERY_WORD}){{0,3}}")
+# Paths, snake_case, camelCase, PascalCase with several humps or Rust keywords
+_CODE_SIGNAL = re.compile(
+    r"::|_|\.|\(|<|[a-z][A-Z]|[A-Z][a-z]+[A-Z]|"
+    r"\b(fn|impl|struct|enum|trait|mod|use|let|pub|const|static|dyn|mut|where)\b"
+)
+
+
+def is_identifier_query(query: str) -> bool:
+    """Whether the query looks like a symbol name or a code fragment."""
+    query = query.strip()
+    return bool(_IDENTIFIER_QUERY.fullmatch(query) and _CODE_SIGNAL.search(query))
+
+
+@dataclass
+class LexicalHit:
+    doc_id: int
+    # The chunk contains the query verbatim
+    exact: bool
+    # The chunk in the same format as its payload in Qdrant, once its text is read
+    payload: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class LexicalMatches:
+    """Chunks matching the identifiers of a query, before checking their text."""
+
+    # Chunks containing every identifier of the query, which may contain the
+    # query verbatim
+    candidates: list[int]
+    # Chunks ranked by the summed IDF of the query identifiers they contain
+    ranked: list[int]
+
+    def hits(self, exact: list[int], limit: int) -> list[LexicalHit]:
+        """The `exact` matches first, followed by the best ranked other chunks."""
+        found = set(exact)
+        ranked = [doc_id for doc_id in self.ranked if doc_id not in found]
+        return [LexicalHit(doc_id, exact=True) for doc_id in exact] + [
+            LexicalHit(doc_id, exact=False) for doc_id in ranked[: limit - len(exact)]
+        ]
+
+
+class LexicalIndex:
+    """Inverted index from identifiers to code chunks, held in memory.
+
+    Built by the ingestion's `lexical_index` over the text and file path of
+    every chunk. Chunks containing the query verbatim rank first, followed by
+    chunks ranked by the summed IDF of the query identifiers they contain. The
+    index keeps the payloads of the chunks but not their text, which is read
+    by point id from the vector index or Qdrant.
+    """
+
+    def __init__(
+        self,
+        ids: list[Any],
+        docs: dict[str, list[Any]],
+        postings: dict[str, list[int]],
+        token_pattern: str,
+    ) -> None:
+        self.ids = ids
+        self.docs = docs
+        self.num_docs = len(ids)
+        self.token_pattern = re.compile(token_pattern)
+        self.masks = FilterMasks(docs)
+        self.postings = {
+            token: np.asarray(doc_ids, dtype=np.int32)
+            for token, doc_ids in postings.items()
+        }
+
+    @classmethod
+    def load(cls, index_file: str) -> "LexicalIndex":
+        with gzip.open(index_file, "rt", encoding="utf-8") as f:
+            index = json.load(f)
+        if index["version"] != VERSION:
+            raise ValueError(
+                f"Unsupported lexical index version {index['version']} in {index_file}"
+            )
+        return cls(
+            ids=index["ids"],
+            docs=index["docs"],
+            postings=index["postings"],
+            token_pattern=index["token_pattern"],
+        )
+
+    def __len__(self) -> int:
+        return self.num_docs
+
+    def tokenize(self, query: str) -> list[str]:
+        return list(dict.fromkeys(t.lower() for t in self.token_pattern.findall(query)))
+
+    def search(
+        self, query: str, limit: int, where: ChunkFilter | None = None
+    ) -> LexicalMatches:
+        tokens = self.tokenize(query)
+        postings = [self.postings[token] for token in tokens if token in self.postings]
+        if not postings:
+            return LexicalMatches(candidates=[], ranked=[])
+
+        # Scored by walking the posting lists, so that a query costs as much as
+        # the chunks it matches rather than the size of the index
+        idfs = [math.log(1 + self.num_docs / len(doc_ids)) for doc_ids in postings]
+        doc_ids, positions = np.unique(np.concatenate(postings), return_inverse=True)
+        scores = np.bincount(
+            positions, weights=np.repeat(idfs, [len(p) for p in postings])
+        )
+        if where:
+            matching = self.masks.mask(where)[doc_ids]
+            doc_ids, scores = doc_ids[matching], scores[matching]
+
+        candidates = []
+        if len(postings) == len(tokens):
+            candidates = doc_ids[scores >= sum(idfs) * (1 - 1e-4)]
+            candidates = candidates[:MAX_EXACT_CANDIDATES].tolist()
+        # Enough to fill `limit` once the exact matches are moved first
+        ranked = doc_ids[np.argsort(-scores, kind="stable")[: 2 * limit]]
+        return LexicalMatches(candidates=candidates, ranked=ranked.tolist())
+
+    def point_id(self, doc_id: int) -> Any:
+        """Id of the chunk's point in the code collection."""
+        return self.ids[doc_id]
+
+    def payload(self, doc_id: int) -> dict[str, Any]:
+        """The chunk in the same format as its payload in Qdrant, without text."""
+        return {field: values[doc_id] for field, values in self.docs.items()}
+
+
+def reciprocal_rank_fusion(
+    rankings: list[list[dict[str, Any]]], limit: int, k: int = 60
+) -> list[dict[str, Any]]:
+    """Merges ranked search results by the sum of 1 / (k + rank) over rankings."""
+    scores: dict[tuple[str, int, int], float] = {}
+    results: dict[tuple[str, int, int], dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking):
+            key = (
+                result["context"]["file_path"],
+                result["line_from"],
+                result["line_to"],
+            )
+            scores[key] = scores.get(key, 0.0) + 1 / (k + rank + 1)
+            results.setdefault(key, result)
+    ranked = sorted(scores, key=scores.__getitem__, reverse=True)
+    return [results[key] for key in ranked[:limit]]
@@ -0,0 +1,138 @@
+import gzip
+import json
+import re
+from typing import Any
+
+import pytest
+
+from src.chunk_filter import ChunkFilter
+from src.lexical_search import (
+    LexicalIndex,
+    is_identifier_query,
+    reciprocal_rank_fusion,
+)
+
+TOKEN_PATTERN = r"[A-Za-z_][A-Za-z0-9_]*"
+CHUNKS = [
+    ("src/map.rs", "let map = HashMap::new();\nmap.insert(1, 2);"),
+    ("src/cap.rs", "let map = HashMap::with_capacity(16);"),
+    ("src/vec.rs", "let v = Vec::with_capacity(16);"),
+    ("src/display.rs", "impl Display for Point {\n    fn fmt(&self) {}\n}"),
+    ("src/hash_map.rs", "// capacity of the HashMap grows on insert"),
+]
+
+
+def index_json() -> dict[str, Any]:
+    # Same format as written by the ingestion's `lexical_index`
+    docs: dict[str, list[Any]] = {
+        "file_path": [],
+        "file_name": [],
+        "start_line": [],
+        "end_line": [],
+    }
+    postings: dict[str, list[int]] = {}
+    for doc_id, (path, text) in enumerate(CHUNKS):
+        docs["file_path"].append(path)
+        docs["file_name"].append(path.rsplit("/", 1)[-1])
+        docs["start_line"].append(0)
+        docs["end_line"].append(text.count("\n") + 1)
+        tokens = {t.lower() for t in re.findall(TOKEN_PATTERN, f"{path} {text}")}
+        for token in tokens:
+            postings.setdefault(token, []).append(doc_id)
+    return {
+        "version": 2,
+        "token_pattern": TOKEN_PATTERN,
+        "ids": [f"id-{doc_id}" for doc_id in range(len(CHUNKS))],
+        "docs": docs,
+        "postings": postings,
+    }
+
+
+@pytest.fixture
+def index(tmp_path: Any) -> LexicalIndex:
+    index_file = tmp_path / "lexical_index.json.gz"
+    with gzip.open(index_file, "wt", encoding="utf-8") as f:
+        json.dump(index_json(), f)
+    return LexicalIndex.load(str(index_file))
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("HashMap::with_capacity", True),
+        ("impl Display for", True),
+        ("with_capacity", True),
+        ("DisplayPoint", True),
+        ("map.insert", True),
+        ("geo condition filter", False),
+        ("how are points deleted from a collection", False),
+        ("Display", False),
+    ],
+)
+def test_is_identifier_query(query: str, expected: bool) -> None:
+    assert is_identifier_query(query) == expected
+
+
+def test_exact_matches_rank_first(index: LexicalIndex) -> None:
+    matches = index.search("HashMap::with_capacity", limit=3)
+
+    # Only chunks with every identifier of the query may contain it verbatim
+    assert matches.candidates == [1]
+    assert [(hit.doc_id, hit.exact) for hit in matches.hits([1], limit=3)] == [
+        (1, True),
+        # `with_capacity` is rarer than `HashMap`, so it weighs more
+        (2, False),
+        (0, False),
+    ]
+    assert index.point_id(1) == "id-1"
+    assert index.payload(1) == {
+        "file_path": "src/cap.rs",
+        "file_name": "cap.rs",
+        "start_line": 0,
+        "end_line": 1,
+    }
+
+
+def test_partial_matches(index: LexicalIndex) -> None:
+    matches = index.search("Display missing_symbol", limit=5)
+
+    assert matches.candidates == []
+    assert [(hit.doc_id, hit.exact) for hit in matches.hits([], limit=5)] == [
+        (3, False)
+    ]
+
+
+def test_file_paths_are_indexed(index: LexicalIndex) -> None:
+    assert index.search("vec", limit=5).ranked == [2]
+
+
+def test_search_with_filter(index: LexicalIndex) -> None:
+    matches = index.search(
+        "HashMap::with_capacity", limit=3, where=ChunkFilter(path_prefix="src")
+    )
+    vec_only = index.search("with_capacity", limit=3, where=ChunkFilter(module="vec"))
+
+    assert matches.candidates == [1]
+    assert matches.ranked[:3] == [1, 2, 0]
+    # Older indexes without symbol metadata match no module
+    assert vec_only.candidates == vec_only.ranked == []
+
+
+def test_no_matches(index: LexicalIndex) -> None:
+    assert index.search("unknown", limit=5).ranked == []
+    assert index.search("::", limit=5).ranked == []
+
+
+def test_reciprocal_rank_fusion() -> None:
+    def result(path: str) -> dict[str, Any]:
+        return {"context": {"file_path": path}, "line_from": 0, "line_to": 1}
+
+    fused = reciprocal_rank_fusion(
+        [
+            [result("a"), result("b"), result("c")],
+            [result("c"), result("d"), result("b")],
+        ],
+        limit=3,
+    )
+
+    assert [r["context"]["file_path"] for r in fused] == ["c", "b", "a"]
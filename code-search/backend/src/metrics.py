@@ -0,0 +1,201 @@
+import contextvars
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Mostly sub-second stages, with enough resolution for in-process lookups
+_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+REQUEST_SECONDS = Histogram(
+    "code_search_request_seconds",
+    "Latency of API requests until the response headers are sent",
+    ["path"],
+    buckets=_BUCKETS,
+)
+IN_FLIGHT_REQUESTS = Gauge(
+    "code_search_in_flight_requests",
+    "API requests being processed",
+    ["path"],
+    # Summed over the live workers in multiprocess mode
+    multiprocess_mode="livesum",
+)
+STAGE_SECONDS = Histogram(
+    "code_search_stage_seconds",
+    "Latency of the stages of a request",
+    ["stage"],
+    buckets=_BUCKETS,
+)
+UPSTREAM_SECONDS = Histogram(
+    "code_search_upstream_seconds",
+    "Latency of calls to upstream services",
+    ["upstream"],
+    buckets=_BUCKETS,
+)
+UPSTREAM_ERRORS = Counter(
+    "code_search_upstream_errors_total",
+    "Failed calls to upstream services",
+    ["upstream"],
+)
+QUERY_CACHE_LOOKUPS = Counter(
+    "code_search_query_cache_lookups_total",
+    "Query embedding cache lookups",
+    ["result"],
+)
+RESPONSE_CACHE_LOOKUPS = Counter(
+    "code_search_response_cache_lookups_total",
+    "Response cache lookups, including revalidations answered with a 304",
+    ["result"],
+)
+LEXICAL_ANSWERS = Counter(
+    "code_search_lexical_answers_total",
+    "Queries answered from the lexical index without a vector search",
+)
+EMBEDDED_QUERIES = Counter(
+    "code_search_embedded_queries_total",
+    "Queries passed to the query embedder",
+)
+COALESCED_QUERIES = Counter(
+    "code_search_coalesced_queries_total",
+    "Queries that shared the in-flight embeddings request of an identical query",
+)
+
+# Stage durations of the current request, reported in its Server-Timing header
+_request_timings: contextvars.ContextVar[dict[str, float] | None] = (
+    contextvars.ContextVar("request_timings", default=None)
+)
+
+
+def latest() -> bytes:
+    """Metrics in the Prometheus text format.
+
+    With several workers, each has its own metrics. If `PROMETHEUS_MULTIPROC_DIR`
+    is set, workers write them to files in that directory and they are
+    aggregated here, so any worker answers for all of them.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def mark_process_dead() -> None:
+    """Drops the live gauges of this worker from the aggregated metrics.
+
+    Called when a worker shuts down in multiprocess mode. Its counters and
+    histograms are kept, so totals do not go backwards when workers restart.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+@contextmanager
+def timed(stage: str, upstream: str | None = None) -> Iterator[None]:
+    """Records the duration of a stage of the current request.
+
+    With `upstream`, the stage is a call to that service and its failures are
+    counted. Repeated stages of a request add up in its Server-Timing header.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        if upstream is not None:
+            UPSTREAM_ERRORS.labels(upstream).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        if upstream is not None:
+            UPSTREAM_SECONDS.labels(upstream).observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+@contextmanager
+def request_timings() -> Iterator[dict[str, float]]:
+    """Collects the durations of the stages timed while the request runs."""
+    timings: dict[str, float] = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def server_timing(timings: dict[str, float]) -> str:
+    """Formats stage durations as a Server-Timing header value in milliseconds."""
+    return ", ".join(
+        f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items()
+    )
+
+
+class MetricsMiddleware:
+    """Measures requests to `paths` and optionally reports their stages.
+
+    Records the latency until the response headers are sent and the number of
+    requests in flight per path. With `server_timing`, the durations of the
+    stages timed so far are added to the response in a Server-Timing header,
+    along with the total. Other paths pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, paths: set[str], server_timing: bool) -> None:
+        self.app = app
+        self.paths = paths
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get("path")
+        if scope["type"] != "http" or path not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        in_flight = IN_FLIGHT_REQUESTS.labels(path)
+        in_flight.inc()
+        with request_timings() as timings:
+
+            async def send_with_timings(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    elapsed = time.perf_counter() - start
+                    REQUEST_SECONDS.labels(path).observe(elapsed)
+                    if self.server_timing:
+                        value = server_timing(timings | {"total": elapsed})
+                        message["headers"] = [
+                            *message.get("headers", []),
+                            (b"server-timing", value.encode("latin-1")),
+                        ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timings)
+            finally:
+                in_flight.dec()
@@ -0,0 +1,98 @@
+import os
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from src.metrics import MetricsMiddleware, mark_process_dead, server_timing, timed
+
+
+def sample(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def make_app(server_timing: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/slow")
+    async def slow() -> dict[str, str]:
+        with timed("embed"):
+            pass
+        with timed("embed"):
+            pass
+        return {}
+
+    @app.get("/api/broken")
+    async def broken() -> dict[str, str]:
+        with timed("vector_search", upstream="qdrant"):
+            raise RuntimeError("Qdrant is down")
+
+    @app.get("/other")
+    async def other() -> dict[str, str]:
+        return {}
+
+    app.add_middleware(
+        MetricsMiddleware,
+        paths={"/api/slow", "/api/broken"},
+        server_timing=server_timing,
+    )
+    return app
+
+
+def test_server_timing_header() -> None:
+    client = TestClient(make_app(server_timing=True))
+    requests = sample("code_search_request_seconds_count", path="/api/slow")
+
+    response = client.get("/api/slow")
+
+    stages = [
+        entry.split(";")[0] for entry in response.headers["server-timing"].split(", ")
+    ]
+    assert stages == ["embed", "total"]
+    assert sample("code_search_request_seconds_count", path="/api/slow") == requests + 1
+    assert sample("code_search_in_flight_requests", path="/api/slow") == 0
+    assert "server-timing" not in client.get("/other").headers
+
+
+def test_server_timing_disabled() -> None:
+    client = TestClient(make_app(server_timing=False))
+
+    assert "server-timing" not in client.get("/api/slow").headers
+
+
+def test_upstream_errors_are_counted() -> None:
+    client = TestClient(make_app(server_timing=False), raise_server_exceptions=False)
+    errors = sample("code_search_upstream_errors_total", upstream="qdrant")
+
+    assert client.get("/api/broken").status_code == 500
+    assert sample("code_search_upstream_errors_total", upstream="qdrant") == errors + 1
+    assert sample("code_search_in_flight_requests", path="/api/broken") == 0
+
+
+def test_timed_outside_request() -> None:
+    stages = sample("code_search_stage_seconds_count", stage="lexical")
+
+    with timed("lexical"):
+        pass
+
+    assert sample("code_search_stage_seconds_count", stage="lexical") == stages + 1
+
+
+def test_format_server_timing() -> None:
+    assert server_timing({"embed": 0.0123, "total": 0.02}) == (
+        "embed;dur=12.30, total;dur=20.00"
+    )
+
+
+def test_mark_process_dead(monkeypatch, tmp_path) -> None:
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    # Files written by this worker in multiprocess mode
+    for name in ["gauge_livesum", "counter", "histogram"]:
+        (tmp_path / f"{name}_{os.getpid()}.db").touch()
+
+    mark_process_dead()
+
+    assert sorted(os.listdir(tmp_path)) == [
+        f"counter_{os.getpid()}.db",
+        f"histogram_{os.getpid()}.db",
+    ]
@@ -0,0 +1,64 @@
+import time
+from collections import OrderedDict
+
+
+def normalize_query(query: str) -> str:
+    # Identifiers are case sensitive, so only whitespace is normalized
+    return " ".join(query.split())
+
+
+class QueryEmbeddingCache:
+    """Bounded in-process cache of query embeddings keyed by (model, query).
+
+    The least recently used entry is evicted once `max_size` entries are cached,
+    and entries older than `ttl` seconds are treated as missing.
+    """
+
+    def __init__(self, max_size: int = 10_000, ttl: float = 3600.0) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[tuple[str, str], tuple[float, list[float]]] = (
+            OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, model: str, query: str) -> list[float] | None:
+        key = (model, query)
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] > self.ttl:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, model: str, query: str, embedding: list[float]) -> None:
+        key = (model, query)
+        self._entries[key] = (time.monotonic(), embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
@@ -0,0 +1,58 @@
+from unittest.mock import patch
+
+from src.query_cache import QueryEmbeddingCache, normalize_query
+
+
+def test_normalize_query() -> None:
+    assert normalize_query("  geo   condition\tFilter \n") == "geo condition Filter"
+
+
+def test_lru_eviction() -> None:
+    cache = QueryEmbeddingCache(max_size=2)
+    cache.put("model", "a", [1.0])
+    cache.put("model", "b", [2.0])
+    assert cache.get("model", "a") == [1.0]
+
+    # "b" is now the least recently used entry
+    cache.put("model", "c", [3.0])
+
+    assert cache.get("model", "b") is None
+    assert cache.get("model", "a") == [1.0]
+    assert cache.get("model", "c") == [3.0]
+    assert len(cache) == 2
+    assert cache.evictions == 1
+
+
+def test_keyed_by_model() -> None:
+    cache = QueryEmbeddingCache()
+    cache.put("small", "query", [1.0])
+
+    assert cache.get("large", "query") is None
+    assert cache.get("small", "query") == [1.0]
+
+
+def test_ttl() -> None:
+    cache = QueryEmbeddingCache(ttl=10)
+    with patch("src.query_cache.time.monotonic", return_value=100.0):
+        cache.put("model", "query", [1.0])
+    with patch("src.query_cache.time.monotonic", return_value=110.0):
+        assert cache.get("model", "query") == [1.0]
+    with patch("src.query_cache.time.monotonic", return_value=110.5):
+        assert cache.get("model", "query") is None
+    assert len(cache) == 0
+
+
+def test_stats() -> None:
+    cache = QueryEmbeddingCache()
+    cache.put("model", "query", [1.0])
+    cache.get("model", "query")
+    cache.get("model", "query")
+    cache.get("model", "other")
+
+    assert cache.stats() == {
+        "size": 1,
+        "hits": 2,
+        "misses": 1,
+        "evictions": 0,
+        "hit_rate": 2 / 3,
+    }
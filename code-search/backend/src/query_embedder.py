@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+from openai import AsyncOpenAI
+
+from src.metrics import (
+    COALESCED_QUERIES,
+    EMBEDDED_QUERIES,
+    UPSTREAM_ERRORS,
+    UPSTREAM_SECONDS,
+)
+
+
+class QueryEmbedder:
+    """Embeds search queries, coalescing concurrent requests.
+
+    Concurrent calls with the same query share a single in-flight request.
+    Distinct queries arriving within `max_wait` seconds of each other are sent
+    in one embeddings request of at most `max_batch_size` inputs, so a burst of
+    searches costs a few upstream requests and at most `max_wait` of latency.
+    """
+
+    def __init__(
+        self,
+        openai: AsyncOpenAI,
+        model: str = "text-embedding-3-small",
+        max_wait: float = 0.002,
+        max_batch_size: int = 64,
+    ) -> None:
+        self.openai = openai
+        self.model = model
+        self.max_wait = max_wait
+        self.max_batch_size = max_batch_size
+        self.num_queries = 0
+        self.num_coalesced = 0
+        self.num_requests = 0
+        self._inflight: dict[str, asyncio.Future[list[float]]] = {}
+        self._pending: list[str] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        # Keeps references to running requests so they are not garbage collected
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def embed(self, query: str) -> list[float]:
+        self.num_queries += 1
+        EMBEDDED_QUERIES.inc()
+        future = self._inflight.get(query)
+        if future is not None:
+            self.num_coalesced += 1
+            COALESCED_QUERIES.inc()
+        else:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._inflight[query] = future
+            self._pending.append(query)
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        # A cancelled caller must not cancel the request shared with others
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queries": self.num_queries,
+            "coalesced": self.num_coalesced,
+            "requests": self.num_requests,
+        }
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        queries, self._pending = self._pending, []
+        task = asyncio.create_task(self._embed_batch(queries))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _embed_batch(self, queries: list[str]) -> None:
+        self.num_requests += 1
+        # Shared by the requests of all queries in the batch, so it is only
+        # timed as an upstream call rather than as a stage of one request
+        start = time.perf_counter()
+        try:
+            response = await self.openai.embeddings.create(
+                input=queries, model=self.model
+            )
+            embeddings = [
+                item.embedding for item in sorted(response.data, key=lambda x: x.index)
+            ]
+        except Exception as e:  # noqa: BLE001 - failures are raised by every caller
+            UPSTREAM_ERRORS.labels("openai").inc()
+            for query in queries:
+                self._inflight.pop(query).set_exception(e)
+            return
+        except BaseException:
+            # Cancelled, e.g. at shutdown. Callers must not wait forever, and
+            # later calls with the same queries start a new request
+            for query in queries:
+                self._inflight.pop(query).cancel()
+            raise
+        finally:
+            UPSTREAM_SECONDS.labels("openai").observe(time.perf_counter() - start)
+
+        for query, embedding in zip(queries, embeddings):
+            self._inflight.pop(query).set_result(embedding)
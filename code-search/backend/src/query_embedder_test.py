@@ -0,0 +1,104 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.query_embedder import QueryEmbedder
+
+
+def mock_openai(delay: float = 0.0) -> MagicMock:
+    async def create(input: list[str], model: str) -> MagicMock:
+        await asyncio.sleep(delay)
+        # Returned out of order, the embedder must sort by index
+        return MagicMock(
+            data=[
+                MagicMock(index=i, embedding=[float(len(text))])
+                for i, text in reversed(list(enumerate(input)))
+            ]
+        )
+
+    openai = MagicMock()
+    openai.embeddings.create = AsyncMock(side_effect=create)
+    return openai
+
+
+@pytest.mark.asyncio
+async def test_coalesces_identical_queries() -> None:
+    openai = mock_openai(delay=0.01)
+    embedder = QueryEmbedder(openai, max_wait=0.001)
+
+    embeddings = await asyncio.gather(*(embedder.embed("geo") for _ in range(10)))
+
+    assert embeddings == [[3.0]] * 10
+    openai.embeddings.create.assert_awaited_once()
+    assert embedder.stats() == {"queries": 10, "coalesced": 9, "requests": 1}
+
+
+@pytest.mark.asyncio
+async def test_batches_distinct_queries() -> None:
+    openai = mock_openai()
+    embedder = QueryEmbedder(openai, max_wait=0.01, max_batch_size=4)
+    queries = ["a", "bb", "ccc", "dddd", "eeeee", "ffffff"]
+
+    embeddings = await asyncio.gather(*(embedder.embed(query) for query in queries))
+
+    assert embeddings == [[float(len(query))] for query in queries]
+    # A full batch is sent right away, the rest once `max_wait` has passed
+    assert [
+        call.kwargs["input"] for call in openai.embeddings.create.await_args_list
+    ] == [
+        ["a", "bb", "ccc", "dddd"],
+        ["eeeee", "ffffff"],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_sequential_queries_are_not_coalesced() -> None:
+    openai = mock_openai()
+    embedder = QueryEmbedder(openai, max_wait=0)
+
+    assert await embedder.embed("geo") == [3.0]
+    assert await embedder.embed("geo") == [3.0]
+
+    assert openai.embeddings.create.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_every_caller() -> None:
+    openai = MagicMock()
+    openai.embeddings.create = AsyncMock(side_effect=RuntimeError("rate limited"))
+    embedder = QueryEmbedder(openai)
+
+    results = await asyncio.gather(
+        embedder.embed("a"),
+        embedder.embed("a"),
+        embedder.embed("b"),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    # Failed queries can be retried
+    openai.embeddings.create = AsyncMock(
+        return_value=MagicMock(data=[MagicMock(index=0, embedding=[1.0])])
+    )
+    assert await embedder.embed("a") == [1.0]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_request_releases_its_callers() -> None:
+    embedder = QueryEmbedder(mock_openai(delay=10), max_wait=0.001)
+    callers = [asyncio.create_task(embedder.embed(query)) for query in "aab"]
+    while not embedder.num_requests:
+        await asyncio.sleep(0.001)
+
+    for task in embedder._tasks:
+        task.cancel()
+    results = await asyncio.wait_for(
+        asyncio.gather(*callers, return_exceptions=True), timeout=1
+    )
+
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+    assert not embedder._inflight
+    # Cancelled queries can be retried
+    embedder.openai = mock_openai()
+    assert await embedder.embed("a") == [1.0]
@@ -0,0 +1,118 @@
+import gzip
+import hashlib
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+from typing import Any
+
+import orjson
+from fastapi import Request, Response
+
+from src.index_version import IndexVersion
+from src.metrics import RESPONSE_CACHE_LOOKUPS
+
+# Smaller bodies fit in a packet either way
+MIN_COMPRESS_SIZE = 1_024
+
+
+@dataclass
+class CachedBody:
+    body: bytes
+    # Only set when compression pays off
+    gzipped: bytes | None
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + len(self.gzipped or b"")
+
+
+def encode(content: Any, compresslevel: int = 6) -> CachedBody:
+    body = orjson.dumps(content)
+    gzipped = None
+    if len(body) >= MIN_COMPRESS_SIZE:
+        gzipped = gzip.compress(body, compresslevel=compresslevel, mtime=0)
+    return CachedBody(body, gzipped)
+
+
+class ResponseCache:
+    """Caches encoded JSON responses for as long as the indexed corpus is unchanged.
+
+    Entries are keyed by request and stored serialized and compressed, so a hit
+    costs neither a search nor an encoding. They are dropped as soon as the
+    index version changes, and the least recently used ones are evicted beyond
+    `max_bytes`. Responses carry an ETag derived from the index version and the
+    key, so clients revalidate with a 304 without the result being looked up.
+    """
+
+    def __init__(self, version: IndexVersion, max_bytes: int, max_age: int) -> None:
+        self.version = version
+        self.max_bytes = max_bytes
+        self.cache_control = f"public, max-age={max_age}"
+        self.num_bytes = 0
+        self._version: str | None = None
+        self._entries: OrderedDict[Hashable, CachedBody] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def respond(
+        self,
+        request: Request,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+    ) -> Response:
+        """Responds with the JSON encoding of `compute()`, cached under `key`."""
+        version = await self.version.get()
+        if version != self._version:
+            self.clear()
+            self._version = version
+
+        etag = entity_tag(version, key)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if etag in request.headers.get("if-none-match", ""):
+            RESPONSE_CACHE_LOOKUPS.labels("not_modified").inc()
+            return Response(status_code=304, headers=headers)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            RESPONSE_CACHE_LOOKUPS.labels("hit").inc()
+            self._entries.move_to_end(key)
+        else:
+            RESPONSE_CACHE_LOOKUPS.labels("miss").inc()
+            entry = encode(await compute())
+            # The version may have changed while computing
+            if self._version == version:
+                self.put(key, entry)
+
+        body = entry.body
+        if entry.gzipped is not None and "gzip" in request.headers.get(
+            "accept-encoding", ""
+        ):
+            body = entry.gzipped
+            headers["Content-Encoding"] = "gzip"
+        return Response(body, media_type="application/json", headers=headers)
+
+    def put(self, key: Hashable, entry: CachedBody) -> None:
+        if entry.size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.num_bytes -= previous.size
+        self._entries[key] = entry
+        self.num_bytes += entry.size
+        while self.num_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.num_bytes -= evicted.size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.num_bytes = 0
+
+
+def entity_tag(version: str, key: Hashable) -> str:
+    digest = hashlib.sha1(f"{version}:{key!r}".encode()).hexdigest()[:20]
+    return f'"{digest}"'
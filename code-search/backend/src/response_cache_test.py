@@ -0,0 +1,100 @@
+import gzip
+
+import orjson
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+
+from src.response_cache import ResponseCache, encode
+
+
+class FakeVersion:
+    def __init__(self) -> None:
+        self.version = "v1"
+
+    async def get(self) -> str:
+        return self.version
+
+
+def make_app(
+    version: FakeVersion, max_bytes: int = 1 << 20
+) -> tuple[TestClient, list[str]]:
+    responses = ResponseCache(version, max_bytes=max_bytes, max_age=60)
+    computed: list[str] = []
+    app = FastAPI()
+
+    @app.get("/api/search")
+    async def search(request: Request, query: str) -> Response:
+        async def compute() -> dict:
+            computed.append(query)
+            return {"result": [query] * 500}
+
+        return await responses.respond(request, ("search", query), compute)
+
+    return TestClient(app), computed
+
+
+def test_caches_until_version_changes() -> None:
+    version = FakeVersion()
+    client, computed = make_app(version)
+
+    first = client.get("/api/search", params={"query": "a"})
+    second = client.get("/api/search", params={"query": "a"})
+    version.version = "v2"
+    third = client.get("/api/search", params={"query": "a"})
+
+    assert computed == ["a", "a"]
+    assert first.json() == second.json() == third.json() == {"result": ["a"] * 500}
+    assert first.headers["etag"] == second.headers["etag"] != third.headers["etag"]
+    assert first.headers["cache-control"] == "public, max-age=60"
+
+
+def test_revalidation_skips_compute() -> None:
+    client, computed = make_app(FakeVersion())
+
+    etag = client.get("/api/search", params={"query": "a"}).headers["etag"]
+    response = client.get(
+        "/api/search", params={"query": "b"}, headers={"If-None-Match": etag}
+    )
+    not_modified = client.get(
+        "/api/search", params={"query": "a"}, headers={"If-None-Match": etag}
+    )
+
+    assert response.status_code == 200
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert computed == ["a", "b"]
+
+
+def test_gzip_only_when_accepted() -> None:
+    client, _ = make_app(FakeVersion())
+
+    compressed = client.get(
+        "/api/search", params={"query": "a"}, headers={"Accept-Encoding": "gzip"}
+    )
+    plain = client.get(
+        "/api/search", params={"query": "a"}, headers={"Accept-Encoding": "identity"}
+    )
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert int(compressed.headers["content-length"]) < len(plain.content)
+    assert "content-encoding" not in plain.headers
+    assert compressed.json() == plain.json()
+
+
+def test_evicts_least_recently_used() -> None:
+    size = encode({"result": ["a"] * 500}).size
+    client, computed = make_app(FakeVersion(), max_bytes=2 * size)
+
+    for query in ["a", "b", "a", "c", "a", "b"]:
+        client.get("/api/search", params={"query": query})
+
+    assert computed == ["a", "b", "c", "b"]
+
+
+def test_encode_skips_compressing_small_bodies() -> None:
+    small = encode({"result": []})
+    large = encode({"result": ["fn main() {}"] * 200})
+
+    assert small.gzipped is None
+    assert gzip.decompress(large.gzipped) == large.body
+    assert orjson.loads(large.body) == {"result": ["fn main() {}"] * 200}
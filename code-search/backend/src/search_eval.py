@@ -0,0 +1,229 @@
+import asyncio
+import json
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+from absl import app, flags
+from openai import AsyncOpenAI
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+
+from src.code_search import CodeSearcher
+from src.fake_embedder import FakeQueryEmbedder
+from src.lexical_search import LexicalIndex
+from src.query_cache import QueryEmbeddingCache
+
+FLAGS = flags.FLAGS
+logger = logging.getLogger(__name__)
+
+flags.DEFINE_string(
+    "qdrant_host",
+    default="http://localhost:6333",
+    help="Qdrant host to connect to",
+)
+flags.DEFINE_list(
+    "collections",
+    default=["qdrant-code"],
+    help="Code collections or aliases to evaluate, e.g. one per index configuration",
+)
+flags.DEFINE_string(
+    "golden_file",
+    default=None,
+    help="JSON lines of {query, file_path, line}. A result is relevant if it is "
+    "in the file and, if `line` is set, its line range contains it",
+    required=True,
+)
+flags.DEFINE_integer("k", default=10, help="Number of results per query")
+flags.DEFINE_integer(
+    "fake_embedding_dim",
+    default=None,
+    help="Embed queries locally with the fake embedder of this dimension instead "
+    "of OpenAI, for collections ingested with the fake embeddings server",
+)
+flags.DEFINE_string(
+    "embedding_model",
+    default="text-embedding-3-small",
+    help="OpenAI embedding model the collections were indexed with",
+)
+flags.DEFINE_string(
+    "lexical_index",
+    default=None,
+    help="Lexical index to merge with the vector results, as the server does",
+)
+flags.DEFINE_integer(
+    "hnsw_ef",
+    default=None,
+    help="Size of the HNSW candidate list at search time. Qdrant's default if unset",
+)
+flags.DEFINE_float(
+    "oversampling",
+    default=None,
+    help="Oversampling factor of quantized search before rescoring",
+)
+flags.DEFINE_string(
+    "output_file",
+    default=None,
+    help="Output JSON file of the metrics of every collection",
+)
+
+
+@dataclass
+class GoldenQuery:
+    query: str
+    file_path: str
+    # Any line of the expected code, or None if any chunk of the file is relevant
+    line: int | None = None
+
+
+def load_golden(golden_file: str) -> list[GoldenQuery]:
+    with open(golden_file) as f:
+        return [GoldenQuery(**json.loads(line)) for line in f if line.strip()]
+
+
+def is_relevant(result: dict[str, Any], expected: GoldenQuery) -> bool:
+    if result["context"]["file_path"] != expected.file_path:
+        return False
+    return expected.line is None or (
+        result["line_from"] <= expected.line <= result["line_to"]
+    )
+
+
+def first_relevant_rank(
+    results: list[dict[str, Any]], expected: GoldenQuery
+) -> int | None:
+    """1-based rank of the first relevant result."""
+    for rank, result in enumerate(results, start=1):
+        if is_relevant(result, expected):
+            return rank
+    return None
+
+
+def vector_memory(info: models.CollectionInfo) -> dict[str, Any]:
+    """Estimated bytes of the vectors of a collection, excluding the HNSW graph."""
+    vectors = info.config.params.vectors
+    num_points = info.points_count or 0
+    original = num_points * vectors.size * 4
+    quantized = 0
+    quantization = info.config.quantization_config
+    if isinstance(quantization, models.ScalarQuantization):
+        quantized = num_points * vectors.size
+    elif isinstance(quantization, models.ProductQuantization):
+        ratio = int(quantization.product.compression.value.lstrip("x"))
+        quantized = original // ratio
+    elif isinstance(quantization, models.BinaryQuantization):
+        quantized = num_points * math.ceil(vectors.size / 8)
+    return {
+        "points": num_points,
+        "dim": vectors.size,
+        "original_bytes": original,
+        "original_on_disk": bool(vectors.on_disk),
+        "quantized_bytes": quantized,
+    }
+
+
+async def evaluate(
+    searcher: CodeSearcher,
+    collection_name: str,
+    golden: list[GoldenQuery],
+    k: int,
+    hnsw_ef: int | None = None,
+    oversampling: float | None = None,
+) -> dict[str, Any]:
+    """Recall@k, MRR and search latency of the golden queries on a collection.
+
+    Query embeddings are computed upfront, so latencies measure the search
+    rather than the embedding requests.
+    """
+    await searcher.embed_many([expected.query for expected in golden])
+
+    ranks: list[int | None] = []
+    latencies = []
+    for expected in golden:
+        start = time.perf_counter()
+        results = await searcher.search(
+            query=expected.query,
+            collection_name=collection_name,
+            limit=k,
+            hnsw_ef=hnsw_ef,
+            oversampling=oversampling,
+        )
+        latencies.append(time.perf_counter() - start)
+        ranks.append(first_relevant_rank(results, expected))
+
+    found = [rank for rank in ranks if rank is not None]
+    return {
+        "queries": len(golden),
+        f"recall@{k}": len(found) / len(golden) if golden else 0.0,
+        "mrr": sum(1 / rank for rank in found) / len(golden) if golden else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000 if golden else 0.0,
+        "p99_ms": float(np.percentile(latencies, 99)) * 1000 if golden else 0.0,
+    }
+
+
+async def evaluate_collections() -> dict[str, dict[str, Any]]:
+    qdrant = AsyncQdrantClient(FLAGS.qdrant_host)
+    golden = load_golden(FLAGS.golden_file)
+    lexical = LexicalIndex.load(FLAGS.lexical_index) if FLAGS.lexical_index else None
+    embedder = None
+    if FLAGS.fake_embedding_dim:
+        embedder = FakeQueryEmbedder(FLAGS.fake_embedding_dim)
+    openai = AsyncOpenAI(api_key="unused") if embedder else AsyncOpenAI()
+    # Shared, so every query is embedded once for all collections
+    cache = QueryEmbeddingCache(max_size=len(golden) + 1)
+
+    metrics = {}
+    for collection_name in FLAGS.collections:
+        info = await qdrant.get_collection(collection_name)
+        memory = vector_memory(info)
+        searcher = CodeSearcher(
+            qdrant=qdrant,
+            openai=openai,
+            embedding_model=FLAGS.embedding_model,
+            cache=cache,
+            embedder=embedder,
+            lexical=lexical,
+            embedding_dim=memory["dim"],
+        )
+        metrics[collection_name] = {
+            **await evaluate(
+                searcher,
+                collection_name,
+                golden,
+                k=FLAGS.k,
+                hnsw_ef=FLAGS.hnsw_ef,
+                oversampling=FLAGS.oversampling,
+            ),
+            **memory,
+        }
+        logger.info(f"{collection_name}: {metrics[collection_name]}")
+    return metrics
+
+
+def main(argv):
+    del argv  # Unused.
+
+    metrics = asyncio.run(evaluate_collections())
+
+    k = FLAGS.k
+    print(
+        f"{'collection':<40} {f'recall@{k}':>10} {'mrr':>6} {'p50 ms':>8} "
+        f"{'p99 ms':>8} {'dim':>5} {'vector MB':>10} {'quantized MB':>13}"
+    )
+    for name, m in metrics.items():
+        print(
+            f"{name:<40} {m[f'recall@{k}']:>10.3f} {m['mrr']:>6.3f} "
+            f"{m['p50_ms']:>8.2f} {m['p99_ms']:>8.2f} {m['dim']:>5} "
+            f"{m['original_bytes'] / 1e6:>10.1f} {m['quantized_bytes'] / 1e6:>13.1f}"
+        )
+    if FLAGS.output_file:
+        with open(FLAGS.output_file, "w") as f:
+            json.dump(metrics, f, indent=2)
+        logger.info(f"Saved metrics to {FLAGS.output_file}")
+
+
+if __name__ == "__main__":
+    app.run(main)
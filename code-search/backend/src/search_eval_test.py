@@ -0,0 +1,142 @@
+from types import SimpleNamespace
+
+import pytest
+from openai import AsyncOpenAI
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+
+from src.code_search import CodeSearcher
+from src.fake_embedder import FakeQueryEmbedder, fake_embedding
+from src.search_eval import (
+    GoldenQuery,
+    evaluate,
+    first_relevant_rank,
+    vector_memory,
+)
+
+DIM = 256
+CHUNKS = [
+    ("lib/segment/src/index/hnsw.rs", 1, 40, "fn build_hnsw_graph(points: &[Point])"),
+    ("lib/segment/src/index/hnsw.rs", 41, 80, "fn search_hnsw_graph(query: &Vector)"),
+    ("lib/collection/src/shard.rs", 1, 30, "struct ShardReplicaSet { replicas }"),
+    ("lib/storage/src/wal.rs", 1, 25, "fn flush_write_ahead_log(wal: &mut Wal)"),
+    ("lib/api/src/grpc.rs", 1, 50, "impl PointsService for PointsServiceImpl"),
+]
+GOLDEN = [
+    GoldenQuery("build the hnsw graph", "lib/segment/src/index/hnsw.rs", 10),
+    GoldenQuery("search hnsw graph", "lib/segment/src/index/hnsw.rs", 50),
+    GoldenQuery("shard replica set", "lib/collection/src/shard.rs"),
+    GoldenQuery("flush write ahead log", "lib/storage/src/wal.rs"),
+]
+
+
+async def create_collection(
+    qdrant: AsyncQdrantClient,
+    name: str,
+    dim: int,
+    quantization: models.QuantizationConfig | None = None,
+) -> None:
+    await qdrant.create_collection(
+        name,
+        vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE),
+        quantization_config=quantization,
+    )
+    await qdrant.upsert(
+        name,
+        points=[
+            models.PointStruct(
+                id=i,
+                # Truncated like `code_index --embedding_dim`
+                vector=fake_embedding(text, DIM)[:dim].tolist(),
+                payload={
+                    "file_path": path,
+                    "file_name": path.rsplit("/", 1)[-1],
+                    "start_line": start,
+                    "end_line": end,
+                    "text": text,
+                },
+            )
+            for i, (path, start, end, text) in enumerate(CHUNKS)
+        ],
+    )
+
+
+@pytest.mark.asyncio
+async def test_evaluate_collection() -> None:
+    qdrant = AsyncQdrantClient(":memory:")
+    await create_collection(qdrant, "full", DIM)
+    searcher = CodeSearcher(
+        qdrant=qdrant,
+        openai=AsyncOpenAI(api_key="unused"),
+        embedder=FakeQueryEmbedder(DIM),
+    )
+
+    metrics = await evaluate(searcher, "full", GOLDEN, k=3)
+    memory = vector_memory(await qdrant.get_collection("full"))
+
+    assert metrics["recall@3"] == 1.0
+    assert metrics["mrr"] == 1.0
+    assert metrics["p99_ms"] >= metrics["p50_ms"] > 0
+    assert memory["original_bytes"] == len(CHUNKS) * DIM * 4
+    assert memory["quantized_bytes"] == 0
+
+
+@pytest.mark.asyncio
+async def test_evaluate_truncated_collection() -> None:
+    qdrant = AsyncQdrantClient(":memory:")
+    await create_collection(qdrant, "truncated", 2)
+    searcher = CodeSearcher(
+        qdrant=qdrant,
+        openai=AsyncOpenAI(api_key="unused"),
+        embedder=FakeQueryEmbedder(DIM),
+        embedding_dim=2,
+    )
+
+    metrics = await evaluate(searcher, "truncated", GOLDEN, k=1)
+
+    # Two dimensions cannot tell five chunks apart
+    assert metrics["recall@1"] < 1.0
+    assert metrics["queries"] == len(GOLDEN)
+
+
+def test_first_relevant_rank() -> None:
+    results = [
+        {"context": {"file_path": "a.rs"}, "line_from": 1, "line_to": 10},
+        {"context": {"file_path": "b.rs"}, "line_from": 1, "line_to": 10},
+        {"context": {"file_path": "b.rs"}, "line_from": 11, "line_to": 20},
+    ]
+
+    assert first_relevant_rank(results, GoldenQuery("q", "b.rs")) == 2
+    assert first_relevant_rank(results, GoldenQuery("q", "b.rs", line=15)) == 3
+    assert first_relevant_rank(results, GoldenQuery("q", "b.rs", line=25)) is None
+
+
+def test_vector_memory_of_quantized_collections() -> None:
+    def info(quantization: models.QuantizationConfig) -> SimpleNamespace:
+        vectors = models.VectorParams(
+            size=1536, distance=models.Distance.COSINE, on_disk=True
+        )
+        config = SimpleNamespace(
+            params=SimpleNamespace(vectors=vectors), quantization_config=quantization
+        )
+        return SimpleNamespace(points_count=1000, config=config)
+
+    scalar = models.ScalarQuantization(
+        scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8)
+    )
+    product = models.ProductQuantization(
+        product=models.ProductQuantizationConfig(
+            compression=models.CompressionRatio.X16
+        )
+    )
+    binary = models.BinaryQuantization(binary=models.BinaryQuantizationConfig())
+
+    assert vector_memory(info(scalar)) == {
+        "points": 1000,
+        "dim": 1536,
+        "original_bytes": 1000 * 1536 * 4,
+        "original_on_disk": True,
+        "quantized_bytes": 1000 * 1536,
+    }
+    assert vector_memory(info(product))["quantized_bytes"] == 1000 * 1536 * 4 // 16
+    assert vector_memory(info(binary))["quantized_bytes"] == 1000 * 1536 // 8
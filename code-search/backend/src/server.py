@@ -0,0 +1,401 @@
+import asyncio
+import json
+import logging
+import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Annotated, Any
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, OpenAIError
+from prometheus_client import CONTENT_TYPE_LATEST
+from pydantic import BaseModel, Field
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.exceptions import ApiException
+from starlette.staticfiles import StaticFiles
+
+from src.chunk_filter import ChunkFilter
+from src.code_search import CodeSearcher
+from src.file_fetch import FileFetcher
+from src.index_version import IndexVersion, file_mtime
+from src.lexical_search import LexicalIndex
+from src.metrics import MetricsMiddleware, latest, mark_process_dead
+from src.query_cache import QueryEmbeddingCache, normalize_query
+from src.query_embedder import QueryEmbedder
+from src.response_cache import ResponseCache
+from src.settings import Settings
+from src.vector_index import CURRENT, VectorIndex
+
+logger = logging.getLogger(__name__)
+
+
+class BatchSearchRequest(BaseModel):
+    queries: list[str]
+    limit: int = Field(default=5, ge=1, le=100)
+    # Filters applied to every query
+    module: str | None = None
+    kind: str | None = None
+    path_prefix: str | None = None
+
+
+def chunk_filter(
+    module: str | None = None, kind: str | None = None, path_prefix: str | None = None
+) -> ChunkFilter:
+    """Search filters: Rust module path, kind of symbol and directory."""
+    return ChunkFilter(module=module, code_type=kind, path_prefix=path_prefix)
+
+
+ChunkFilterDep = Annotated[ChunkFilter, Depends(chunk_filter)]
+
+
+def load_lexical_index(index_file: str) -> LexicalIndex | None:
+    if not os.path.exists(index_file):
+        logger.warning(f"Lexical index {index_file} does not exist")
+        return None
+    lexical = LexicalIndex.load(index_file)
+    logger.info(f"Loaded lexical index of {len(lexical)} chunks")
+    return lexical
+
+
+def load_vector_index(index_dir: str) -> VectorIndex:
+    vectors = VectorIndex.load(index_dir)
+    logger.info(
+        f"Loaded vector index of {len(vectors)} chunks of dimension {vectors.dim}"
+    )
+    return vectors
+
+
+def vector_index_file(index_dir: str) -> str:
+    # Symlink swapped to each new version by the ingestion's `vector_export`.
+    # Its modification time is that of the version it points to.
+    return os.path.join(index_dir, CURRENT)
+
+
+@dataclass
+class Services:
+    """Clients and indexes shared by the requests of a worker."""
+
+    settings: Settings
+    qdrant: AsyncQdrantClient
+    openai: AsyncOpenAI
+    vectors: VectorIndex | None
+    code_searcher: CodeSearcher
+    file_fetcher: FileFetcher
+    responses: ResponseCache
+    index_version: IndexVersion
+    # Modification times of the lexical and vector index files when loaded
+    index_mtimes: dict[str, int | None]
+    _version: str | None = field(default=None, init=False)
+    _reload_lock: asyncio.Lock = field(default_factory=asyncio.Lock, init=False)
+
+    @classmethod
+    def create(cls, settings: Settings) -> "Services":
+        # Pools of keep-alive connections; the Qdrant client disables keep-alive
+        # for localhost by default
+        limits = httpx.Limits(
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_connections,
+        )
+        qdrant = AsyncQdrantClient(settings.qdrant_host, limits=limits)
+        openai = AsyncOpenAI(http_client=DefaultAsyncHttpxClient(limits=limits))
+
+        cache = None
+        if settings.query_cache_size > 0:
+            cache = QueryEmbeddingCache(
+                max_size=settings.query_cache_size, ttl=settings.query_cache_ttl
+            )
+        embedder = QueryEmbedder(
+            openai,
+            max_wait=settings.embed_max_wait_ms / 1000,
+            max_batch_size=settings.embed_max_batch_size,
+        )
+        # Taken before loading, so that a rewrite during the load is reloaded
+        index_mtimes = {}
+        lexical = None
+        if settings.lexical_index:
+            index_mtimes[settings.lexical_index] = file_mtime(settings.lexical_index)
+            lexical = load_lexical_index(settings.lexical_index)
+        vectors = None
+        if settings.vector_index:
+            path = vector_index_file(settings.vector_index)
+            index_mtimes[path] = file_mtime(path)
+            vectors = load_vector_index(settings.vector_index)
+        code_searcher = CodeSearcher(
+            qdrant=qdrant,
+            openai=openai,
+            cache=cache,
+            embedder=embedder,
+            lexical=lexical,
+            vectors=vectors,
+            embedding_dim=settings.embedding_dim,
+        )
+        index_files = [settings.manifest_file, *index_mtimes]
+        index_version = IndexVersion(
+            qdrant,
+            aliases=[settings.code_collection, settings.file_collection],
+            files=[path for path in index_files if path],
+            ttl=settings.index_version_ttl,
+        )
+        return cls(
+            settings=settings,
+            qdrant=qdrant,
+            openai=openai,
+            vectors=vectors,
+            code_searcher=code_searcher,
+            file_fetcher=FileFetcher(qdrant=qdrant),
+            responses=ResponseCache(
+                index_version,
+                max_bytes=settings.response_cache_mb * 1024 * 1024,
+                max_age=settings.http_max_age,
+            ),
+            index_version=index_version,
+            index_mtimes=index_mtimes,
+        )
+
+    async def refresh(self) -> None:
+        """Reloads the lexical and vector indexes the ingestion has rewritten.
+
+        Files are only checked when the index version changes, at most every
+        `index_version_ttl` seconds. Requests wait for a reload to finish, so
+        that responses cached under the new version come from the new indexes.
+        An index that fails to load is kept until its file is rewritten again.
+        """
+        version = await self.index_version.get()
+        if version == self._version:
+            return
+        async with self._reload_lock:
+            if version == self._version:
+                return
+            lexical_file = self.settings.lexical_index
+            if lexical_file and self._rewritten(lexical_file):
+                try:
+                    self.code_searcher.lexical = await asyncio.to_thread(
+                        load_lexical_index, lexical_file
+                    )
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Failed to reload lexical index: {e}")
+            index_dir = self.settings.vector_index
+            if index_dir and self._rewritten(vector_index_file(index_dir)):
+                try:
+                    vectors = await asyncio.to_thread(load_vector_index, index_dir)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Failed to reload vector index: {e}")
+                else:
+                    self.vectors = self.code_searcher.vectors = vectors
+            self._version = version
+
+    def _rewritten(self, path: str) -> bool:
+        mtime = file_mtime(path)
+        if mtime == self.index_mtimes[path]:
+            return False
+        self.index_mtimes[path] = mtime
+        return True
+
+    async def readiness(self) -> dict[str, Any]:
+        """Whether the collections the server reads from exist, with their sizes.
+
+        Code snippets are searched in the vector index instead of the code
+        collection if one is loaded.
+        """
+        names = [self.settings.file_collection]
+        if self.vectors is None:
+            names.insert(0, self.settings.code_collection)
+
+        async def points(name: str) -> int | None:
+            try:
+                info = await self.qdrant.get_collection(name)
+            except (ApiException, ValueError):
+                # Qdrant is down or the collection is missing. The local mode
+                # raises ValueError for missing collections
+                return None
+            return info.points_count or 0
+
+        counts = await asyncio.gather(*[points(name) for name in names])
+        readiness = {
+            "ready": all(count is not None for count in counts),
+            "collections": dict(zip(names, counts)),
+        }
+        if self.vectors is not None:
+            readiness["vector_index"] = len(self.vectors)
+        return readiness
+
+    async def warmup(self) -> None:
+        """Opens connections and pages in the indexes before the first request."""
+        readiness = await self.readiness()
+        if not readiness["ready"]:
+            logger.warning(f"Collections are missing: {readiness['collections']}")
+        if self.vectors is not None:
+            # Reads the memory-mapped embeddings once
+            await asyncio.to_thread(self.vectors.search, [1.0] * self.vectors.dim, 1)
+        if self.settings.warmup_query:
+            try:
+                await self.code_searcher.search(
+                    query=self.settings.warmup_query,
+                    collection_name=self.settings.code_collection,
+                    hnsw_ef=self.settings.hnsw_ef,
+                    oversampling=self.settings.oversampling,
+                )
+            except (OpenAIError, ApiException, ValueError) as e:
+                logger.warning(f"Warmup query failed: {e}")
+
+    async def close(self) -> None:
+        await self.qdrant.close()
+        await self.openai.close()
+
+
+async def get_services(request: Request) -> Services:
+    services: Services = request.app.state.services
+    await services.refresh()
+    return services
+
+
+ServicesDep = Annotated[Services, Depends(get_services)]
+
+
+def create_app(settings: Settings | None = None) -> FastAPI:
+    """Builds the search server. Settings are read from the environment if unset.
+
+    Clients and indexes are created, warmed up and closed with the app's
+    lifespan, once per worker process. Usable as an app factory by uvicorn
+    (`--factory`) and gunicorn.
+    """
+    if settings is None:
+        settings = Settings.from_env()
+    # Workers started by uvicorn or gunicorn have no handler on the root logger,
+    # which drops the logs of index loads and reloads. A no-op under `service`
+    # with one worker, where absl has installed its own.
+    logging.basicConfig(level=logging.INFO)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        services = Services.create(settings)
+        try:
+            await services.warmup()
+            app.state.services = services
+            yield
+        finally:
+            await services.close()
+            mark_process_dead()
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.get("/api/search")
+    async def search(
+        request: Request,
+        query: str,
+        where: ChunkFilterDep,
+        services: ServicesDep,
+        limit: int = Query(default=5, ge=1, le=100),
+    ) -> Response:
+        logger.debug(f"Searching with query: {query}")
+
+        async def compute() -> dict[str, Any]:
+            result = await services.code_searcher.search(
+                query=query,
+                collection_name=settings.code_collection,
+                limit=limit,
+                hnsw_ef=settings.hnsw_ef,
+                oversampling=settings.oversampling,
+                where=where,
+            )
+            return {"result": result}
+
+        key = ("search", settings.code_collection, normalize_query(query), limit, where)
+        return await services.responses.respond(request, key, compute)
+
+    @app.get("/api/search/stream")
+    async def search_stream(
+        query: str,
+        where: ChunkFilterDep,
+        services: ServicesDep,
+        limit: int = Query(default=5, ge=1, le=100),
+    ) -> StreamingResponse:
+        logger.debug(f"Streaming search with query: {query}")
+
+        async def events() -> AsyncIterator[str]:
+            async for event in services.code_searcher.search_stream(
+                query=query,
+                collection_name=settings.code_collection,
+                limit=limit,
+                hnsw_ef=settings.hnsw_ef,
+                oversampling=settings.oversampling,
+                where=where,
+            ):
+                yield json.dumps(event) + "\n"
+
+        return StreamingResponse(events(), media_type="application/x-ndjson")
+
+    @app.post("/api/search/batch")
+    async def search_batch(
+        request: BatchSearchRequest, services: ServicesDep
+    ) -> dict[str, Any]:
+        if len(request.queries) > settings.max_batch_queries:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {settings.max_batch_queries} queries per request",
+            )
+        logger.debug(f"Searching with {len(request.queries)} queries")
+        result = await services.code_searcher.search_batch(
+            queries=request.queries,
+            collection_name=settings.code_collection,
+            limit=request.limit,
+            hnsw_ef=settings.hnsw_ef,
+            oversampling=settings.oversampling,
+            where=chunk_filter(
+                module=request.module,
+                kind=request.kind,
+                path_prefix=request.path_prefix,
+            ),
+        )
+        return {"result": result}
+
+    @app.get("/api/file")
+    async def fetch(
+        request: Request,
+        path: str,
+        services: ServicesDep,
+        start_line: int | None = Query(default=None, ge=1),
+        end_line: int | None = Query(default=None, ge=1),
+    ) -> Response:
+        if start_line is not None and end_line is not None and start_line > end_line:
+            raise HTTPException(status_code=400, detail="start_line is after end_line")
+        logger.debug(f"Fetching file at path: {path} [{start_line}, {end_line}]")
+
+        async def compute() -> dict[str, Any]:
+            result = await services.file_fetcher.fetch(
+                path=path,
+                collection_name=settings.file_collection,
+                start_line=start_line,
+                end_line=end_line,
+            )
+            return {"result": result}
+
+        key = ("file", settings.file_collection, path, start_line, end_line)
+        return await services.responses.respond(request, key, compute)
+
+    @app.get("/ready")
+    async def ready(services: ServicesDep) -> JSONResponse:
+        readiness = await services.readiness()
+        return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+    @app.get("/metrics")
+    async def metrics() -> Response:
+        return Response(latest(), media_type=CONTENT_TYPE_LATEST)
+
+    app.add_middleware(
+        MetricsMiddleware,
+        paths={route.path for route in app.routes if route.path.startswith("/api/")},
+        server_timing=settings.server_timing,
+    )
+
+    # Need to clone https://github.com/qdrant/demo-code-search in the docker container, run `npm run build`
+    # from the `frontend` directory, and then mount the `frontend/dist` directory.
+    if os.path.isdir(settings.frontend_dir):
+        app.mount("/", StaticFiles(directory=settings.frontend_dir, html=True))
+    else:
+        logger.warning(f"Frontend directory {settings.frontend_dir} does not exist")
+
+    return app
@@ -0,0 +1,199 @@
+import gzip
+import json
+import os
+import re
+import time
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from qdrant_client.http import models
+
+from src.fake_embedder import FakeQueryEmbedder, fake_embedding
+from src.server import create_app
+from src.settings import Settings
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path) -> FastAPI:
+    monkeypatch.setenv("OPENAI_API_KEY", "unused")
+    return create_app(
+        Settings(qdrant_host=":memory:", frontend_dir=str(tmp_path / "dist"))
+    )
+
+
+def write_lexical_index(index_file: str, texts: list[str]) -> None:
+    # Same format as written by the ingestion's `lexical_index`
+    token_pattern = r"[A-Za-z_][A-Za-z0-9_]*"
+    postings: dict[str, list[int]] = {}
+    for doc_id, text in enumerate(texts):
+        for token in {t.lower() for t in re.findall(token_pattern, text)}:
+            postings.setdefault(token, []).append(doc_id)
+    docs = chunk_payloads(texts)
+    del docs["text"]
+    index = {
+        "version": 2,
+        "token_pattern": token_pattern,
+        "ids": list(range(len(texts))),
+        "docs": docs,
+        "postings": postings,
+    }
+    with gzip.open(f"{index_file}.tmp", "wt", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(f"{index_file}.tmp", index_file)
+
+
+def write_vector_index(index_dir: str, texts: list[str]) -> None:
+    # Same format as written by the ingestion's `vector_export`: a new version
+    # directory, published by swapping the `current` symlink
+    version = f"v{time.time_ns()}"
+    os.makedirs(os.path.join(index_dir, version))
+    with gzip.open(os.path.join(index_dir, version, "payloads.json.gz"), "wt") as f:
+        json.dump(chunk_payloads(texts), f)
+    embeddings = np.stack([fake_embedding(text, 8) for text in texts])
+    np.save(os.path.join(index_dir, version, "embeddings.npy"), embeddings)
+    os.symlink(version, os.path.join(index_dir, "current.tmp"))
+    os.replace(
+        os.path.join(index_dir, "current.tmp"), os.path.join(index_dir, "current")
+    )
+
+
+def chunk_payloads(texts: list[str]) -> dict[str, list]:
+    return {
+        "file_path": ["src/lib.rs"] * len(texts),
+        "file_name": ["lib.rs"] * len(texts),
+        "start_line": [1] * len(texts),
+        "end_line": [1] * len(texts),
+        "text": texts,
+    }
+
+
+def snippets(response) -> list[str]:
+    return [result["context"]["snippet"] for result in response.json()["result"]]
+
+
+def create_collections(client: TestClient, text: str) -> None:
+    qdrant = client.app.state.services.qdrant
+    for name in ["qdrant-code", "qdrant-file"]:
+        client.portal.call(
+            lambda name=name: qdrant.create_collection(
+                name,
+                vectors_config=models.VectorParams(
+                    size=8, distance=models.Distance.COSINE
+                ),
+            )
+        )
+    upsert_code(client, text)
+
+
+def upsert_code(client: TestClient, text: str) -> None:
+    qdrant = client.app.state.services.qdrant
+    client.portal.call(
+        lambda: qdrant.upsert(
+            "qdrant-code",
+            points=[
+                models.PointStruct(
+                    id=0,
+                    vector=fake_embedding(text, 8).tolist(),
+                    payload={
+                        "file_name": "lib.rs",
+                        "file_path": "src/lib.rs",
+                        "text": text,
+                        "start_line": 1,
+                        "end_line": 1,
+                    },
+                )
+            ],
+        )
+    )
+
+
+def test_ready_once_collections_exist(app: FastAPI) -> None:
+    with TestClient(app) as client:
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json() == {
+            "ready": False,
+            "collections": {"qdrant-code": None, "qdrant-file": None},
+        }
+
+        create_collections(client, "fn main() {}")
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json() == {
+            "ready": True,
+            "collections": {"qdrant-code": 1, "qdrant-file": 0},
+        }
+
+
+def test_clients_are_closed_on_shutdown(app: FastAPI) -> None:
+    with TestClient(app) as client:
+        services = client.app.state.services
+        assert not services.openai.is_closed()
+
+    assert services.openai.is_closed()
+
+
+def test_search(app: FastAPI) -> None:
+    with TestClient(app) as client:
+        create_collections(client, "fn parse_config() {}")
+        client.app.state.services.code_searcher.embedder = FakeQueryEmbedder(8)
+
+        response = client.get("/api/search", params={"query": "parse config"})
+
+    assert response.status_code == 200
+    assert [r["context"]["snippet"] for r in response.json()["result"]] == [
+        "fn parse_config() {}"
+    ]
+
+
+def test_lexical_index_is_reloaded_when_rewritten(monkeypatch, tmp_path) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "unused")
+    index_file = str(tmp_path / "lexical_index.json.gz")
+    write_lexical_index(index_file, ["fn parse_config() {}"])
+    app = create_app(
+        Settings(
+            qdrant_host=":memory:",
+            frontend_dir=str(tmp_path / "dist"),
+            lexical_index=index_file,
+            index_version_ttl=0,
+        )
+    )
+
+    with TestClient(app) as client:
+        # Chunk texts are read from the code collection
+        create_collections(client, "fn parse_config() {}")
+        # Identifier queries found verbatim are answered without embedding
+        response = client.get("/api/search", params={"query": "parse_config"})
+        assert snippets(response) == ["fn parse_config() {}"]
+
+        upsert_code(client, "fn load_config() {}")
+        write_lexical_index(index_file, ["fn load_config() {}"])
+        os.utime(index_file, ns=(0, 0))
+        response = client.get("/api/search", params={"query": "load_config"})
+        assert snippets(response) == ["fn load_config() {}"]
+
+
+def test_vector_index_is_reloaded_when_rewritten(monkeypatch, tmp_path) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "unused")
+    index_dir = str(tmp_path / "vector_index")
+    write_vector_index(index_dir, ["fn parse_config() {}"])
+    app = create_app(
+        Settings(
+            qdrant_host=":memory:",
+            frontend_dir=str(tmp_path / "dist"),
+            vector_index=index_dir,
+            index_version_ttl=0,
+        )
+    )
+
+    with TestClient(app) as client:
+        client.app.state.services.code_searcher.embedder = FakeQueryEmbedder(8)
+        assert client.get("/ready").json()["vector_index"] == 1
+
+        write_vector_index(index_dir, ["fn load_config() {}", "fn save_config() {}"])
+        os.utime(os.path.join(index_dir, "current"), ns=(0, 0))
+        assert client.get("/ready").json()["vector_index"] == 2
+        response = client.get("/api/search", params={"query": "load config"})
+        assert snippets(response)[0] == "fn load_config() {}"
@@ -1,71 +1,168 @@
+import dataclasses
 import logging
-from typing import Any
+import os
 
 import uvicorn
 from absl import app as absl_app
 from absl import flags
-from fastapi import FastAPI
-from openai import AsyncOpenAI
-from qdrant_client import AsyncQdrantClient
-from starlette.staticfiles import StaticFiles
 
-from src.code_search import CodeSearcher
-from src.file_fetch import FileFetcher
-
-logging.basicConfig(level=logging.DEBUG)
+from src.server import create_app
+from src.settings import ENV_PREFIX, Settings
 
 FLAGS = flags.FLAGS
 
+_DEFAULTS = Settings()
+
 flags.DEFINE_string(
     "qdrant_host",
-    default="http://localhost:6333",
+    default=_DEFAULTS.qdrant_host,
     help="Qdrant host to connect to.",
 )
 flags.DEFINE_string(
     "code_collection",
-    default="qdrant-code",
+    default=_DEFAULTS.code_collection,
     help="Qdrant collection name for code snippets.",
 )
 flags.DEFINE_string(
     "file_collection",
-    default="qdrant-file",
+    default=_DEFAULTS.file_collection,
     help="Qdrant collection name for files",
 )
+flags.DEFINE_integer(
+    "embedding_dim",
+    default=_DEFAULTS.embedding_dim,
+    help="Dimension the code collection was indexed with, if its embeddings were "
+    "truncated. Query embeddings are truncated to match",
+)
+flags.DEFINE_integer(
+    "hnsw_ef",
+    default=_DEFAULTS.hnsw_ef,
+    help="Size of the HNSW candidate list at search time. Qdrant's default if unset",
+)
+flags.DEFINE_float(
+    "oversampling",
+    default=_DEFAULTS.oversampling,
+    help="Oversampling factor of quantized search before rescoring",
+)
+flags.DEFINE_integer(
+    "query_cache_size",
+    default=_DEFAULTS.query_cache_size,
+    help="Maximum number of cached query embeddings. 0 disables the cache",
+)
+flags.DEFINE_float(
+    "query_cache_ttl",
+    default=_DEFAULTS.query_cache_ttl,
+    help="Seconds a cached query embedding stays valid",
+)
+flags.DEFINE_float(
+    "embed_max_wait_ms",
+    default=_DEFAULTS.embed_max_wait_ms,
+    help="Milliseconds a query waits for others to share its embeddings request",
+)
+flags.DEFINE_integer(
+    "embed_max_batch_size",
+    default=_DEFAULTS.embed_max_batch_size,
+    help="Maximum number of queries embedded in a single request",
+)
+flags.DEFINE_integer(
+    "max_batch_queries",
+    default=_DEFAULTS.max_batch_queries,
+    help="Maximum number of queries in a single batch search request",
+)
+flags.DEFINE_string(
+    "lexical_index",
+    default=_DEFAULTS.lexical_index,
+    help="Lexical index written by the ingestion's lexical_index. Identifier "
+    "queries are answered from it and other queries merged with its results",
+)
+flags.DEFINE_string(
+    "vector_index",
+    default=_DEFAULTS.vector_index,
+    help="Directory of the vector index written by the ingestion's vector_export. "
+    "If set, code snippets are searched in process instead of in Qdrant",
+)
+flags.DEFINE_bool(
+    "server_timing",
+    default=_DEFAULTS.server_timing,
+    help="Report the durations of the stages of API requests in a Server-Timing "
+    "response header",
+)
+flags.DEFINE_integer(
+    "response_cache_mb",
+    default=_DEFAULTS.response_cache_mb,
+    help="Megabytes of encoded search and file responses cached until the index "
+    "changes. 0 disables the cache",
+)
+flags.DEFINE_integer(
+    "http_max_age",
+    default=_DEFAULTS.http_max_age,
+    help="Seconds clients may reuse a search or file response without revalidating",
+)
+flags.DEFINE_float(
+    "index_version_ttl",
+    default=_DEFAULTS.index_version_ttl,
+    help="Seconds between checks of the index version invalidating cached responses",
+)
+flags.DEFINE_string(
+    "manifest_file",
+    default=_DEFAULTS.manifest_file,
+    help="Manifest saved by the ingestion at the end of every run. Cached responses "
+    "are invalidated when it changes, as incremental runs keep the collections",
+)
+flags.DEFINE_integer(
+    "max_connections",
+    default=_DEFAULTS.max_connections,
+    help="Size of the connection pools to Qdrant and OpenAI of each worker",
+)
+flags.DEFINE_string(
+    "warmup_query",
+    default=_DEFAULTS.warmup_query,
+    help="Query searched at startup to open connections to OpenAI and Qdrant and "
+    "page in the index before the first request",
+)
+flags.DEFINE_string(
+    "frontend_dir",
+    default=_DEFAULTS.frontend_dir,
+    help="Directory of the built frontend served at the root path",
+)
 flags.DEFINE_integer("port", default=8000, help="Port number to run the FastAPI app on")
+flags.DEFINE_integer(
+    "workers",
+    default=1,
+    help="Number of worker processes. Each worker loads its own indexes and caches",
+)
 
 
 def main(argv):
     del argv  # Unused
 
-    qdrant = AsyncQdrantClient(FLAGS.qdrant_host)
-    openai = AsyncOpenAI()
-
-    code_searcher = CodeSearcher(qdrant=qdrant, openai=openai)
-    file_fetcher = FileFetcher(qdrant=qdrant)
-
-    app = FastAPI()
-
-    @app.get("/api/search")
-    async def search(query: str) -> dict[str, Any]:
-        logging.info(f"Searching with query: {query}")
-        result = await code_searcher.search(
-            query=query, collection_name=FLAGS.code_collection
+    settings = Settings(
+        **{
+            field.name: FLAGS[field.name].value
+            for field in dataclasses.fields(Settings)
+        }
+    )
+    if FLAGS.workers == 1:
+        uvicorn.run(create_app(settings), host="0.0.0.0", port=FLAGS.port)
+        return
+
+    # Workers are separate processes that import the app factory without flags,
+    # so they read the settings from the environment
+    for name in [name for name in os.environ if name.startswith(ENV_PREFIX)]:
+        del os.environ[name]
+    os.environ.update(settings.to_env())
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        logging.warning(
+            "PROMETHEUS_MULTIPROC_DIR is not set, so /metrics only reports the "
+            "worker answering the scrape"
         )
-        return {"result": result}
-
-    @app.get("/api/file")
-    async def fetch(path: str) -> dict[str, Any]:
-        logging.info(f"Fetching file at path: {path}")
-        result = await file_fetcher.fetch(
-            path=path, collection_name=FLAGS.file_collection
-        )
-        return {"result": result}
-
-    # Need to clone https://github.com/qdrant/demo-code-search in the docker container, run `npm run build`
-    # from the `frontend` directory, and then mount the `frontend/dist` directory.
-    app.mount("/", StaticFiles(directory="./frontend/dist", html=True))
-
-    uvicorn.run(app, host="0.0.0.0", port=FLAGS.port)
+    uvicorn.run(
+        "src.server:create_app",
+        factory=True,
+        host="0.0.0.0",
+        port=FLAGS.port,
+        workers=FLAGS.workers,
+    )
 
 
 if __name__ == "__main__":
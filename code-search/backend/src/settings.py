@@ -0,0 +1,69 @@
+import dataclasses
+import os
+import types
+import typing
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any
+
+ENV_PREFIX = "CODE_SEARCH_"
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Configuration of the search server.
+
+    Built from command line flags when the server is started with
+    `python -m src.service`. Workers started by uvicorn or gunicorn import
+    the app factory without flags, so they read the same settings from
+    `CODE_SEARCH_<NAME>` environment variables instead.
+    """
+
+    qdrant_host: str = "http://localhost:6333"
+    code_collection: str = "qdrant-code"
+    file_collection: str = "qdrant-file"
+    embedding_dim: int | None = None
+    hnsw_ef: int | None = None
+    oversampling: float | None = None
+    query_cache_size: int = 10_000
+    query_cache_ttl: float = 3600
+    embed_max_wait_ms: float = 2
+    embed_max_batch_size: int = 64
+    max_batch_queries: int = 100
+    lexical_index: str | None = None
+    vector_index: str | None = None
+    server_timing: bool = False
+    response_cache_mb: int = 64
+    http_max_age: int = 60
+    index_version_ttl: float = 5
+    manifest_file: str | None = None
+    max_connections: int = 64
+    warmup_query: str | None = None
+    frontend_dir: str = "./frontend/dist"
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ) -> "Settings":
+        hints = typing.get_type_hints(cls)
+        values = {}
+        for field in dataclasses.fields(cls):
+            value = environ.get(ENV_PREFIX + field.name.upper())
+            if value is not None:
+                values[field.name] = _parse(value, hints[field.name])
+        return cls(**values)
+
+    def to_env(self) -> dict[str, str]:
+        """Environment variables that `from_env` reads back as these settings."""
+        return {
+            ENV_PREFIX + field.name.upper(): str(value)
+            for field in dataclasses.fields(self)
+            if (value := getattr(self, field.name)) is not None
+        }
+
+
+def _parse(value: str, annotation: Any) -> Any:
+    if isinstance(annotation, types.UnionType):
+        # Optional settings, such as `int | None`
+        (annotation,) = [arg for arg in annotation.__args__ if arg is not type(None)]
+    if annotation is bool:
+        return value.lower() in ("1", "true", "yes")
+    return annotation(value)
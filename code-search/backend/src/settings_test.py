@@ -0,0 +1,21 @@
+from src.settings import Settings
+
+
+def test_settings_round_trip_through_env() -> None:
+    settings = Settings(
+        qdrant_host="http://qdrant:6333",
+        hnsw_ef=128,
+        oversampling=2.0,
+        lexical_index="/data/lexical_index.json.gz",
+        server_timing=True,
+    )
+
+    assert Settings.from_env(settings.to_env()) == settings
+
+
+def test_settings_from_env_defaults() -> None:
+    settings = Settings.from_env(
+        {"CODE_SEARCH_EMBEDDING_DIM": "512", "CODE_SEARCH_SERVER_TIMING": "false"}
+    )
+
+    assert settings == Settings(embedding_dim=512)
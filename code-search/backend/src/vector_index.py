@@ -0,0 +1,121 @@
+import gzip
+import json
+import os
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from src.chunk_filter import ChunkFilter, FilterMasks
+
+# Symlink to the published version of an export, swapped atomically
+CURRENT = "current"
+
+
+@dataclass
+class VectorHit:
+    doc_id: int
+    score: float
+
+
+class VectorIndex:
+    """Exact nearest neighbor search over code chunk embeddings, in process.
+
+    Loads the export written by the ingestion's `vector_export`: a memory-mapped
+    matrix of normalized embeddings and the payloads of their chunks, in the
+    version directory its `current` symlink points to. Queries
+    are ranked by cosine similarity with one matrix product, which for a corpus
+    that fits in memory is as fast as a round-trip to Qdrant.
+    """
+
+    def __init__(self, embeddings: np.ndarray, payloads: dict[str, list[Any]]) -> None:
+        num_docs = len(payloads["text"])
+        if len(embeddings) != num_docs:
+            raise ValueError(
+                f"{len(embeddings)} embeddings do not match {num_docs} payloads"
+            )
+        self.embeddings = embeddings
+        self.payloads = payloads
+        self.masks = FilterMasks(payloads)
+        # Rows of the chunks, to read the text of lexical matches from
+        self.rows = {
+            chunk: row
+            for row, chunk in enumerate(
+                zip(payloads["file_path"], payloads["start_line"], payloads["end_line"])
+            )
+        }
+
+    @classmethod
+    def load(cls, index_dir: str) -> "VectorIndex":
+        current = os.path.join(index_dir, CURRENT)
+        # Resolved once, so that both files come from the same version even if
+        # the symlink is swapped meanwhile. Exports written before versioning
+        # are loaded from the directory itself.
+        if os.path.lexists(current):
+            index_dir = os.path.realpath(current)
+        # Paged in by the OS on first use rather than read upfront
+        embeddings = np.load(os.path.join(index_dir, "embeddings.npy"), mmap_mode="r")
+        with gzip.open(
+            os.path.join(index_dir, "payloads.json.gz"), "rt", encoding="utf-8"
+        ) as f:
+            payloads = json.load(f)
+        return cls(embeddings, payloads)
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    @property
+    def dim(self) -> int:
+        return self.embeddings.shape[1]
+
+    def search(
+        self, query_vector: list[float], limit: int, where: ChunkFilter | None = None
+    ) -> list[VectorHit]:
+        return self.search_batch([query_vector], limit, where)[0]
+
+    def search_batch(
+        self,
+        query_vectors: list[list[float]],
+        limit: int,
+        where: ChunkFilter | None = None,
+    ) -> list[list[VectorHit]]:
+        """Top `limit` chunks of every query, scanning the embeddings once."""
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        if queries.ndim != 2 or queries.shape[1] != self.dim:
+            raise ValueError(
+                f"Expected query vectors of dimension {self.dim}, got {queries.shape}"
+            )
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        # (num_queries, num_docs)
+        scores = queries @ self.embeddings.T
+        num_candidates = len(self)
+        if where:
+            mask = self.masks.mask(where)
+            scores[:, ~mask] = -np.inf
+            num_candidates = int(mask.sum())
+        limit = min(limit, num_candidates)
+        if limit == 0:
+            return [[] for _ in query_vectors]
+
+        # Partial selection of the top candidates, then a sort of only those
+        top = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [
+            [
+                VectorHit(int(doc_id), float(score))
+                for doc_id, score in zip(doc_ids, doc_scores)
+            ]
+            for doc_ids, doc_scores in zip(top, top_scores)
+        ]
+
+    def text(self, file_path: str, start_line: int, end_line: int) -> str | None:
+        """Text of a chunk, or None if the index does not hold it."""
+        row = self.rows.get((file_path, start_line, end_line))
+        return None if row is None else self.payloads["text"][row]
+
+    def payload(self, doc_id: int) -> dict[str, Any]:
+        """The chunk in the same format as its payload in Qdrant."""
+        return {field: values[doc_id] for field, values in self.payloads.items()}
@@ -0,0 +1,98 @@
+import gzip
+import json
+import os
+
+import numpy as np
+import pytest
+
+from src.chunk_filter import ChunkFilter
+from src.vector_index import VectorIndex
+
+PATHS = ["src/x.rs", "src/y.rs", "src/xy.rs"]
+EMBEDDINGS = np.asarray([[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]], dtype=np.float32)
+
+
+def write_index(index_dir: str) -> None:
+    # Same format as written by the ingestion's `vector_export`
+    np.save(os.path.join(index_dir, "embeddings.npy"), EMBEDDINGS)
+    payloads = {
+        "file_path": PATHS,
+        "file_name": [path.rsplit("/", 1)[-1] for path in PATHS],
+        "start_line": [1] * len(PATHS),
+        "end_line": [2] * len(PATHS),
+        "text": [f"// {path}" for path in PATHS],
+    }
+    with gzip.open(os.path.join(index_dir, "payloads.json.gz"), "wt") as f:
+        json.dump(payloads, f)
+
+
+def test_search_ranks_by_cosine_similarity(tmp_path) -> None:
+    write_index(tmp_path)
+    index = VectorIndex.load(tmp_path)
+
+    hits = index.search([2.0, 0.1], limit=2)
+
+    assert len(index) == 3
+    assert isinstance(index.embeddings, np.memmap)
+    assert [index.payload(hit.doc_id)["file_path"] for hit in hits] == [
+        "src/x.rs",
+        "src/xy.rs",
+    ]
+    assert hits[0].score == pytest.approx(2.0 / np.hypot(2.0, 0.1))
+
+
+def test_search_batch_matches_search(tmp_path) -> None:
+    write_index(tmp_path)
+    index = VectorIndex.load(tmp_path)
+    queries = [[0.1, 1.0], [1.0, 0.9], [1.0, -1.0]]
+
+    batch = index.search_batch(queries, limit=10)
+
+    for hits, query in zip(batch, queries):
+        single = index.search(query, limit=10)
+        assert [hit.doc_id for hit in hits] == [hit.doc_id for hit in single]
+        assert [hit.score for hit in hits] == pytest.approx(
+            [hit.score for hit in single]
+        )
+    assert [len(hits) for hits in batch] == [3, 3, 3]
+    assert [hit.doc_id for hit in batch[1]] == [2, 0, 1]
+
+
+def test_search_rejects_wrong_dimension(tmp_path) -> None:
+    write_index(tmp_path)
+    index = VectorIndex.load(tmp_path)
+
+    with pytest.raises(ValueError):
+        index.search([1.0, 0.0, 0.0], limit=1)
+
+
+def test_load_rejects_mismatched_payloads(tmp_path) -> None:
+    write_index(tmp_path)
+    np.save(os.path.join(tmp_path, "embeddings.npy"), EMBEDDINGS[:2])
+
+    with pytest.raises(ValueError):
+        VectorIndex.load(tmp_path)
+
+
+def test_search_with_filter(tmp_path) -> None:
+    write_index(tmp_path)
+    index = VectorIndex.load(tmp_path)
+
+    hits = index.search([1.0, 0.0], limit=5, where=ChunkFilter(path_prefix="src/"))
+    none = index.search([1.0, 0.0], limit=5, where=ChunkFilter(module="missing"))
+
+    assert [hit.doc_id for hit in hits] == [0, 2, 1]
+    assert none == []
+
+
+def test_load_follows_the_current_version(tmp_path) -> None:
+    # Ingestion writes every export to a new version directory
+    for version in ["v1", "v2"]:
+        os.makedirs(tmp_path / version)
+        write_index(tmp_path / version)
+    np.save(os.path.join(tmp_path, "v1", "embeddings.npy"), EMBEDDINGS[:2])
+    os.symlink("v2", tmp_path / "current")
+
+    index = VectorIndex.load(str(tmp_path))
+
+    assert len(index) == len(PATHS)
@@ -1,6 +1,19 @@
 #!/bin/bash
+set -e
 
-python src/code_split.py --input_dir=/qdrant --output_file=/data/code_chunks.parquet
+# Only files changed since the last successful run are re-ingested. Remove
+# /data/manifest.json to rebuild both collections from scratch.
+if [ "$PIPELINE" = "1" ]; then
+    # Split, embed and index concurrently without intermediate files
+    python src/pipeline.py --input_dir=/qdrant --workers=$(nproc) --qdrant_host=http://qdrant:6333 --manifest_file=/data/manifest.json --changes_file=/data/changes.json
+    python src/lexical_index.py --qdrant_host=http://qdrant:6333 --output_file=/data/lexical_index.json.gz --changes_file=/data/changes.json
+    python src/vector_export.py --qdrant_host=http://qdrant:6333 --output_dir=/data/vector_index --changes_file=/data/changes.json
+    exit 0
+fi
+
+python src/ingest.py --input_dir=/qdrant --output_file=/data/code_chunks.parquet --workers=$(nproc) --qdrant_host=http://qdrant:6333 --manifest_file=/data/manifest.json --changes_file=/data/changes.json
 python src/code_embed.py --input_file=/data/code_chunks.parquet --output_file=/data/code_embeddings.parquet
-python src/code_index.py --qdrant_host=http://qdrant:6333 --input_file=/data/code_embeddings.parquet
-python src/file_index.py --qdrant_host=http://qdrant:6333 --input_dir=/qdrant
+python src/code_index.py --qdrant_host=http://qdrant:6333 --input_file=/data/code_embeddings.parquet --changes_file=/data/changes.json
+python src/lexical_index.py --qdrant_host=http://qdrant:6333 --output_file=/data/lexical_index.json.gz --changes_file=/data/changes.json
+python src/vector_export.py --qdrant_host=http://qdrant:6333 --output_dir=/data/vector_index --changes_file=/data/changes.json
+python src/manifest_commit.py --changes_file=/data/changes.json --manifest_file=/data/manifest.json
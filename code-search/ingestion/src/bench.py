@@ -0,0 +1,257 @@
+import datetime
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any
+
+import pyarrow.parquet as pq
+from absl import app, flags
+
+from fake_openai import FakeEmbeddingsServer
+from synthetic_corpus import write_corpus
+
+FLAGS = flags.FLAGS
+logger = logging.getLogger(__name__)
+
+STAGES = [
+    "code_split",
+    "code_embed",
+    "code_index",
+    "file_index",
+    "ingest",
+    "pipeline",
+]
+
+flags.DEFINE_integer("num_files", default=1_000, help="Number of synthetic files")
+flags.DEFINE_integer(
+    "lines_per_file", default=300, help="Approximate lines per synthetic file"
+)
+flags.DEFINE_float(
+    "duplicate_ratio",
+    default=0.1,
+    help="Fraction of synthetic files copied from other files",
+)
+flags.DEFINE_list("stages", default=STAGES, help="Stages to benchmark, in order")
+flags.DEFINE_integer("workers", default=1, help="Worker processes for splitting")
+flags.DEFINE_integer("dim", default=1536, help="Embedding dimension")
+flags.DEFINE_float("latency", default=0.05, help="Fake server latency per request")
+flags.DEFINE_float(
+    "latency_per_input", default=0.0001, help="Fake server latency per input"
+)
+flags.DEFINE_string(
+    "bench_qdrant",
+    default=":memory:",
+    help="Qdrant location, the in-process local mode of every stage by default",
+)
+flags.DEFINE_string(
+    "work_dir",
+    default=None,
+    help="Directory for the corpus and intermediate files. A temporary "
+    "directory, deleted afterwards, if unset",
+)
+flags.DEFINE_string(
+    "output_file",
+    default="/tmp/ingestion_bench.json",
+    help="JSON file the results are written to",
+)
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# Runs a program's `main` in the child, timed after the interpreter has started
+# and the program's modules are imported
+STAGE_RUNNER = """
+import importlib
+import sys
+import time
+
+from absl import app
+
+timing_file, script, *args = sys.argv[1:]
+sys.argv = [script, *args]
+module = importlib.import_module(script.removesuffix(".py"))
+start = time.perf_counter()
+try:
+    app.run(module.main)
+finally:
+    with open(timing_file, "w") as f:
+        f.write(str(time.perf_counter() - start))
+"""
+
+
+def run_stage(
+    script: str, args: list[str], env: dict[str, str], log_file: str
+) -> tuple[float, float, float]:
+    """Runs an ingestion program to completion.
+
+    Returns the seconds spent in its `main`, the wall-clock seconds including
+    interpreter startup and imports, and the peak RSS in MB. The peak is that
+    of its largest process, the program itself or one of its workers, not their
+    sum.
+    """
+    timing_file = f"{log_file}.seconds"
+    with open(log_file, "w") as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-c", STAGE_RUNNER, timing_file, script, *args],
+            cwd=SRC_DIR,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        # Unlike `Popen.wait`, `wait4` returns the resource usage of the child
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError(f"{script} failed, see {log_file}")
+    with open(timing_file) as f:
+        elapsed = float(f.read())
+    # Kilobytes on Linux, bytes on macOS
+    scale = 1024 * 1024 if platform.system() == "Darwin" else 1024
+    return elapsed, wall, usage.ru_maxrss / scale
+
+
+def num_rows(parquet_file: str) -> int:
+    return pq.ParquetFile(parquet_file).metadata.num_rows
+
+
+def run_benchmarks(work_dir: str, base_url: str) -> dict[str, dict[str, Any]]:
+    corpus_dir = os.path.join(work_dir, "corpus")
+    chunks_file = os.path.join(work_dir, "code_chunks.parquet")
+    embeddings_file = os.path.join(work_dir, "code_embeddings.parquet")
+    qdrant = [f"--qdrant_host={FLAGS.bench_qdrant}"]
+    # Without the cache every run embeds all chunks
+    embed = ["--cache_file="]
+    dim = [f"--embedding_dim={FLAGS.dim}"]
+    split = [f"--input_dir={corpus_dir}", f"--workers={FLAGS.workers}"]
+
+    # Each stage's arguments and the units it processes
+    stages = {
+        "code_split": (
+            [*split, f"--output_file={chunks_file}"],
+            lambda: {"files": FLAGS.num_files, "chunks": num_rows(chunks_file)},
+        ),
+        "code_embed": (
+            [
+                *embed,
+                f"--input_file={chunks_file}",
+                f"--output_file={embeddings_file}",
+            ],
+            lambda: {"embeddings": num_rows(embeddings_file)},
+        ),
+        "code_index": (
+            [*qdrant, *dim, f"--input_file={embeddings_file}"],
+            lambda: {"points": num_rows(embeddings_file)},
+        ),
+        "file_index": (
+            [*qdrant, f"--input_dir={corpus_dir}"],
+            lambda: {"files": FLAGS.num_files},
+        ),
+        "ingest": (
+            [*split, *qdrant, f"--output_file={chunks_file}"],
+            lambda: {"files": FLAGS.num_files, "chunks": num_rows(chunks_file)},
+        ),
+        "pipeline": (
+            [*split, *qdrant, *embed, *dim, f"--embeddings_file={embeddings_file}"],
+            lambda: {
+                "files": FLAGS.num_files,
+                "embeddings": num_rows(embeddings_file),
+                "points": num_rows(embeddings_file),
+            },
+        ),
+    }
+
+    env = {**os.environ, "OPENAI_BASE_URL": base_url, "OPENAI_API_KEY": "fake"}
+    results = {}
+    for name in FLAGS.stages:
+        args, counts = stages[name]
+        log_file = os.path.join(work_dir, f"{name}.log")
+        elapsed, wall, peak_rss = run_stage(
+            f"{name}.py", args, env=env, log_file=log_file
+        )
+        startup = wall - elapsed
+        result: dict[str, Any] = {
+            "seconds": elapsed,
+            "startup_seconds": startup,
+            "peak_rss_mb": peak_rss,
+        }
+        for unit, count in counts().items():
+            result[unit] = count
+            result[f"{unit}_per_s"] = count / elapsed
+        results[name] = result
+
+        rates = ", ".join(
+            f"{value:.1f} {key.removesuffix('_per_s')}/s"
+            for key, value in result.items()
+            if key.endswith("_per_s")
+        )
+        logger.info(
+            f"{name}: {elapsed:.2f}s after {startup:.2f}s of startup, {rates}, "
+            f"peak RSS {peak_rss:.0f} MB"
+        )
+    return results
+
+
+def main(argv):
+    del argv  # Unused.
+
+    unknown = set(FLAGS.stages) - set(STAGES)
+    if unknown:
+        raise app.UsageError(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    work_dir = FLAGS.work_dir or tempfile.mkdtemp(prefix="ingestion_bench_")
+    try:
+        corpus_size = write_corpus(
+            os.path.join(work_dir, "corpus"),
+            num_files=FLAGS.num_files,
+            lines_per_file=FLAGS.lines_per_file,
+            duplicate_ratio=FLAGS.duplicate_ratio,
+        )
+        logger.info(
+            f"Generated {FLAGS.num_files} files ({corpus_size / 1e6:.1f} MB) "
+            f"in {work_dir}"
+        )
+        with FakeEmbeddingsServer(
+            dim=FLAGS.dim,
+            latency=FLAGS.latency,
+            latency_per_input=FLAGS.latency_per_input,
+        ) as server:
+            results = run_benchmarks(work_dir, base_url=server.base_url)
+    finally:
+        if FLAGS.work_dir is None:
+            shutil.rmtree(work_dir)
+
+    report = {
+        "timestamp": datetime.datetime.now(datetime.UTC).isoformat(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            name: FLAGS[name].value
+            for name in [
+                "num_files",
+                "lines_per_file",
+                "duplicate_ratio",
+                "workers",
+                "dim",
+                "latency",
+                "latency_per_input",
+                "bench_qdrant",
+            ]
+        },
+        "corpus_mb": corpus_size / 1e6,
+        "stages": results,
+    }
+    with open(FLAGS.output_file, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Saved results to {FLAGS.output_file}")
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,122 @@
+import functools
+import multiprocessing
+import os
+from collections.abc import Callable, Generator, Iterable
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+import pyarrow as pa
+from code_splitter import Language, TiktokenSplitter
+
+from file_collection import file_payloads
+from source_file import SourceFile
+from symbols import symbol_payload
+
+T = TypeVar("T")
+
+CHUNK_SCHEMA = pa.schema(
+    [
+        ("file_path", pa.string()),
+        ("file_name", pa.string()),
+        ("start_line", pa.int64()),
+        ("end_line", pa.int64()),
+        ("text", pa.string()),
+        ("size", pa.int64()),
+        # Symbol metadata, filtered on at search time
+        ("name", pa.string()),
+        ("signature", pa.string()),
+        ("code_type", pa.string()),
+        ("struct_name", pa.string()),
+        ("module", pa.string()),
+        ("path_prefixes", pa.list_(pa.string())),
+    ]
+)
+
+# Function run by the current worker process, bound to its own splitter
+_worker_fn: Callable[[str], Any] | None = None
+
+
+def split_source(
+    source: SourceFile, splitter: TiktokenSplitter
+) -> list[dict[str, Any]]:
+    chunks = []
+    for chunk in splitter.split(source.code):
+        text = source.text(chunk.start, chunk.end)
+        chunks.append(
+            {
+                "file_path": source.path,
+                "file_name": source.name,
+                "start_line": chunk.start,
+                "end_line": chunk.end,
+                "text": text,
+                "size": chunk.size,
+                **symbol_payload(source.path, text),
+            }
+        )
+    return chunks
+
+
+@dataclass
+class ProcessedFile:
+    path: str
+    hash: str
+    # Both unset when the file is unchanged since the previous manifest
+    chunks: list[dict[str, Any]] | None = None
+    payloads: list[dict[str, Any]] | None = None
+
+
+def process_file(
+    file_path: str,
+    splitter: TiktokenSplitter,
+    dir: str,
+    manifest: dict[str, str] | None = None,
+    with_payload: bool = False,
+) -> ProcessedFile:
+    """Reads a file once and derives everything ingestion needs from it.
+
+    Returns its chunks, and its file collection payloads if `with_payload` is
+    set, unless its hash matches the one recorded in `manifest`.
+    """
+    source = SourceFile.read(dir, path=os.path.relpath(file_path, dir))
+    processed = ProcessedFile(path=source.path, hash=source.hash)
+    if manifest is not None and manifest.get(source.path) == processed.hash:
+        return processed
+
+    processed.chunks = split_source(source, splitter)
+    if with_payload:
+        processed.payloads = file_payloads(source)
+    return processed
+
+
+def _init_worker(fn: Callable[..., Any], max_size: int) -> None:
+    global _worker_fn
+    splitter = TiktokenSplitter(Language.Rust, max_size=max_size)
+    _worker_fn = functools.partial(fn, splitter=splitter)
+
+
+def _run_in_worker(file_path: str) -> Any:
+    assert _worker_fn is not None, "Worker is not initialized"
+    return _worker_fn(file_path)
+
+
+def map_files(
+    fn: Callable[..., T], file_paths: Iterable[str], max_size: int, workers: int = 1
+) -> Generator[T, None, None]:
+    """Calls `fn(file_path, splitter=splitter)` on every file.
+
+    With several workers, files are fanned out to a process pool where every
+    worker owns one splitter. `fn` is sent once to each worker rather than with
+    every file. Results are yielded in input order regardless of the number of
+    workers, so a parallel run produces exactly the same output as a serial one.
+    """
+    if workers <= 1:
+        splitter = TiktokenSplitter(Language.Rust, max_size=max_size)
+        for file_path in file_paths:
+            yield fn(file_path, splitter=splitter)
+        return
+
+    with multiprocessing.Pool(
+        processes=workers, initializer=_init_worker, initargs=(fn, max_size)
+    ) as pool:
+        # `imap` returns results in submission order
+        yield from pool.imap(_run_in_worker, file_paths, chunksize=16)
@@ -0,0 +1,154 @@
+import uuid
+from dataclasses import dataclass
+
+import numpy as np
+import pyarrow as pa
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    CompressionRatio,
+    Distance,
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    HnswConfigDiff,
+    MatchAny,
+    PayloadSchemaType,
+    ProductQuantization,
+    ProductQuantizationConfig,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    VectorParams,
+)
+
+from streaming import batched
+
+
+@dataclass(frozen=True)
+class CodeCollectionConfig:
+    """Vector storage, quantization and HNSW settings of a code collection."""
+
+    # 1536 for `text-embedding-3-small` and 3072 for `text-embedding-3-large`
+    embedding_dim: int = 1536
+    # "none", "scalar" (int8), "product" or "binary". Search rescores with the
+    # original vectors
+    quantization: str = "none"
+    # Compression ratio of product quantization, such as "x16"
+    product_compression: str = CompressionRatio.X16.value
+    # Keep quantized vectors in RAM even when the originals are on disk
+    quantization_always_ram: bool = True
+    # Store original vectors on disk (memmap) instead of in RAM
+    on_disk: bool = False
+    # Qdrant's defaults if unset
+    hnsw_m: int | None = None
+    hnsw_ef_construct: int | None = None
+
+
+def chunk_id(file_path: str, start_line: int, end_line: int) -> str:
+    # Stable across runs so that re-uploading a chunk overwrites its point
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{file_path}:{start_line}:{end_line}"))
+
+
+def quantization_config(
+    config: CodeCollectionConfig,
+) -> ScalarQuantization | ProductQuantization | BinaryQuantization | None:
+    always_ram = config.quantization_always_ram
+    if config.quantization == "scalar":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8, quantile=0.99, always_ram=always_ram
+            )
+        )
+    if config.quantization == "product":
+        return ProductQuantization(
+            product=ProductQuantizationConfig(
+                compression=CompressionRatio(config.product_compression),
+                always_ram=always_ram,
+            )
+        )
+    if config.quantization == "binary":
+        return BinaryQuantization(
+            binary=BinaryQuantizationConfig(always_ram=always_ram)
+        )
+    return None
+
+
+def create_code_collection(
+    client: QdrantClient, collection_name: str, config: CodeCollectionConfig
+) -> None:
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=VectorParams(
+            size=config.embedding_dim,
+            distance=Distance.COSINE,
+            on_disk=config.on_disk,
+        ),
+        hnsw_config=HnswConfigDiff(
+            m=config.hnsw_m, ef_construct=config.hnsw_ef_construct
+        ),
+        quantization_config=quantization_config(config),
+    )
+    create_code_indexes(client, collection_name)
+
+
+def create_code_indexes(client: QdrantClient, collection_name: str) -> None:
+    """Indexes the payload fields chunks are deleted and filtered by. Idempotent."""
+    # Points are deleted by file path on incremental runs, and searches are
+    # filtered by module, kind of symbol and directory
+    for field_name in ["file_path", "module", "code_type", "path_prefixes"]:
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=PayloadSchemaType.KEYWORD,
+        )
+
+
+def delete_chunks(
+    client: QdrantClient, collection_name: str, file_paths: list[str]
+) -> None:
+    """Deletes the points of every chunk of `file_paths`."""
+    for batch in batched(file_paths, 1_000):
+        client.delete(
+            collection_name=collection_name,
+            points_selector=FilterSelector(
+                filter=Filter(
+                    must=[FieldCondition(key="file_path", match=MatchAny(any=batch))]
+                )
+            ),
+        )
+
+
+def embedding_matrix(batch: pa.RecordBatch, embedding_dim: int) -> np.ndarray:
+    """Stacks the embeddings of a batch into a contiguous float32 matrix."""
+    embeddings = batch.column("embedding")
+    matrix = embeddings.flatten().to_numpy().reshape(len(embeddings), -1)
+    return np.ascontiguousarray(matrix[:, :embedding_dim], dtype=np.float32)
+
+
+def upload_chunks(
+    client: QdrantClient,
+    collection_name: str,
+    batch: pa.RecordBatch,
+    embedding_dim: int,
+    batch_size: int,
+    parallel: int = 1,
+) -> None:
+    """Uploads a batch of chunks with an `embedding` column as points."""
+    # Payloads are converted column-wise by arrow, without the embeddings
+    payload_columns = [name for name in batch.schema.names if name != "embedding"]
+    payloads = batch.select(payload_columns).to_pylist()
+    ids = [
+        chunk_id(payload["file_path"], payload["start_line"], payload["end_line"])
+        for payload in payloads
+    ]
+
+    client.upload_collection(
+        collection_name=collection_name,
+        vectors=embedding_matrix(batch, embedding_dim),
+        payload=payloads,
+        ids=ids,
+        batch_size=batch_size,
+        parallel=parallel,
+    )
@@ -0,0 +1,42 @@
+from qdrant_client.models import (
+    BinaryQuantization,
+    CompressionRatio,
+    ProductQuantization,
+    ScalarQuantization,
+    ScalarType,
+)
+
+from code_collection import CodeCollectionConfig, quantization_config
+
+
+def test_quantization_config_none() -> None:
+    assert quantization_config(CodeCollectionConfig()) is None
+
+
+def test_quantization_config_scalar() -> None:
+    config = quantization_config(CodeCollectionConfig(quantization="scalar"))
+
+    assert isinstance(config, ScalarQuantization)
+    assert config.scalar.type == ScalarType.INT8
+    assert config.scalar.always_ram
+
+
+def test_quantization_config_product() -> None:
+    config = quantization_config(
+        CodeCollectionConfig(
+            quantization="product",
+            product_compression="x32",
+            quantization_always_ram=False,
+        )
+    )
+
+    assert isinstance(config, ProductQuantization)
+    assert config.product.compression == CompressionRatio.X32
+    assert not config.product.always_ram
+
+
+def test_quantization_config_binary() -> None:
+    config = quantization_config(CodeCollectionConfig(quantization="binary"))
+
+    assert isinstance(config, BinaryQuantization)
+    assert config.binary.always_ram
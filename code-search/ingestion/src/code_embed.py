@@ -1,9 +1,13 @@
+import asyncio
 import logging
+import time
 
 import pandas as pd
 from absl import app, flags
-from datasets import Dataset
-from openai import OpenAI
+from openai import AsyncOpenAI
+
+from embedder import Embedder
+from embedding_cache import EmbeddingCache
 
 FLAGS = flags.FLAGS
 
@@ -22,38 +26,88 @@ flags.DEFINE_string(
     default="text-embedding-3-small",
     help="OpenAI embedding model to use",
 )
+flags.DEFINE_string(
+    "cache_file",
+    default="/data/embedding_cache.sqlite",
+    help="SQLite file caching embeddings across runs. Empty to disable caching",
+)
+flags.DEFINE_integer(
+    "batch_tokens",
+    default=100_000,
+    help="Maximum number of tokens sent in a single embeddings request",
+)
+flags.DEFINE_integer(
+    "batch_inputs",
+    default=2048,
+    help="Maximum number of texts sent in a single embeddings request",
+)
+flags.DEFINE_integer(
+    "concurrency",
+    default=8,
+    help="Maximum number of embeddings requests in flight",
+)
+flags.DEFINE_integer(
+    "requests_per_minute",
+    default=3_000,
+    help="Embeddings requests per minute allowed by the OpenAI rate limit",
+)
+flags.DEFINE_integer(
+    "tokens_per_minute",
+    default=1_000_000,
+    help="Tokens per minute allowed by the OpenAI rate limit",
+)
+flags.DEFINE_integer(
+    "max_retries",
+    default=8,
+    help="Maximum number of retries of a rate limited or failed request",
+)
 
 
 def main(argv):
     del argv  # Unused.
 
     df = pd.read_parquet(FLAGS.input_file)
-    ds = Dataset.from_pandas(df)
-    logging.info(f"Loaded dataset with {len(ds)} records from {FLAGS.input_file}")
+    logging.info(f"Loaded {len(df)} records from {FLAGS.input_file}")
 
-    client = OpenAI()
-    model = FLAGS.model
+    df = df[df["text"].str.len() > 0].reset_index(drop=True)
 
-    def create_embeddings(batch: list[str], model: str) -> list[list[float]]:
-        response = client.embeddings.create(input=batch, model=model)
-        embeddings = [item.embedding for item in response.data]
-        return embeddings
-
-    ds = ds.filter(
-        lambda x: len(x["text"]) > 0,
+    # Retries are handled by the embedder which knows about rate limits
+    client = AsyncOpenAI(max_retries=0)
+    cache = EmbeddingCache(FLAGS.cache_file) if FLAGS.cache_file else None
+    embedder = Embedder(
+        client=client,
+        model=FLAGS.model,
+        cache=cache,
+        max_batch_tokens=FLAGS.batch_tokens,
+        max_batch_inputs=FLAGS.batch_inputs,
+        max_concurrency=FLAGS.concurrency,
+        requests_per_minute=FLAGS.requests_per_minute,
+        tokens_per_minute=FLAGS.tokens_per_minute,
+        max_retries=FLAGS.max_retries,
     )
 
-    ds = ds.map(
-        lambda x: {
-            "embedding": create_embeddings(batch=x["text"], model=model),
-        },
-        batched=True,
-        batch_size=32,
+    start = time.perf_counter()
+    df["embedding"] = asyncio.run(embedder.embed(df["text"].tolist()))
+    elapsed = time.perf_counter() - start
+    logging.info(
+        f"Embedded {len(df)} records in {elapsed:.1f}s with {embedder.num_requests} "
+        f"requests and {embedder.num_retries} retries"
+    )
+    logging.info(
+        f"Embedded {embedder.num_unique_texts} unique texts, "
+        f"dedup ratio {embedder.dedup_ratio:.1%}"
     )
 
-    ds.to_parquet(FLAGS.output_file)
+    df.to_parquet(FLAGS.output_file)
     logging.info(f"Saved embeddings to {FLAGS.output_file}")
 
+    if cache is not None:
+        logging.info(
+            f"Embedding cache {FLAGS.cache_file}: {cache.hits} hits, "
+            f"{cache.misses} misses"
+        )
+        cache.close()
+
 
 if __name__ == "__main__":
     app.run(main)
@@ -1,9 +1,20 @@
+import functools
 import logging
+import time
 
-import pandas as pd
+import pyarrow.parquet as pq
 from absl import app, flags
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, PointStruct, VectorParams
+
+from code_collection import (
+    create_code_collection,
+    create_code_indexes,
+    delete_chunks,
+    upload_chunks,
+)
+from collection_flags import code_collection_config
+from collection_versions import begin_update, publish
+from manifest import load_changes
 
 FLAGS = flags.FLAGS
 
@@ -20,46 +31,83 @@ flags.DEFINE_string(
 flags.DEFINE_string(
     "code_collection",
     default="qdrant-code",
-    help="Qdrant collection name for code snippets",
+    help="Qdrant alias for code snippets. Full runs upload to a new versioned "
+    "collection and move the alias to it once indexed",
+)
+flags.DEFINE_string(
+    "changes_file",
+    default=None,
+    help="Changes file written by code_split. Unless it describes a full run, "
+    "only the points of added, changed and removed files are replaced",
+)
+flags.DEFINE_integer(
+    "read_batch_size",
+    default=50_000,
+    help="Number of records read from the input file and uploaded at a time",
+)
+flags.DEFINE_integer(
+    "batch_size",
+    default=256,
+    help="Number of points sent to Qdrant in a single request",
 )
 flags.DEFINE_integer(
-    "embedding_dim",
-    # 1536 for `text-embedding-3-small` and 3072 for `text-embedding-3-large`
-    default=1536,
-    help="Embedding dimension",
+    "parallel",
+    default=1,
+    help="Number of parallel processes uploading points to Qdrant",
 )
 
 
 def main(argv):
     del argv  # Unused.
 
-    df = pd.read_parquet(FLAGS.input_file)
-    logging.info(f"Loaded {len(df)} records from {FLAGS.input_file}")
-
     client = QdrantClient(FLAGS.qdrant_host)
 
-    client.recreate_collection(
-        collection_name=FLAGS.code_collection,
-        vectors_config=VectorParams(
-            size=FLAGS.embedding_dim,
-            distance=Distance.COSINE,
+    changes = load_changes(FLAGS.changes_file) if FLAGS.changes_file else None
+    collection_name, incremental = begin_update(
+        client,
+        alias=FLAGS.code_collection,
+        incremental=changes is not None and not changes.full,
+        create_collection=functools.partial(
+            create_code_collection, config=code_collection_config()
         ),
     )
-    logging.info(f"Recreated collection {FLAGS.code_collection}")
+    if incremental:
+        # Collections created before the indexes existed get them too
+        create_code_indexes(client, collection_name)
+        delete_chunks(client, collection_name, changes.stale)
+        logging.info(
+            f"Deleted points of {len(changes.stale)} changed or removed files "
+            f"from collection {collection_name}"
+        )
 
-    # Record oriented upload
-    client.upload_points(
-        collection_name=FLAGS.code_collection,
-        points=[
-            PointStruct(
-                id=idx,
-                vector=row["embedding"][: FLAGS.embedding_dim].tolist(),
-                payload=row.drop(["embedding"]).to_dict(),
-            )
-            for idx, row in df.iterrows()
-        ],
+    # Column oriented upload, streamed from the input file
+    start = time.perf_counter()
+    num_points = 0
+    input_file = pq.ParquetFile(FLAGS.input_file)
+    for batch in input_file.iter_batches(batch_size=FLAGS.read_batch_size):
+        upload_chunks(
+            client,
+            collection_name=collection_name,
+            batch=batch,
+            embedding_dim=FLAGS.embedding_dim,
+            batch_size=FLAGS.batch_size,
+            parallel=FLAGS.parallel,
+        )
+        num_points += batch.num_rows
+    elapsed = time.perf_counter() - start
+    logging.info(
+        f"Uploaded {num_points} points from {FLAGS.input_file} to collection "
+        f"{collection_name} at {num_points / elapsed:.1f} points/s"
     )
-    logging.info(f"Uploaded {len(df)} points to collection {FLAGS.code_collection}")
+
+    if not incremental:
+        publish(
+            client,
+            alias=FLAGS.code_collection,
+            collection_name=collection_name,
+            keep_versions=FLAGS.keep_versions,
+            timeout=FLAGS.index_timeout,
+        )
 
 
 if __name__ == "__main__":
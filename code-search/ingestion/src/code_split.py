@@ -1,11 +1,15 @@
+import functools
 import logging
-import os
+import time
 from collections.abc import Generator
 from typing import Any
 
-import pandas as pd
 from absl import app, flags
-from code_splitter import Language, TiktokenSplitter
+
+from chunking import CHUNK_SCHEMA, map_files, process_file
+from manifest import diff_manifests, load_manifest, save_changes
+from source_file import find_files
+from streaming import write_parquet
 
 FLAGS = flags.FLAGS
 
@@ -22,47 +26,79 @@ flags.DEFINE_string(
     default="/data/code_chunks.parquet",
     help="Output parquet file with code chunk embeddings",
 )
-
-
-def walk(dir: str, max_size: int) -> Generator[dict[str, Any], None, None]:
-    splitter = TiktokenSplitter(Language.Rust, max_size=max_size)
-
-    for root, _, files in os.walk(dir):
-        for file in files:
-            if not file.endswith(".rs"):
-                continue
-
-            file_path = os.path.join(root, file)
-            rel_path = os.path.relpath(file_path, dir)
-
-            with open(file_path, mode="r", encoding="utf-8", errors="ignore") as f:
-                lines = f.readlines()
-
-            with open(file_path, mode="rb") as f:
-                code = f.read()
-                chunks = splitter.split(code)
-
-                for chunk in chunks:
-                    yield {
-                        "file_path": rel_path,
-                        "file_name": file,
-                        "start_line": chunk.start,
-                        "end_line": chunk.end,
-                        "text": "\n".join(lines[chunk.start : chunk.end]),
-                        "size": chunk.size,
-                    }
+flags.DEFINE_integer(
+    "workers",
+    default=1,
+    help="Number of worker processes splitting files in parallel",
+)
+flags.DEFINE_integer(
+    "row_group_size",
+    default=10_000,
+    help="Number of chunks buffered in memory per parquet row group",
+)
+flags.DEFINE_string(
+    "manifest_file",
+    default=None,
+    help="Manifest of file hashes from the previous run. When set, only added "
+    "and changed files are split and the difference is written to --changes_file",
+)
+flags.DEFINE_string(
+    "changes_file",
+    default="/data/changes.json",
+    help="Output file listing added, changed and removed files",
+)
 
 
 def main(argv):
     del argv  # Unused.
 
-    chunks = list(walk(dir=FLAGS.input_dir, max_size=FLAGS.max_size))
-    logging.info(f"Found {len(chunks)} chunks in {FLAGS.input_dir}")
-
-    # Convert to DataFrame and save to parquet
-    df = pd.DataFrame(chunks)
-    df.to_parquet(FLAGS.output_file)
-    logging.info(f"Saved chunks to {FLAGS.output_file}")
+    previous_manifest = None
+    if FLAGS.manifest_file is not None:
+        previous_manifest = load_manifest(FLAGS.manifest_file)
+    manifest = {}
+    num_files = 0
+
+    def chunks() -> Generator[dict[str, Any], None, None]:
+        nonlocal num_files
+        # Each file is read once, both to hash and to split it
+        for processed in map_files(
+            functools.partial(
+                process_file, dir=FLAGS.input_dir, manifest=previous_manifest
+            ),
+            find_files(FLAGS.input_dir),
+            max_size=FLAGS.max_size,
+            workers=FLAGS.workers,
+        ):
+            manifest[processed.path] = processed.hash
+            if processed.chunks is not None:
+                num_files += 1
+                yield from processed.chunks
+
+    # Chunks are streamed to parquet so memory use does not grow with the repo
+    start = time.perf_counter()
+    num_chunks = write_parquet(
+        chunks(),
+        output_file=FLAGS.output_file,
+        row_group_size=FLAGS.row_group_size,
+        schema=CHUNK_SCHEMA,
+    )
+    elapsed = time.perf_counter() - start
+    logging.info(
+        f"Saved {num_chunks} chunks from {num_files} files in {FLAGS.input_dir} "
+        f"to {FLAGS.output_file}"
+    )
+    logging.info(
+        f"Split throughput with {FLAGS.workers} workers: "
+        f"{num_files / elapsed:.1f} files/s, {num_chunks / elapsed:.1f} chunks/s"
+    )
+
+    if FLAGS.manifest_file is not None:
+        changes = diff_manifests(previous_manifest, manifest)
+        save_changes(changes, FLAGS.changes_file)
+        logging.info(
+            f"Saved changes to {FLAGS.changes_file}: {len(changes.added)} added, "
+            f"{len(changes.changed)} changed, {len(changes.removed)} removed"
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+from typing import Any
+
+import pyarrow.parquet as pq
+
+CODE_SPLIT = os.path.join(os.path.dirname(__file__), "code_split.py")
+
+
+def write_crate(dir: str, num_files: int) -> None:
+    for i in range(num_files):
+        module_dir = os.path.join(dir, f"module{i % 4}")
+        os.makedirs(module_dir, exist_ok=True)
+        functions = [
+            f"pub fn f{i}_{j}(x: i32) -> i32 {{\n    let y = x * {j};\n    y + {i}\n}}\n"
+            for j in range(i % 7 + 1)
+        ]
+        with open(os.path.join(module_dir, f"file{i}.rs"), mode="w") as f:
+            f.write("\n".join(functions))
+
+
+def split(input_dir: str, output_file: str, workers: int) -> None:
+    subprocess.run(
+        [
+            sys.executable,
+            CODE_SPLIT,
+            f"--input_dir={input_dir}",
+            f"--output_file={output_file}",
+            f"--workers={workers}",
+            "--max_size=64",
+        ],
+        check=True,
+    )
+
+
+def test_parallel_split_matches_serial(tmp_path: Any) -> None:
+    input_dir = str(tmp_path / "crate")
+    write_crate(input_dir, num_files=40)
+
+    split(input_dir, str(tmp_path / "serial.parquet"), workers=1)
+    split(input_dir, str(tmp_path / "parallel.parquet"), workers=3)
+
+    serial = pq.read_table(tmp_path / "serial.parquet")
+    parallel = pq.read_table(tmp_path / "parallel.parquet")
+    assert serial.num_rows > 40
+    assert len(set(serial.column("file_path").to_pylist())) == 40
+    assert parallel.equals(serial)
@@ -0,0 +1,71 @@
+from absl import flags
+from qdrant_client.models import CompressionRatio
+
+from code_collection import CodeCollectionConfig
+
+FLAGS = flags.FLAGS
+
+# Defined once for every step that creates or publishes a collection
+flags.DEFINE_integer(
+    "keep_versions",
+    default=1,
+    help="Number of previous collection versions kept for rollbacks",
+)
+flags.DEFINE_float(
+    "index_timeout",
+    default=3600,
+    help="Seconds to wait for a new collection version to be indexed",
+)
+flags.DEFINE_integer(
+    "embedding_dim",
+    # 1536 for `text-embedding-3-small` and 3072 for `text-embedding-3-large`
+    default=1536,
+    help="Embedding dimension",
+)
+flags.DEFINE_enum(
+    "quantization",
+    default="none",
+    enum_values=["none", "scalar", "product", "binary"],
+    help="Vector quantization: scalar int8, product or binary. Search rescores "
+    "with the original vectors",
+)
+flags.DEFINE_enum(
+    "product_compression",
+    default="x16",
+    enum_values=[ratio.value for ratio in CompressionRatio],
+    help="Compression ratio of product quantization",
+)
+flags.DEFINE_bool(
+    "quantization_always_ram",
+    default=True,
+    help="Keep quantized vectors in RAM even when the originals are on disk",
+)
+flags.DEFINE_bool(
+    "on_disk",
+    default=False,
+    help="Store original vectors on disk (memmap) instead of in RAM",
+)
+flags.DEFINE_integer(
+    "hnsw_m",
+    default=None,
+    help="Number of edges per node in the HNSW graph. Qdrant's default if unset",
+)
+flags.DEFINE_integer(
+    "hnsw_ef_construct",
+    default=None,
+    help="Number of neighbours considered while building the HNSW graph. "
+    "Qdrant's default if unset",
+)
+
+
+def code_collection_config() -> CodeCollectionConfig:
+    """Configuration of new code collections, from the flags."""
+    return CodeCollectionConfig(
+        embedding_dim=FLAGS.embedding_dim,
+        quantization=FLAGS.quantization,
+        product_compression=FLAGS.product_compression,
+        quantization_always_ram=FLAGS.quantization_always_ram,
+        on_disk=FLAGS.on_disk,
+        hnsw_m=FLAGS.hnsw_m,
+        hnsw_ef_construct=FLAGS.hnsw_ef_construct,
+    )
@@ -0,0 +1,127 @@
+import logging
+import re
+import time
+from collections.abc import Callable
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    CollectionStatus,
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def new_version(alias: str) -> str:
+    """Name of a new collection version served under `alias`."""
+    return f"{alias}-v{time.time_ns()}"
+
+
+def list_versions(client: QdrantClient, alias: str) -> list[str]:
+    """Versions of `alias` from oldest to newest."""
+    pattern = re.compile(rf"{re.escape(alias)}-v(\d+)")
+    versions = [
+        (int(match.group(1)), collection.name)
+        for collection in client.get_collections().collections
+        if (match := pattern.fullmatch(collection.name))
+    ]
+    return [name for _, name in sorted(versions)]
+
+
+def resolve_alias(client: QdrantClient, alias: str) -> str | None:
+    for description in client.get_aliases().aliases:
+        if description.alias_name == alias:
+            return description.collection_name
+    return None
+
+
+def exists(client: QdrantClient, name: str) -> bool:
+    """Whether `name` is an alias or a collection."""
+    return resolve_alias(client, name) is not None or client.collection_exists(name)
+
+
+def begin_update(
+    client: QdrantClient,
+    alias: str,
+    incremental: bool,
+    create_collection: Callable[[QdrantClient, str], None],
+) -> tuple[str, bool]:
+    """Picks the collection an ingestion run writes to.
+
+    Incremental runs write straight to the live collection behind `alias`.
+    Otherwise, or if there is nothing to update, a new version is created.
+    Returns the collection name and whether the run is incremental.
+    """
+    if incremental and not exists(client, alias):
+        logger.warning(f"Collection {alias} does not exist, creating a new version")
+        incremental = False
+
+    if incremental:
+        return alias, True
+
+    collection_name = new_version(alias)
+    create_collection(client, collection_name)
+    logger.info(f"Created collection {collection_name}")
+    return collection_name, False
+
+
+def wait_until_indexed(
+    client: QdrantClient,
+    collection_name: str,
+    timeout: float,
+    poll_interval: float = 1.0,
+) -> None:
+    """Waits until Qdrant has finished optimizing and indexing the collection."""
+    deadline = time.monotonic() + timeout
+    while client.get_collection(collection_name).status != CollectionStatus.GREEN:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Collection {collection_name} is still being indexed")
+        time.sleep(poll_interval)
+
+
+def swap_alias(client: QdrantClient, alias: str, collection_name: str) -> None:
+    """Atomically points `alias` at `collection_name`."""
+    operations = []
+    if resolve_alias(client, alias) is not None:
+        operations.append(
+            DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias))
+        )
+    elif client.collection_exists(alias):
+        # A collection created before versioning occupies the alias name. It has
+        # to go before the alias can be created, which is a one-off gap in service.
+        logger.warning(f"Deleting unversioned collection {alias}")
+        client.delete_collection(alias)
+    operations.append(
+        CreateAliasOperation(
+            create_alias=CreateAlias(collection_name=collection_name, alias_name=alias)
+        )
+    )
+    client.update_collection_aliases(change_aliases_operations=operations)
+
+
+def publish(
+    client: QdrantClient,
+    alias: str,
+    collection_name: str,
+    keep_versions: int,
+    timeout: float,
+) -> None:
+    """Serves `collection_name` under `alias` once it is fully indexed.
+
+    The `keep_versions` most recent previous versions are kept for rollbacks and
+    older ones are deleted.
+    """
+    wait_until_indexed(client, collection_name, timeout=timeout)
+    swap_alias(client, alias, collection_name)
+    logger.info(f"Alias {alias} now points to collection {collection_name}")
+
+    previous = [
+        name for name in list_versions(client, alias) if name != collection_name
+    ]
+    stale = previous[: max(0, len(previous) - keep_versions)]
+    for name in stale:
+        client.delete_collection(name)
+        logger.info(f"Deleted previous version {name}")
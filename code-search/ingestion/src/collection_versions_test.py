@@ -0,0 +1,101 @@
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, VectorParams
+
+from collection_versions import (
+    begin_update,
+    list_versions,
+    new_version,
+    publish,
+    resolve_alias,
+    swap_alias,
+)
+
+ALIAS = "qdrant-code"
+
+
+def create_collection(client: QdrantClient, collection_name: str) -> None:
+    client.create_collection(
+        collection_name, vectors_config=VectorParams(size=4, distance=Distance.COSINE)
+    )
+
+
+def test_new_version() -> None:
+    first = new_version(ALIAS)
+    second = new_version(ALIAS)
+
+    assert first.startswith(f"{ALIAS}-v")
+    assert first != second
+
+
+def test_swap_alias() -> None:
+    client = QdrantClient(":memory:")
+    create_collection(client, f"{ALIAS}-v1")
+    create_collection(client, f"{ALIAS}-v2")
+
+    swap_alias(client, ALIAS, f"{ALIAS}-v1")
+    assert resolve_alias(client, ALIAS) == f"{ALIAS}-v1"
+
+    swap_alias(client, ALIAS, f"{ALIAS}-v2")
+    assert resolve_alias(client, ALIAS) == f"{ALIAS}-v2"
+    assert [alias.alias_name for alias in client.get_aliases().aliases] == [ALIAS]
+
+
+def test_swap_alias_replaces_unversioned_collection() -> None:
+    client = QdrantClient(":memory:")
+    create_collection(client, ALIAS)
+    create_collection(client, f"{ALIAS}-v1")
+
+    swap_alias(client, ALIAS, f"{ALIAS}-v1")
+
+    assert resolve_alias(client, ALIAS) == f"{ALIAS}-v1"
+    assert [c.name for c in client.get_collections().collections] == [f"{ALIAS}-v1"]
+
+
+def test_publish_prunes_old_versions() -> None:
+    client = QdrantClient(":memory:")
+    for version in [3, 1, 10, 2]:
+        create_collection(client, f"{ALIAS}-v{version}")
+    # Other aliases' versions are left alone
+    create_collection(client, "qdrant-file-v1")
+
+    publish(client, ALIAS, f"{ALIAS}-v10", keep_versions=2, timeout=10)
+
+    assert resolve_alias(client, ALIAS) == f"{ALIAS}-v10"
+    assert list_versions(client, ALIAS) == [
+        f"{ALIAS}-v2",
+        f"{ALIAS}-v3",
+        f"{ALIAS}-v10",
+    ]
+    assert client.collection_exists("qdrant-file-v1")
+
+
+def test_begin_update_incremental() -> None:
+    client = QdrantClient(":memory:")
+    create_collection(client, f"{ALIAS}-v1")
+    swap_alias(client, ALIAS, f"{ALIAS}-v1")
+
+    assert begin_update(client, ALIAS, True, create_collection) == (ALIAS, True)
+    assert list_versions(client, ALIAS) == [f"{ALIAS}-v1"]
+
+
+def test_begin_update_full_rebuild() -> None:
+    client = QdrantClient(":memory:")
+    create_collection(client, f"{ALIAS}-v1")
+    swap_alias(client, ALIAS, f"{ALIAS}-v1")
+
+    collection_name, incremental = begin_update(client, ALIAS, False, create_collection)
+
+    assert not incremental
+    assert list_versions(client, ALIAS) == [f"{ALIAS}-v1", collection_name]
+    # Still served from the previous version until published
+    assert resolve_alias(client, ALIAS) == f"{ALIAS}-v1"
+
+
+def test_begin_update_falls_back_without_alias() -> None:
+    client = QdrantClient(":memory:")
+
+    collection_name, incremental = begin_update(client, ALIAS, True, create_collection)
+
+    assert not incremental
+    assert collection_name.startswith(f"{ALIAS}-v")
+    assert client.collection_exists(collection_name)
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import time
+
+import numpy as np
+from absl import app, flags
+from openai import AsyncOpenAI, OpenAI
+
+from embedder import Embedder
+from fake_openai import FakeEmbeddingsServer
+
+FLAGS = flags.FLAGS
+logger = logging.getLogger(__name__)
+
+flags.DEFINE_integer("num_texts", default=2_000, help="Number of texts to embed")
+flags.DEFINE_integer("text_tokens", default=200, help="Approximate tokens per text")
+flags.DEFINE_float("latency", default=0.2, help="Fake server latency per request")
+flags.DEFINE_float(
+    "latency_per_input", default=0.0005, help="Fake server latency per input"
+)
+flags.DEFINE_integer(
+    "requests_per_minute", default=600, help="Fake server requests per minute limit"
+)
+flags.DEFINE_integer(
+    "tokens_per_minute", default=2_000_000, help="Fake server tokens per minute limit"
+)
+flags.DEFINE_integer(
+    "batch_tokens", default=20_000, help="Token budget of a single request"
+)
+flags.DEFINE_integer("concurrency", default=8, help="Requests in flight")
+
+MODEL = "text-embedding-3-small"
+DIM = 256
+
+
+def synthetic_texts(n: int, text_tokens: int) -> list[str]:
+    # Roughly 4 characters per token
+    line = "let x = compute(y);\n"
+    return [
+        f"fn function_{i}() {{\n{line * (text_tokens * 4 // len(line))}}}"
+        for i in range(n)
+    ]
+
+
+def run_sequential(base_url: str, texts: list[str]) -> list[list[float]]:
+    # The previous implementation: fixed 32 row batches, one request at a time
+    client = OpenAI(base_url=base_url, api_key="fake")
+    embeddings = []
+    for i in range(0, len(texts), 32):
+        response = client.embeddings.create(input=texts[i : i + 32], model=MODEL)
+        embeddings.extend(item.embedding for item in response.data)
+    return embeddings
+
+
+def run_concurrent(base_url: str, texts: list[str]) -> list[list[float]]:
+    embedder = Embedder(
+        client=AsyncOpenAI(base_url=base_url, api_key="fake", max_retries=0),
+        model=MODEL,
+        max_batch_tokens=FLAGS.batch_tokens,
+        max_concurrency=FLAGS.concurrency,
+        requests_per_minute=FLAGS.requests_per_minute,
+        tokens_per_minute=FLAGS.tokens_per_minute,
+    )
+    return asyncio.run(embedder.embed(texts))
+
+
+def main(argv):
+    del argv  # Unused.
+
+    texts = synthetic_texts(FLAGS.num_texts, FLAGS.text_tokens)
+    results = {}
+    for name, run in [("sequential", run_sequential), ("concurrent", run_concurrent)]:
+        with FakeEmbeddingsServer(
+            dim=DIM,
+            latency=FLAGS.latency,
+            latency_per_input=FLAGS.latency_per_input,
+            requests_per_minute=FLAGS.requests_per_minute,
+            tokens_per_minute=FLAGS.tokens_per_minute,
+        ) as server:
+            start = time.perf_counter()
+            results[name] = run(server.base_url, texts)
+            elapsed = time.perf_counter() - start
+        logger.info(
+            f"{name}: {len(texts) / elapsed:.1f} embeddings/s in {elapsed:.2f}s, "
+            f"{server.num_requests} requests, {server.num_rate_limited} rate limited"
+        )
+
+    assert np.allclose(results["sequential"], results["concurrent"]), (
+        "Embeddings are not returned in input order"
+    )
+
+
+if __name__ == "__main__":
+    app.run(main)
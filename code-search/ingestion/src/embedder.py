@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from typing import Any
+
+import openai
+import tiktoken
+from openai import AsyncOpenAI
+
+from embedding_cache import EmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying: rate limits, 5xx responses and network failures
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+)
+
+
+def pack_batches(
+    token_counts: Sequence[int], max_tokens: int, max_inputs: int
+) -> list[list[int]]:
+    """Greedily packs consecutive inputs into batches of indices.
+
+    Each batch holds at most `max_inputs` inputs and `max_tokens` tokens, except
+    that an input larger than `max_tokens` is sent in a batch of its own.
+    """
+    batches: list[list[int]] = []
+    batch: list[int] = []
+    batch_tokens = 0
+    for i, num_tokens in enumerate(token_counts):
+        if batch and (
+            batch_tokens + num_tokens > max_tokens or len(batch) >= max_inputs
+        ):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+        batch.append(i)
+        batch_tokens += num_tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class RateLimiter:
+    """Token buckets enforcing requests-per-minute and tokens-per-minute limits.
+
+    Time is read from `clock` and waited for with `sleep`, so both can be faked.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ) -> None:
+        self.capacities = (float(requests_per_minute), float(tokens_per_minute))
+        self.available = list(self.capacities)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated_at = clock()
+        self.lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        elapsed_minutes = (now - self.updated_at) / 60
+        self.updated_at = now
+        for i, capacity in enumerate(self.capacities):
+            self.available[i] = min(
+                capacity, self.available[i] + capacity * elapsed_minutes
+            )
+
+    async def acquire(self, num_tokens: int) -> None:
+        # Requests larger than the whole bucket would otherwise wait forever
+        needed = (1.0, min(float(num_tokens), self.capacities[1]))
+        # Callers are served one at a time in arrival order
+        async with self.lock:
+            while True:
+                self._refill()
+                wait_minutes = max(
+                    (need - available) / capacity
+                    for need, available, capacity in zip(
+                        needed, self.available, self.capacities
+                    )
+                )
+                if wait_minutes <= 0:
+                    for i, need in enumerate(needed):
+                        self.available[i] -= need
+                    return
+                await self.sleep(wait_minutes * 60)
+
+
+class Embedder:
+    """Embeds texts with concurrent, token-packed and rate-limited requests.
+
+    Embeddings are returned in input order. Identical texts are embedded once and
+    share the same vector. Texts found in `cache` are not sent to the API, and
+    every successful batch is written back to it immediately. Concurrent calls
+    share the rate limits and the maximum number of requests in flight.
+    """
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        model: str,
+        cache: EmbeddingCache | None = None,
+        max_batch_tokens: int = 100_000,
+        max_batch_inputs: int = 2048,
+        max_concurrency: int = 8,
+        requests_per_minute: int = 3_000,
+        tokens_per_minute: int = 1_000_000,
+        max_retries: int = 8,
+        max_backoff: float = 60.0,
+        encoding: tiktoken.Encoding | None = None,
+    ) -> None:
+        self.client = client
+        self.model = model
+        self.cache = cache
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_inputs = max_batch_inputs
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        # Tokenizer of the model unless given, which downloads it on first use
+        self.encoding = encoding or tiktoken.encoding_for_model(model)
+        self.num_requests = 0
+        self.num_retries = 0
+        self.num_texts = 0
+        self.num_unique_texts = 0
+        # Shared by concurrent `embed` calls, recreated for every event loop
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._limiter: RateLimiter | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+
+    @property
+    def dedup_ratio(self) -> float:
+        """Fraction of the texts seen so far that were duplicates."""
+        if self.num_texts == 0:
+            return 0.0
+        return 1 - self.num_unique_texts / self.num_texts
+
+    async def embed(self, texts: Sequence[str]) -> list[list[float]]:
+        # Vendored crates, generated code and boilerplate repeat the same chunks
+        unique_texts = list(dict.fromkeys(texts))
+        self.num_texts += len(texts)
+        self.num_unique_texts += len(unique_texts)
+
+        embeddings = dict(zip(unique_texts, await self._embed_unique(unique_texts)))
+        return [embeddings[text] for text in texts]
+
+    async def _embed_unique(self, texts: Sequence[str]) -> list[list[float]]:
+        if self.cache is not None:
+            embeddings = self.cache.get_many(model=self.model, texts=texts)
+        else:
+            embeddings = [None] * len(texts)
+
+        misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        token_counts = [
+            len(tokens)
+            for tokens in self.encoding.encode_ordinary_batch(
+                [texts[i] for i in misses]
+            )
+        ]
+        batches = pack_batches(
+            token_counts,
+            max_tokens=self.max_batch_tokens,
+            max_inputs=self.max_batch_inputs,
+        )
+        logger.info(
+            f"Embedding {len(misses)} texts with {sum(token_counts)} tokens "
+            f"in {len(batches)} requests"
+        )
+
+        limiter, semaphore = self._limits()
+
+        async def embed_batch(batch: list[int]) -> None:
+            batch_texts = [texts[misses[i]] for i in batch]
+            num_tokens = sum(token_counts[i] for i in batch)
+            async with semaphore:
+                batch_embeddings = await self._create(
+                    batch_texts, num_tokens=num_tokens, limiter=limiter
+                )
+            if self.cache is not None:
+                self.cache.put_many(
+                    model=self.model, texts=batch_texts, embeddings=batch_embeddings
+                )
+            for i, embedding in zip(batch, batch_embeddings):
+                embeddings[misses[i]] = embedding
+
+        await asyncio.gather(*(embed_batch(batch) for batch in batches))
+        return embeddings
+
+    def _limits(self) -> tuple[RateLimiter, asyncio.Semaphore]:
+        # Asyncio primitives are bound to the event loop they are first used in
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._limiter = RateLimiter(
+                self.requests_per_minute, self.tokens_per_minute
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._limiter, self._semaphore
+
+    async def _create(
+        self, texts: list[str], num_tokens: int, limiter: RateLimiter
+    ) -> list[list[float]]:
+        attempt = 0
+        while True:
+            await limiter.acquire(num_tokens)
+            self.num_requests += 1
+            try:
+                response = await self.client.embeddings.create(
+                    input=texts, model=self.model
+                )
+                return [item.embedding for item in response.data]
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                self.num_retries += 1
+                logger.warning(f"Retrying embeddings request in {delay:.2f}s: {e}")
+                await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        # Honor the server's hint when rate limited, full jitter otherwise
+        if isinstance(error, openai.APIStatusError):
+            retry_after = error.response.headers.get("retry-after")
+            if retry_after is not None:
+                try:
+                    return min(self.max_backoff, float(retry_after))
+                except ValueError:
+                    pass
+        return random.uniform(0, min(self.max_backoff, 2**attempt))
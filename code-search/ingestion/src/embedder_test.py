@@ -0,0 +1,184 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+
+import httpx
+import numpy as np
+import openai
+import pytest
+from openai import AsyncOpenAI
+
+from embedder import Embedder, RateLimiter, pack_batches
+from fake_openai import FakeEmbeddingsServer, fake_embedding
+
+DIM = 8
+
+
+class WordEncoding:
+    """Stands in for the model's tiktoken encoding, which is downloaded."""
+
+    def encode_ordinary_batch(self, texts: list[str]) -> list[list[str]]:
+        return [text.split() for text in texts]
+
+
+def test_pack_batches() -> None:
+    assert pack_batches([3, 3, 3, 10, 1], max_tokens=6, max_inputs=8) == [
+        [0, 1],
+        [2],
+        [3],
+        [4],
+    ]
+    assert pack_batches([1] * 5, max_tokens=100, max_inputs=2) == [[0, 1], [2, 3], [4]]
+
+
+def test_embed_deduplicates_texts() -> None:
+    texts = ["fn a() {}", "fn b() {}", "fn a() {}", "fn c() {}", "fn a() {}"]
+    with FakeEmbeddingsServer(dim=DIM) as server:
+        embedder = Embedder(
+            client=AsyncOpenAI(base_url=server.base_url, api_key="fake"),
+            model="text-embedding-3-small",
+            max_batch_inputs=1,
+            encoding=WordEncoding(),
+        )
+        embeddings = asyncio.run(embedder.embed(texts))
+
+        # One single-input request per unique text
+        assert server.num_requests == 3
+
+    assert len(embeddings) == len(texts)
+    for text, embedding in zip(texts, embeddings):
+        np.testing.assert_allclose(embedding, fake_embedding(text, DIM), rtol=1e-6)
+    assert embedder.num_texts == 5
+    assert embedder.num_unique_texts == 3
+    assert embedder.dedup_ratio == 0.4
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def api_error(
+    error_type: type[openai.APIStatusError], status_code: int, **headers: str
+) -> openai.APIStatusError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    response = httpx.Response(status_code, headers=headers, request=request)
+    return error_type("failed", response=response, body=None)
+
+
+class FlakyEmbeddings:
+    """Fails with the given errors first, then embeds every text as [len(text)].
+
+    Requests with more texts take longer, so concurrent batches complete out of
+    order.
+    """
+
+    def __init__(self, errors: list[Exception]) -> None:
+        self.errors = errors
+        self.requests: list[list[str]] = []
+
+    async def create(self, input: list[str], model: str) -> SimpleNamespace:
+        self.requests.append(input)
+        if self.errors:
+            raise self.errors.pop(0)
+        await asyncio.sleep(0.001 * len(input))
+        return SimpleNamespace(
+            data=[SimpleNamespace(embedding=[float(len(text))]) for text in input]
+        )
+
+
+def flaky_embedder(errors: list[Exception], **kwargs: Any) -> Embedder:
+    return Embedder(
+        client=SimpleNamespace(embeddings=FlakyEmbeddings(errors)),
+        model="text-embedding-3-small",
+        encoding=WordEncoding(),
+        max_backoff=0,
+        **kwargs,
+    )
+
+
+def test_rate_limiter_waits_for_tokens() -> None:
+    clock = FakeClock()
+    limiter = RateLimiter(
+        requests_per_minute=60, tokens_per_minute=600, clock=clock, sleep=clock.sleep
+    )
+
+    async def acquire_all() -> None:
+        await limiter.acquire(500)
+        # 400 more tokens than left, refilled at 10 tokens per second
+        await limiter.acquire(500)
+        # Larger than the bucket, so capped at its capacity
+        await limiter.acquire(1_000)
+
+    asyncio.run(acquire_all())
+
+    assert clock.sleeps == pytest.approx([40.0, 60.0])
+
+
+def test_rate_limiter_waits_for_requests() -> None:
+    clock = FakeClock()
+    limiter = RateLimiter(
+        requests_per_minute=2, tokens_per_minute=1_000, clock=clock, sleep=clock.sleep
+    )
+
+    async def acquire_all() -> None:
+        for _ in range(3):
+            await limiter.acquire(1)
+
+    asyncio.run(acquire_all())
+
+    assert clock.sleeps == pytest.approx([30.0])
+
+
+def test_embed_retries_rate_limits_and_server_errors() -> None:
+    embedder = flaky_embedder(
+        [
+            api_error(openai.RateLimitError, 429, **{"retry-after": "0"}),
+            api_error(openai.InternalServerError, 503),
+        ]
+    )
+
+    embeddings = asyncio.run(embedder.embed(["fn a() {}"]))
+
+    assert embeddings == [[9.0]]
+    assert len(embedder.client.embeddings.requests) == 3
+    assert embedder.num_retries == 2
+
+
+def test_embed_gives_up_after_max_retries() -> None:
+    embedder = flaky_embedder(
+        [api_error(openai.InternalServerError, 500) for _ in range(3)], max_retries=2
+    )
+
+    with pytest.raises(openai.InternalServerError):
+        asyncio.run(embedder.embed(["fn a() {}"]))
+    assert len(embedder.client.embeddings.requests) == 3
+
+
+def test_embed_does_not_retry_client_errors() -> None:
+    embedder = flaky_embedder([api_error(openai.BadRequestError, 400)])
+
+    with pytest.raises(openai.BadRequestError):
+        asyncio.run(embedder.embed(["fn a() {}"]))
+    assert embedder.num_retries == 0
+
+
+def test_embed_preserves_order_across_concurrent_batches() -> None:
+    # Batches of 1 to 4 texts of 1 to 4 words, the largest sent first
+    texts = [f"{'x ' * n}{i}" for n in range(4, 0, -1) for i in range(n)]
+    embedder = flaky_embedder(
+        [api_error(openai.RateLimitError, 429)], max_batch_tokens=16
+    )
+
+    embeddings = asyncio.run(embedder.embed(texts))
+
+    assert embeddings == [[float(len(text))] for text in texts]
+    assert embedder.num_requests > 2
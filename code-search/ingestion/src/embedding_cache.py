@@ -0,0 +1,85 @@
+import hashlib
+import sqlite3
+from collections.abc import Sequence
+
+import numpy as np
+
+from streaming import batched
+
+# Stays below SQLite's default limit on the number of query parameters
+_MAX_QUERY_PARAMS = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Content-addressed on-disk cache of embeddings keyed by (model, text hash).
+
+    Embeddings are committed as soon as they are stored, so a run that is killed
+    halfway resumes from the last stored batch instead of embedding it again.
+    """
+
+    def __init__(self, cache_file: str) -> None:
+        self.conn = sqlite3.connect(cache_file)
+        # Write-ahead logging keeps committed embeddings safe on crashes
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID
+            """
+        )
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model: str, texts: Sequence[str]) -> list[list[float] | None]:
+        """Returns the cached embedding of each text, or None on a cache miss."""
+        hashes = [text_hash(text) for text in texts]
+
+        found: dict[str, bytes] = {}
+        for batch in batched(set(hashes), _MAX_QUERY_PARAMS):
+            rows = self.conn.execute(
+                "SELECT text_hash, embedding FROM embeddings "
+                f"WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                [model, *batch],
+            )
+            found.update(rows)
+
+        embeddings = [
+            np.frombuffer(found[hash], dtype=np.float32).tolist()
+            if hash in found
+            else None
+            for hash in hashes
+        ]
+        num_hits = sum(embedding is not None for embedding in embeddings)
+        self.hits += num_hits
+        self.misses += len(embeddings) - num_hits
+        return embeddings
+
+    def put_many(
+        self, model: str, texts: Sequence[str], embeddings: Sequence[Sequence[float]]
+    ) -> None:
+        # OpenAI embeddings are float32, so storing them as such is lossless
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_hash, embedding) "
+            "VALUES (?, ?, ?)",
+            [
+                (
+                    model,
+                    text_hash(text),
+                    np.asarray(embedding, dtype=np.float32).tobytes(),
+                )
+                for text, embedding in zip(texts, embeddings)
+            ],
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
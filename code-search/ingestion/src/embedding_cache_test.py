@@ -0,0 +1,54 @@
+from typing import Any
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+MODEL = "text-embedding-3-small"
+
+
+def test_put_get_round_trip(tmp_path: Any) -> None:
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    embeddings = np.random.default_rng(0).random((2, 8), dtype=np.float32)
+
+    cache.put_many(MODEL, ["fn a() {}", "fn b() {}"], embeddings.tolist())
+    found = cache.get_many(MODEL, ["fn b() {}", "fn c() {}", "fn a() {}", "fn b() {}"])
+
+    # float32 embeddings are stored losslessly
+    a, b = embeddings.tolist()
+    assert found == [b, None, a, b]
+    assert cache.hits == 3
+    assert cache.misses == 1
+
+
+def test_keyed_by_model(tmp_path: Any) -> None:
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+
+    cache.put_many(MODEL, ["fn a() {}"], [[1.0] * 8])
+    cache.put_many("text-embedding-3-large", ["fn a() {}"], [[2.0] * 16])
+
+    assert cache.get_many(MODEL, ["fn a() {}"]) == [[1.0] * 8]
+    assert cache.get_many("text-embedding-3-large", ["fn a() {}"]) == [[2.0] * 16]
+    assert cache.get_many("text-embedding-ada-002", ["fn a() {}"]) == [None]
+
+
+def test_reopen_resumes(tmp_path: Any) -> None:
+    cache_file = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache(cache_file)
+    cache.put_many(MODEL, ["fn a() {}"], [[0.5] * 8])
+    # Not closed, as when a run is killed halfway
+    del cache
+
+    reopened = EmbeddingCache(cache_file)
+
+    assert reopened.get_many(MODEL, ["fn a() {}", "fn b() {}"]) == [[0.5] * 8, None]
+    assert (reopened.hits, reopened.misses) == (1, 1)
+    reopened.close()
+
+
+def test_get_many_more_texts_than_query_params(tmp_path: Any) -> None:
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    texts = [f"fn f{i}() {{}}" for i in range(1_200)]
+    cache.put_many(MODEL, texts, [[float(i)] for i in range(1_200)])
+
+    assert cache.get_many(MODEL, texts) == [[float(i)] for i in range(1_200)]
@@ -0,0 +1,175 @@
+import base64
+import collections
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Self
+
+import numpy as np
+
+# Words of identifiers, e.g. `HashMap::with_capacity` is hash, map, with, capacity
+_WORD = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+
+
+def fake_embedding(text: str, dim: int) -> np.ndarray:
+    """Deterministic unit vector of the words in `text`, hashed into `dim` buckets.
+
+    Texts sharing words are similar, so searches over fake embeddings return
+    meaningful results. The search backend's `fake_embedder` computes the same
+    vectors for queries. Texts without words get a vector seeded by their hash.
+    """
+    words = [word.lower() for word in _WORD.findall(text)]
+    if not words:
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        seed = int.from_bytes(digest[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(dim, dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in words:
+        digest = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest())
+        # The sign bit keeps unrelated words from adding up in the same bucket
+        vector[digest % dim] += 1.0 if digest >> 63 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = 1.0
+        return vector
+    return vector / norm
+
+
+class FakeEmbeddingsServer:
+    """Local stand-in for the OpenAI embeddings endpoint used in benchmarks.
+
+    Each request sleeps for `latency` seconds plus `latency_per_input` seconds
+    per input. Requests over the per-minute limits are rejected with 429 and a
+    `retry-after` header, like the real API. Token counts are approximated as
+    one token per 4 characters.
+
+    Point an OpenAI client at it with `base_url=server.base_url`.
+    """
+
+    def __init__(
+        self,
+        dim: int = 1536,
+        latency: float = 0.0,
+        latency_per_input: float = 0.0,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+    ) -> None:
+        self.dim = dim
+        self.latency = latency
+        self.latency_per_input = latency_per_input
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.num_requests = 0
+        self.num_rate_limited = 0
+        # (timestamp, tokens) of the requests accepted over the last minute
+        self._window: collections.deque[tuple[float, int]] = collections.deque()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self) -> Self:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _admit(self, num_tokens: int) -> float:
+        """Records the request and returns 0, or the seconds to wait if limited."""
+        with self._lock:
+            self.num_requests += 1
+            now = time.monotonic()
+            while self._window and self._window[0][0] <= now - 60:
+                self._window.popleft()
+            requests = len(self._window) + 1
+            tokens = sum(tokens for _, tokens in self._window) + num_tokens
+            if (self.requests_per_minute and requests > self.requests_per_minute) or (
+                self.tokens_per_minute and tokens > self.tokens_per_minute
+            ):
+                self.num_rate_limited += 1
+                return max(0.1, self._window[0][0] + 60 - now) if self._window else 1.0
+            self._window.append((now, num_tokens))
+            return 0.0
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                if self.path.rstrip("/") != "/v1/embeddings":
+                    self._send(404, {"error": {"message": "Not found"}})
+                    return
+
+                request = json.loads(
+                    self.rfile.read(int(self.headers["Content-Length"]))
+                )
+                inputs = request["input"]
+                if isinstance(inputs, str):
+                    inputs = [inputs]
+                num_tokens = sum(max(1, len(text) // 4) for text in inputs)
+
+                retry_after = server._admit(num_tokens)
+                if retry_after:
+                    self._send(
+                        429,
+                        {
+                            "error": {
+                                "message": "Rate limit reached",
+                                "type": "requests",
+                            }
+                        },
+                        headers={"retry-after": f"{retry_after:.3f}"},
+                    )
+                    return
+
+                time.sleep(server.latency + server.latency_per_input * len(inputs))
+                data = []
+                for i, text in enumerate(inputs):
+                    embedding: Any = fake_embedding(text, server.dim)
+                    if request.get("encoding_format") == "base64":
+                        embedding = base64.b64encode(embedding.tobytes()).decode()
+                    else:
+                        embedding = embedding.tolist()
+                    data.append(
+                        {"object": "embedding", "index": i, "embedding": embedding}
+                    )
+                self._send(
+                    200,
+                    {
+                        "object": "list",
+                        "data": data,
+                        "model": request["model"],
+                        "usage": {
+                            "prompt_tokens": num_tokens,
+                            "total_tokens": num_tokens,
+                        },
+                    },
+                )
+
+            def _send(
+                self, status: int, body: Any, headers: dict[str, str] | None = None
+            ) -> None:
+                content = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(content)
+
+        return Handler
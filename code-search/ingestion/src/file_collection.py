@@ -0,0 +1,92 @@
+from collections.abc import Iterable
+from typing import Any
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    MatchAny,
+    PayloadSchemaType,
+)
+
+from source_file import SourceFile
+from streaming import batched
+
+# Files are stored in blocks of lines so that a line range is fetched without
+# transferring the whole file
+LINES_PER_POINT = 200
+
+
+def file_payloads(
+    source: SourceFile, lines_per_point: int = LINES_PER_POINT
+) -> list[dict[str, Any]]:
+    """Payloads of the blocks of `lines_per_point` lines making up a file.
+
+    `startline` and `endline` are the 1-based inclusive line numbers of a block.
+    """
+    lines = source.lines()
+    return [
+        {
+            "path": source.path,
+            "code": lines[start : start + lines_per_point],
+            "startline": start + 1,
+            "endline": min(start + lines_per_point, len(lines)),
+        }
+        # An empty file still gets a point so that it can be found
+        for start in range(0, max(len(lines), 1), lines_per_point)
+    ]
+
+
+def create_file_indexes(client: QdrantClient, collection_name: str) -> None:
+    """Indexes the payload fields blocks are looked up by. Idempotent."""
+    for field_name, field_schema in [
+        ("path", PayloadSchemaType.KEYWORD),
+        ("startline", PayloadSchemaType.INTEGER),
+        ("endline", PayloadSchemaType.INTEGER),
+    ]:
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=field_schema,
+        )
+
+
+def create_file_collection(client: QdrantClient, collection_name: str) -> None:
+    client.create_collection(collection_name=collection_name, vectors_config={})
+    create_file_indexes(client, collection_name)
+
+
+def upload_files(
+    client: QdrantClient,
+    collection_name: str,
+    payloads: Iterable[dict[str, Any]],
+    batch_size: int,
+) -> int:
+    """Uploads file payloads in rolling batches of `batch_size` points.
+
+    Returns the number of uploaded points.
+    """
+    num_points = 0
+    for batch in batched(payloads, batch_size):
+        client.upload_collection(
+            collection_name=collection_name,
+            payload=batch,
+            vectors=[{}] * len(batch),
+            ids=None,
+            batch_size=batch_size,
+        )
+        num_points += len(batch)
+    return num_points
+
+
+def delete_files(client: QdrantClient, collection_name: str, paths: list[str]) -> None:
+    for batch in batched(paths, 1_000):
+        client.delete(
+            collection_name=collection_name,
+            points_selector=FilterSelector(
+                filter=Filter(
+                    must=[FieldCondition(key="path", match=MatchAny(any=batch))]
+                )
+            ),
+        )
@@ -0,0 +1,28 @@
+from typing import Any
+
+from file_collection import file_payloads
+from source_file import SourceFile
+
+
+def read(tmp_path: Any, code: str) -> SourceFile:
+    (tmp_path / "lib.rs").write_text(code)
+    return SourceFile.read(str(tmp_path), "lib.rs")
+
+
+def test_file_payloads(tmp_path: Any) -> None:
+    lines = [f"let x{i} = {i};\n" for i in range(5)]
+    source = read(tmp_path, "".join(lines))
+
+    assert file_payloads(source, lines_per_point=2) == [
+        {"path": "lib.rs", "code": lines[0:2], "startline": 1, "endline": 2},
+        {"path": "lib.rs", "code": lines[2:4], "startline": 3, "endline": 4},
+        {"path": "lib.rs", "code": lines[4:5], "startline": 5, "endline": 5},
+    ]
+
+
+def test_file_payloads_empty_file(tmp_path: Any) -> None:
+    source = read(tmp_path, "")
+
+    assert file_payloads(source) == [
+        {"path": "lib.rs", "code": [], "startline": 1, "endline": 0}
+    ]
@@ -1,10 +1,23 @@
 import logging
 import os
-from typing import Any, Generator
+from collections.abc import Generator, Iterable
+from typing import Any
 
 from absl import app, flags
 from qdrant_client import QdrantClient
 
+import collection_flags  # noqa: F401 - defines --keep_versions and --index_timeout
+from collection_versions import begin_update, publish
+from file_collection import (
+    create_file_collection,
+    create_file_indexes,
+    delete_files,
+    file_payloads,
+    upload_files,
+)
+from manifest import load_changes
+from source_file import SourceFile, find_files
+
 FLAGS = flags.FLAGS
 
 flags.DEFINE_string(
@@ -21,49 +34,74 @@ flags.DEFINE_string(
 flags.DEFINE_string(
     "file_collection",
     default="qdrant-file",
-    help="Qdrant collection name for files",
+    help="Qdrant alias for files. Full runs upload to a new versioned "
+    "collection and move the alias to it once indexed",
+)
+flags.DEFINE_integer(
+    "batch_size",
+    default=256,
+    help="Number of file blocks read into memory and uploaded at a time",
+)
+flags.DEFINE_string(
+    "changes_file",
+    default=None,
+    help="Changes file written by code_split. Unless it describes a full run, "
+    "only added, changed and removed files are re-indexed",
 )
 
 
-def walk(dir: str) -> Generator[dict[str, Any], None, None]:
-    for root, _, files in os.walk(dir):
-        for file in files:
-            if not file.endswith(".rs"):
-                continue
+def walk(
+    dir: str, rel_paths: Iterable[str] | None = None
+) -> Generator[dict[str, Any], None, None]:
+    if rel_paths is None:
+        rel_paths = (os.path.relpath(path, dir) for path in find_files(dir))
 
-            file_path = os.path.join(root, file)
-            rel_path = os.path.relpath(file_path, dir)
-            with open(file_path, mode="r", encoding="utf-8", errors="ignore") as f:
-                lines = f.readlines()
-                yield {
-                    "path": rel_path,
-                    "code": lines,
-                    "startline": 1,
-                    "endline": len(lines),
-                }
+    for rel_path in rel_paths:
+        yield from file_payloads(SourceFile.read(dir, rel_path))
 
 
 def main(argv):
     del argv  # Unused.
 
-    files = list(walk(FLAGS.input_dir))
-    logging.info(f"Found {len(files)} files in {FLAGS.input_dir}")
-
     client = QdrantClient(FLAGS.qdrant_host)
-    client.recreate_collection(
-        collection_name=FLAGS.file_collection,
-        vectors_config={},
+
+    changes = load_changes(FLAGS.changes_file) if FLAGS.changes_file else None
+    collection_name, incremental = begin_update(
+        client,
+        alias=FLAGS.file_collection,
+        incremental=changes is not None and not changes.full,
+        create_collection=create_file_collection,
     )
-    logging.info(f"Recreated collection {FLAGS.file_collection}")
+    rel_paths = None
+    if incremental:
+        # Collections created before the indexes existed get them too
+        create_file_indexes(client, collection_name)
+        delete_files(client, collection_name, changes.stale)
+        logging.info(
+            f"Deleted {len(changes.stale)} changed or removed files "
+            f"from collection {collection_name}"
+        )
+        rel_paths = changes.updated
 
-    client.upload_collection(
-        collection_name=FLAGS.file_collection,
-        payload=files,
-        vectors=[{}] * len(files),
-        ids=None,
-        batch_size=256,
+    num_points = upload_files(
+        client,
+        collection_name=collection_name,
+        payloads=walk(FLAGS.input_dir, rel_paths),
+        batch_size=FLAGS.batch_size,
     )
-    logging.info(f"Uploaded {len(files)} files to collection {FLAGS.file_collection}")
+    logging.info(
+        f"Uploaded {num_points} blocks of files in {FLAGS.input_dir} "
+        f"to collection {collection_name}"
+    )
+
+    if not incremental:
+        publish(
+            client,
+            alias=FLAGS.file_collection,
+            collection_name=collection_name,
+            keep_versions=FLAGS.keep_versions,
+            timeout=FLAGS.index_timeout,
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,119 @@
+import logging
+import time
+from collections.abc import Callable
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from absl import app, flags
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, PointStruct, VectorParams
+
+from code_collection import upload_chunks
+
+FLAGS = flags.FLAGS
+logger = logging.getLogger(__name__)
+
+flags.DEFINE_integer("num_points", default=20_000, help="Number of points to upload")
+flags.DEFINE_integer("dim", default=1536, help="Embedding dimension")
+flags.DEFINE_string(
+    "bench_file",
+    default="/tmp/index_bench.parquet",
+    help="Parquet file of synthetic code chunk embeddings",
+)
+flags.DEFINE_string(
+    "bench_qdrant",
+    default=":memory:",
+    help="Qdrant location, the in-process local mode by default",
+)
+
+COLLECTION = "bench-code"
+
+
+class NullClient:
+    """Discards uploads to measure client-side preparation cost only."""
+
+    def upload_points(self, collection_name: str, points: list) -> None:
+        pass
+
+    def upload_collection(self, collection_name: str, vectors, payload, **kwargs):
+        for _ in zip(vectors, payload):
+            pass
+
+
+def write_embeddings(file: str, num_points: int, dim: int) -> None:
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "file_path": [f"crate/src/module_{i // 10}.rs" for i in range(num_points)],
+            "file_name": [f"module_{i // 10}.rs" for i in range(num_points)],
+            "start_line": [i % 10 * 20 for i in range(num_points)],
+            "end_line": [i % 10 * 20 + 20 for i in range(num_points)],
+            "text": [f"fn function_{i}() {{}}" for i in range(num_points)],
+            "size": [64] * num_points,
+        }
+    )
+    df["embedding"] = list(rng.standard_normal((num_points, dim)))
+    df.to_parquet(file)
+
+
+def upload_rows(client: QdrantClient, file: str, dim: int) -> None:
+    # The previous implementation: one PointStruct per `df.iterrows()` row
+    df = pd.read_parquet(file)
+    client.upload_points(
+        collection_name=COLLECTION,
+        points=[
+            PointStruct(
+                id=idx,
+                vector=row["embedding"][:dim].tolist(),
+                payload=row.drop(["embedding"]).to_dict(),
+            )
+            for idx, row in df.iterrows()
+        ],
+    )
+
+
+def upload_columns(client: QdrantClient, file: str, dim: int) -> None:
+    for batch in pq.ParquetFile(file).iter_batches(batch_size=50_000):
+        upload_chunks(
+            client,
+            collection_name=COLLECTION,
+            batch=batch,
+            embedding_dim=dim,
+            batch_size=256,
+            parallel=1,
+        )
+
+
+def main(argv):
+    del argv  # Unused.
+
+    write_embeddings(FLAGS.bench_file, FLAGS.num_points, FLAGS.dim)
+
+    uploads: list[tuple[str, Callable]] = [
+        ("iterrows", upload_rows),
+        ("columnar", upload_columns),
+    ]
+    for client_name in ["null", FLAGS.bench_qdrant]:
+        for name, upload in uploads:
+            if client_name == "null":
+                client = NullClient()
+            else:
+                client = QdrantClient(client_name)
+                client.create_collection(
+                    collection_name=COLLECTION,
+                    vectors_config=VectorParams(
+                        size=FLAGS.dim, distance=Distance.COSINE
+                    ),
+                )
+            start = time.perf_counter()
+            upload(client, FLAGS.bench_file, FLAGS.dim)
+            elapsed = time.perf_counter() - start
+            logger.info(
+                f"{name} upload to {client_name} client: "
+                f"{FLAGS.num_points / elapsed:.1f} points/s in {elapsed:.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,172 @@
+import functools
+import logging
+import time
+
+from absl import app, flags
+from qdrant_client import QdrantClient
+
+import collection_flags  # noqa: F401 - defines --keep_versions and --index_timeout
+from chunking import CHUNK_SCHEMA, map_files, process_file
+from collection_versions import begin_update, publish
+from file_collection import (
+    create_file_collection,
+    create_file_indexes,
+    delete_files,
+    upload_files,
+)
+from manifest import diff_manifests, load_manifest, save_changes
+from source_file import find_files
+from streaming import RowGroupWriter
+
+FLAGS = flags.FLAGS
+logger = logging.getLogger(__name__)
+
+flags.DEFINE_string(
+    "input_dir", default=None, help="Input directory of rust files", required=True
+)
+flags.DEFINE_integer(
+    "max_size",
+    default=256,
+    help="Maximum number of tokens for a single code chunk",
+)
+flags.DEFINE_string(
+    "output_file",
+    default="/data/code_chunks.parquet",
+    help="Output parquet file of code chunks",
+)
+flags.DEFINE_integer(
+    "workers",
+    default=1,
+    help="Number of worker processes reading and splitting files in parallel",
+)
+flags.DEFINE_integer(
+    "row_group_size",
+    default=10_000,
+    help="Number of chunks buffered in memory per parquet row group",
+)
+flags.DEFINE_string(
+    "manifest_file",
+    default=None,
+    help="Manifest of file hashes from the previous run. When set, only added "
+    "and changed files are ingested and the difference is written to "
+    "--changes_file",
+)
+flags.DEFINE_string(
+    "changes_file",
+    default="/data/changes.json",
+    help="Output file listing added, changed and removed files",
+)
+flags.DEFINE_string(
+    "qdrant_host",
+    default="http://localhost:6333",
+    help="Qdrant host to connect to",
+)
+flags.DEFINE_string(
+    "file_collection",
+    default="qdrant-file",
+    help="Qdrant alias for files. Full runs upload to a new versioned "
+    "collection and move the alias to it once indexed",
+)
+flags.DEFINE_integer(
+    "batch_size",
+    default=256,
+    help="Number of file blocks buffered in memory and uploaded at a time",
+)
+
+
+def main(argv):
+    del argv  # Unused.
+
+    client = QdrantClient(FLAGS.qdrant_host)
+
+    previous_manifest = None
+    if FLAGS.manifest_file is not None:
+        previous_manifest = load_manifest(FLAGS.manifest_file)
+    collection_name, incremental = begin_update(
+        client,
+        alias=FLAGS.file_collection,
+        incremental=previous_manifest is not None,
+        create_collection=create_file_collection,
+    )
+    if incremental:
+        # Collections created before the indexes existed get them too
+        create_file_indexes(client, collection_name)
+    else:
+        # Everything is re-ingested, so the code collection gets rebuilt too
+        previous_manifest = None
+
+    manifest = {}
+    payloads = []
+    num_files = 0
+
+    def flush_payloads() -> None:
+        # Changed files replace their previous version
+        changed = {
+            payload["path"]
+            for payload in payloads
+            if previous_manifest is not None and payload["path"] in previous_manifest
+        }
+        delete_files(client, collection_name, list(changed))
+        upload_files(client, collection_name, payloads, batch_size=FLAGS.batch_size)
+        payloads.clear()
+
+    # Each file is read once to hash it, split it and build its file payload
+    start = time.perf_counter()
+    with RowGroupWriter(
+        FLAGS.output_file, row_group_size=FLAGS.row_group_size, schema=CHUNK_SCHEMA
+    ) as writer:
+        for processed in map_files(
+            functools.partial(
+                process_file,
+                dir=FLAGS.input_dir,
+                manifest=previous_manifest,
+                with_payload=True,
+            ),
+            find_files(FLAGS.input_dir),
+            max_size=FLAGS.max_size,
+            workers=FLAGS.workers,
+        ):
+            manifest[processed.path] = processed.hash
+            if processed.chunks is None:
+                continue
+
+            num_files += 1
+            writer.write(processed.chunks)
+            payloads.extend(processed.payloads)
+            if len(payloads) >= FLAGS.batch_size:
+                flush_payloads()
+        flush_payloads()
+    elapsed = time.perf_counter() - start
+
+    changes = diff_manifests(previous_manifest, manifest)
+    delete_files(client, collection_name, changes.removed)
+    logger.info(
+        f"Ingested {len(manifest)} files in {FLAGS.input_dir}: {len(changes.added)} "
+        f"added, {len(changes.changed)} changed, {len(changes.removed)} removed"
+    )
+    logger.info(
+        f"Saved {writer.num_records} chunks to {FLAGS.output_file} and uploaded "
+        f"{num_files} files to collection {collection_name}"
+    )
+    logger.info(
+        f"Ingestion throughput with {FLAGS.workers} workers: "
+        f"{len(manifest) / elapsed:.1f} files/s, "
+        f"{writer.num_records / elapsed:.1f} chunks/s"
+    )
+
+    if not incremental:
+        publish(
+            client,
+            alias=FLAGS.file_collection,
+            collection_name=collection_name,
+            keep_versions=FLAGS.keep_versions,
+            timeout=FLAGS.index_timeout,
+        )
+
+    if FLAGS.manifest_file is not None:
+        save_changes(changes, FLAGS.changes_file)
+        logger.info(f"Saved changes to {FLAGS.changes_file}")
+
+
+if __name__ == "__main__":
+    app.run(main)
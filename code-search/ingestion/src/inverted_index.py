@@ -0,0 +1,173 @@
+import gzip
+import json
+import os
+import re
+from collections.abc import Iterable
+from typing import Any
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import FieldCondition, Filter, MatchAny
+
+from manifest import Changes, diff_manifests
+from streaming import batched
+
+VERSION = 2
+# Identifiers, matched case-insensitively. Stored in the index so that the
+# backend tokenizes queries exactly like the chunks were tokenized.
+TOKEN_PATTERN = r"[A-Za-z_][A-Za-z0-9_]*"
+# Payload fields of a chunk stored in the index. Its text is only tokenized: the
+# backend reads it from the vector index or Qdrant, by point id.
+DOC_FIELDS = [
+    "file_path",
+    "file_name",
+    "start_line",
+    "end_line",
+    "name",
+    "signature",
+    "code_type",
+    "struct_name",
+    "module",
+]
+
+
+def tokenize(text: str) -> set[str]:
+    return {token.lower() for token in re.findall(TOKEN_PATTERN, text)}
+
+
+def build_index(
+    docs: Iterable[dict[str, Any]], manifest: dict[str, str] | None = None
+) -> dict[str, Any]:
+    """Builds an inverted index from identifiers to the chunks containing them.
+
+    `docs` are chunk payloads with the `id` of their point. Chunks are stored
+    column-wise and identified by their position. Both the text and the file
+    path of a chunk are indexed. `manifest` records the files the index was
+    built from, so that a later run can update it incrementally.
+    """
+    index = {
+        "version": VERSION,
+        "token_pattern": TOKEN_PATTERN,
+        "manifest": manifest,
+        "ids": [],
+        "docs": {field: [] for field in DOC_FIELDS},
+        "postings": {},
+    }
+    add_docs(index, docs)
+    return index
+
+
+def add_docs(index: dict[str, Any], docs: Iterable[dict[str, Any]]) -> int:
+    """Appends chunks to the index and returns how many there were."""
+    ids, columns, postings = index["ids"], index["docs"], index["postings"]
+    first = len(ids)
+    for doc_id, doc in enumerate(docs, start=first):
+        ids.append(doc["id"])
+        for field in DOC_FIELDS:
+            # Chunks indexed before symbol metadata existed lack it
+            columns[field].append(doc.get(field))
+        # Posting lists stay sorted, as new chunks get the largest positions
+        for token in tokenize(doc["file_path"]) | tokenize(doc["text"]):
+            postings.setdefault(token, []).append(doc_id)
+    return len(ids) - first
+
+
+def remove_files(index: dict[str, Any], file_paths: set[str]) -> int:
+    """Removes the chunks of `file_paths` and returns how many there were.
+
+    The remaining chunks are renumbered in order and their posting lists are
+    remapped, so the text of no chunk has to be read again.
+    """
+    keep = [
+        doc_id
+        for doc_id, file_path in enumerate(index["docs"]["file_path"])
+        if file_path not in file_paths
+    ]
+    num_removed = len(index["ids"]) - len(keep)
+    if num_removed == 0:
+        return 0
+
+    new_ids = [-1] * len(index["ids"])
+    for new_id, doc_id in enumerate(keep):
+        new_ids[doc_id] = new_id
+    index["ids"] = [index["ids"][doc_id] for doc_id in keep]
+    index["docs"] = {
+        field: [values[doc_id] for doc_id in keep]
+        for field, values in index["docs"].items()
+    }
+    postings = {}
+    for token, doc_ids in index["postings"].items():
+        remapped = [new_ids[doc_id] for doc_id in doc_ids if new_ids[doc_id] >= 0]
+        if remapped:
+            postings[token] = remapped
+    index["postings"] = postings
+    return num_removed
+
+
+def scroll_docs(
+    client: QdrantClient,
+    collection_name: str,
+    batch_size: int,
+    file_paths: list[str] | None = None,
+) -> Iterable[dict[str, Any]]:
+    """Payloads of the chunks in the collection, or only of those of `file_paths`."""
+    filters = [None]
+    if file_paths is not None:
+        filters = [
+            Filter(must=[FieldCondition(key="file_path", match=MatchAny(any=batch))])
+            for batch in batched(file_paths, 1_000)
+        ]
+    for scroll_filter in filters:
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name=collection_name,
+                scroll_filter=scroll_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=[*DOC_FIELDS, "text"],
+                with_vectors=False,
+            )
+            for point in points:
+                yield {"id": point.id, **point.payload}
+            if offset is None:
+                break
+
+
+def update_index(
+    client: QdrantClient,
+    collection_name: str,
+    index: dict[str, Any],
+    manifest: dict[str, str],
+    batch_size: int,
+) -> Changes:
+    """Brings an index built from an earlier manifest up to date with `manifest`.
+
+    Only the chunks of files added, changed or removed since the index was
+    built are replaced, by diffing its manifest rather than trusting a single
+    run's changes, so that an index skipped by a failed run catches up.
+    """
+    changes = diff_manifests(index["manifest"], manifest)
+    remove_files(index, set(changes.stale) | set(changes.updated))
+    add_docs(
+        index,
+        scroll_docs(client, collection_name, batch_size, file_paths=changes.updated),
+    )
+    index["manifest"] = manifest
+    return changes
+
+
+def load_index(index_file: str) -> dict[str, Any] | None:
+    """The index in `index_file`, or None if it is missing or of another version."""
+    if not os.path.exists(index_file):
+        return None
+    with gzip.open(index_file, "rt", encoding="utf-8") as f:
+        index = json.load(f)
+    return index if index.get("version") == VERSION else None
+
+
+def save_index(index: dict[str, Any], index_file: str) -> None:
+    # Replaced atomically so that the backend never loads a partial index
+    tmp_file = f"{index_file}.tmp"
+    with gzip.open(tmp_file, "wt", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+    os.replace(tmp_file, index_file)
@@ -0,0 +1,133 @@
+from typing import Any
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+
+from code_collection import (
+    CodeCollectionConfig,
+    chunk_id,
+    create_code_collection,
+    delete_chunks,
+)
+from inverted_index import (
+    build_index,
+    load_index,
+    save_index,
+    scroll_docs,
+    update_index,
+)
+
+COLLECTION = "qdrant-code"
+
+
+def upsert_chunks(client: QdrantClient, file_path: str, texts: list[str]) -> None:
+    client.upsert(
+        COLLECTION,
+        points=[
+            PointStruct(
+                id=chunk_id(file_path, line, line),
+                vector=[1.0, 0.0, 0.0, 0.0],
+                payload={
+                    "file_path": file_path,
+                    "file_name": file_path.rsplit("/", 1)[-1],
+                    "start_line": line,
+                    "end_line": line,
+                    "text": text,
+                },
+            )
+            for line, text in enumerate(texts, start=1)
+        ],
+    )
+
+
+def create_collection() -> QdrantClient:
+    client = QdrantClient(":memory:")
+    create_code_collection(
+        client, COLLECTION, config=CodeCollectionConfig(embedding_dim=4)
+    )
+    upsert_chunks(client, "src/map.rs", ["let map = HashMap::new();", "map.len()"])
+    upsert_chunks(client, "src/vec.rs", ["let v = Vec::with_capacity(16);"])
+    upsert_chunks(client, "src/set.rs", ["let set = HashSet::new();"])
+    return client
+
+
+def chunks(index: dict[str, Any]) -> dict[str, tuple[str, int, set[str]]]:
+    """Chunks by point id with their file path, start line and tokens."""
+    tokens: list[set[str]] = [set() for _ in index["ids"]]
+    for token, doc_ids in index["postings"].items():
+        assert doc_ids == sorted(doc_ids)
+        for doc_id in doc_ids:
+            tokens[doc_id].add(token)
+    docs = index["docs"]
+    return {
+        point_id: (
+            docs["file_path"][doc_id],
+            docs["start_line"][doc_id],
+            tokens[doc_id],
+        )
+        for doc_id, point_id in enumerate(index["ids"])
+    }
+
+
+def test_build_index() -> None:
+    client = create_collection()
+
+    index = build_index(scroll_docs(client, COLLECTION, batch_size=2))
+
+    assert len(index["ids"]) == 4
+    assert "text" not in index["docs"]
+    assert chunks(index)[chunk_id("src/vec.rs", 1, 1)] == (
+        "src/vec.rs",
+        1,
+        {"src", "vec", "rs", "let", "v", "with_capacity"},
+    )
+
+
+def test_update_index_replaces_chunks_of_changed_files() -> None:
+    client = create_collection()
+    manifest = {"src/map.rs": "1", "src/vec.rs": "1", "src/set.rs": "1"}
+    index = build_index(scroll_docs(client, COLLECTION, batch_size=2), manifest)
+
+    # vec.rs is removed, set.rs changed and lib.rs added
+    delete_chunks(client, COLLECTION, ["src/vec.rs", "src/set.rs"])
+    upsert_chunks(client, "src/set.rs", ["let set = BTreeSet::new();"])
+    upsert_chunks(client, "src/lib.rs", ["pub mod map;", "pub mod set;"])
+    manifest = {"src/map.rs": "1", "src/set.rs": "2", "src/lib.rs": "1"}
+    changes = update_index(client, COLLECTION, index, manifest, batch_size=2)
+
+    assert (changes.added, changes.changed, changes.removed) == (
+        ["src/lib.rs"],
+        ["src/set.rs"],
+        ["src/vec.rs"],
+    )
+    rebuilt = build_index(scroll_docs(client, COLLECTION, batch_size=2), manifest)
+    assert chunks(index) == chunks(rebuilt)
+    assert set(index["postings"]) == set(rebuilt["postings"])
+    assert index["manifest"] == manifest
+
+
+def test_update_index_is_idempotent() -> None:
+    client = create_collection()
+    manifest = {"src/map.rs": "1", "src/vec.rs": "1", "src/set.rs": "1"}
+    index = build_index(scroll_docs(client, COLLECTION, batch_size=2), manifest)
+    upsert_chunks(client, "src/lib.rs", ["pub mod map;"])
+    manifest = {**manifest, "src/lib.rs": "1"}
+
+    update_index(client, COLLECTION, index, manifest, batch_size=2)
+    expected = chunks(index)
+    # A run whose manifest was not committed replays the same changes
+    index["manifest"] = {"src/map.rs": "1", "src/vec.rs": "1", "src/set.rs": "1"}
+    update_index(client, COLLECTION, index, manifest, batch_size=2)
+
+    assert chunks(index) == expected
+
+
+def test_load_index(tmp_path: Any) -> None:
+    index_file = str(tmp_path / "lexical_index.json.gz")
+    index = build_index(scroll_docs(create_collection(), COLLECTION, batch_size=10))
+
+    assert load_index(index_file) is None
+    save_index(index, index_file)
+    assert load_index(index_file) == index
+    save_index({**index, "version": 1}, index_file)
+    assert load_index(index_file) is None
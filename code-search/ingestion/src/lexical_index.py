@@ -0,0 +1,85 @@
+import logging
+import time
+
+from absl import app, flags
+from qdrant_client import QdrantClient
+
+from inverted_index import (
+    build_index,
+    load_index,
+    save_index,
+    scroll_docs,
+    update_index,
+)
+from manifest import load_changes
+
+FLAGS = flags.FLAGS
+logger = logging.getLogger(__name__)
+
+flags.DEFINE_string(
+    "qdrant_host",
+    default="http://localhost:6333",
+    help="Qdrant host to connect to",
+)
+flags.DEFINE_string(
+    "code_collection",
+    default="qdrant-code",
+    help="Qdrant alias for code snippets to index",
+)
+flags.DEFINE_string(
+    "output_file",
+    default="/data/lexical_index.json.gz",
+    help="Output file of the lexical index loaded by the search backend",
+)
+flags.DEFINE_string(
+    "changes_file",
+    default=None,
+    help="Changes file of the ingestion run. Unless it describes a full run, "
+    "only the chunks of files changed since the index was built are replaced",
+)
+flags.DEFINE_integer(
+    "batch_size",
+    default=1_000,
+    help="Number of points scrolled from Qdrant at a time",
+)
+
+
+def main(argv):
+    del argv  # Unused.
+
+    client = QdrantClient(FLAGS.qdrant_host)
+
+    # Built from the collection rather than the chunks file, which only holds
+    # the changed files on incremental runs
+    start = time.perf_counter()
+    changes = load_changes(FLAGS.changes_file) if FLAGS.changes_file else None
+    index = None
+    if changes is not None and not changes.full:
+        index = load_index(FLAGS.output_file)
+    if index is not None and index["manifest"] is not None:
+        update = update_index(
+            client,
+            FLAGS.code_collection,
+            index,
+            manifest=changes.manifest,
+            batch_size=FLAGS.batch_size,
+        )
+        logger.info(
+            f"Updated the lexical index for {len(update.added)} added, "
+            f"{len(update.changed)} changed and {len(update.removed)} removed files"
+        )
+    else:
+        index = build_index(
+            scroll_docs(client, FLAGS.code_collection, batch_size=FLAGS.batch_size),
+            manifest=changes.manifest if changes is not None else None,
+        )
+    save_index(index, FLAGS.output_file)
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Saved lexical index of {len(index['ids'])} chunks and "
+        f"{len(index['postings'])} tokens to {FLAGS.output_file} in {elapsed:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,67 @@
+import json
+import os
+from dataclasses import asdict, dataclass, field
+
+
+@dataclass
+class Changes:
+    """Difference between the manifests of two ingestion runs.
+
+    `full` is set when there is no previous manifest, in which case every file
+    is listed in `added` and the collections must be rebuilt from scratch.
+    """
+
+    full: bool
+    added: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    # Manifest of the current run, committed once every stage has succeeded
+    manifest: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def updated(self) -> list[str]:
+        """Files that need to be (re)ingested."""
+        return self.added + self.changed
+
+    @property
+    def stale(self) -> list[str]:
+        """Files whose previously indexed points must be deleted."""
+        return self.changed + self.removed
+
+
+def diff_manifests(old: dict[str, str] | None, new: dict[str, str]) -> Changes:
+    if old is None:
+        return Changes(full=True, added=list(new), manifest=new)
+
+    return Changes(
+        full=False,
+        added=[path for path in new if path not in old],
+        changed=[path for path, hash in new.items() if old.get(path, hash) != hash],
+        removed=[path for path in old if path not in new],
+        manifest=new,
+    )
+
+
+def load_manifest(manifest_file: str) -> dict[str, str] | None:
+    if not os.path.exists(manifest_file):
+        return None
+    with open(manifest_file) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict[str, str], manifest_file: str) -> None:
+    # Write to a temporary file first so a crash never leaves a partial manifest
+    tmp_file = f"{manifest_file}.tmp"
+    with open(tmp_file, mode="w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_file, manifest_file)
+
+
+def load_changes(changes_file: str) -> Changes:
+    with open(changes_file) as f:
+        return Changes(**json.load(f))
+
+
+def save_changes(changes: Changes, changes_file: str) -> None:
+    with open(changes_file, mode="w") as f:
+        json.dump(asdict(changes), f)
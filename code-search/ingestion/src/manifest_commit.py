@@ -0,0 +1,33 @@
+import logging
+
+from absl import app, flags
+
+from manifest import load_changes, save_manifest
+
+FLAGS = flags.FLAGS
+logger = logging.getLogger(__name__)
+
+flags.DEFINE_string(
+    "changes_file",
+    default="/data/changes.json",
+    help="Changes file written by code_split",
+)
+flags.DEFINE_string(
+    "manifest_file",
+    default="/data/manifest.json",
+    help="Manifest file read by the next incremental run",
+)
+
+
+def main(argv):
+    del argv  # Unused.
+
+    changes = load_changes(FLAGS.changes_file)
+    save_manifest(changes.manifest, FLAGS.manifest_file)
+    logger.info(
+        f"Committed manifest of {len(changes.manifest)} files to {FLAGS.manifest_file}"
+    )
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,71 @@
+from typing import Any
+
+from manifest import (
+    Changes,
+    diff_manifests,
+    load_changes,
+    load_manifest,
+    save_changes,
+    save_manifest,
+)
+
+
+def test_diff_manifests() -> None:
+    old = {"a.rs": "1", "b.rs": "2", "c.rs": "3"}
+    new = {"a.rs": "1", "b.rs": "20", "d.rs": "4"}
+
+    changes = diff_manifests(old, new)
+
+    assert changes == Changes(
+        full=False, added=["d.rs"], changed=["b.rs"], removed=["c.rs"], manifest=new
+    )
+    assert changes.updated == ["d.rs", "b.rs"]
+    assert changes.stale == ["b.rs", "c.rs"]
+
+
+def test_diff_manifests_unchanged() -> None:
+    manifest = {"a.rs": "1", "b.rs": "2"}
+
+    changes = diff_manifests(manifest, dict(manifest))
+
+    assert not changes.full
+    assert changes.updated == []
+    assert changes.stale == []
+
+
+def test_diff_manifests_first_run() -> None:
+    new = {"a.rs": "1", "b.rs": "2"}
+
+    changes = diff_manifests(None, new)
+
+    assert changes.full
+    assert changes.added == ["a.rs", "b.rs"]
+    assert changes.changed == []
+    assert changes.removed == []
+
+
+def test_load_manifest_missing(tmp_path: Any) -> None:
+    assert load_manifest(str(tmp_path / "manifest.json")) is None
+
+
+def test_changes_round_trip(tmp_path: Any) -> None:
+    changes_file = str(tmp_path / "changes.json")
+    changes = diff_manifests({"a.rs": "1", "b.rs": "2"}, {"a.rs": "10", "c.rs": "3"})
+
+    save_changes(changes, changes_file)
+
+    assert load_changes(changes_file) == changes
+
+
+def test_commit_manifest(tmp_path: Any) -> None:
+    # What manifest_commit does once every stage has succeeded
+    changes_file = str(tmp_path / "changes.json")
+    manifest_file = str(tmp_path / "manifest.json")
+    save_manifest({"a.rs": "1"}, manifest_file)
+    save_changes(diff_manifests({"a.rs": "1"}, {"b.rs": "2"}), changes_file)
+
+    save_manifest(load_changes(changes_file).manifest, manifest_file)
+
+    assert load_manifest(manifest_file) == {"b.rs": "2"}
+    assert not (tmp_path / "manifest.json.tmp").exists()
+    assert diff_manifests(load_manifest(manifest_file), {"b.rs": "2"}).stale == []
@@ -0,0 +1,266 @@
+import functools
+import logging
+import time
+
+from absl import app, flags
+from openai import AsyncOpenAI
+from qdrant_client import QdrantClient
+
+from code_collection import (
+    create_code_collection,
+    create_code_indexes,
+)
+from collection_flags import code_collection_config
+from collection_versions import begin_update, publish
+from embedder import Embedder
+from embedding_cache import EmbeddingCache
+from file_collection import create_file_collection, create_file_indexes
+from manifest import diff_manifests, load_manifest, save_changes, save_manifest
+from pipeline_stages import Pipeline
+
+FLAGS = flags.FLAGS
+logger = logging.getLogger(__name__)
+
+flags.DEFINE_string(
+    "input_dir", default=None, help="Input directory of rust files", required=True
+)
+flags.DEFINE_integer(
+    "max_size",
+    default=256,
+    help="Maximum number of tokens for a single code chunk",
+)
+flags.DEFINE_integer(
+    "workers",
+    default=1,
+    help="Number of worker processes reading and splitting files in parallel",
+)
+flags.DEFINE_string(
+    "manifest_file",
+    default=None,
+    help="Manifest of file hashes from the previous run. When set, only added "
+    "and changed files are ingested, and the manifest is updated once both "
+    "collections are",
+)
+flags.DEFINE_string(
+    "changes_file",
+    default=None,
+    help="Optional output file listing added, changed and removed files, from "
+    "which lexical_index and vector_export update their indexes",
+)
+flags.DEFINE_string(
+    "chunks_file",
+    default=None,
+    help="Optional parquet checkpoint of the code chunks, as written by ingest",
+)
+flags.DEFINE_string(
+    "embeddings_file",
+    default=None,
+    help="Optional parquet checkpoint of the code chunk embeddings, as read by "
+    "code_index",
+)
+flags.DEFINE_integer(
+    "row_group_size",
+    default=10_000,
+    help="Number of chunks buffered in memory per parquet row group",
+)
+flags.DEFINE_string(
+    "qdrant_host",
+    default="http://localhost:6333",
+    help="Qdrant host to connect to",
+)
+flags.DEFINE_string(
+    "code_collection",
+    default="qdrant-code",
+    help="Qdrant alias for code snippets",
+)
+flags.DEFINE_string(
+    "file_collection",
+    default="qdrant-file",
+    help="Qdrant alias for files",
+)
+flags.DEFINE_string(
+    "model",
+    default="text-embedding-3-small",
+    help="OpenAI embedding model to use",
+)
+flags.DEFINE_string(
+    "cache_file",
+    default="/data/embedding_cache.sqlite",
+    help="SQLite file caching embeddings across runs. Empty to disable caching",
+)
+flags.DEFINE_integer(
+    "batch_tokens",
+    default=100_000,
+    help="Maximum number of tokens sent in a single embeddings request",
+)
+flags.DEFINE_integer(
+    "batch_inputs",
+    default=2048,
+    help="Maximum number of texts sent in a single embeddings request",
+)
+flags.DEFINE_integer(
+    "concurrency",
+    default=8,
+    help="Maximum number of embeddings requests in flight",
+)
+flags.DEFINE_integer(
+    "requests_per_minute",
+    default=3_000,
+    help="Embeddings requests per minute allowed by the OpenAI rate limit",
+)
+flags.DEFINE_integer(
+    "tokens_per_minute",
+    default=1_000_000,
+    help="Tokens per minute allowed by the OpenAI rate limit",
+)
+flags.DEFINE_integer(
+    "max_retries",
+    default=8,
+    help="Maximum number of retries of a rate limited or failed request",
+)
+flags.DEFINE_integer(
+    "embed_batch_size",
+    default=4096,
+    help="Number of chunks handed from the split stage to the embed stage at a time",
+)
+flags.DEFINE_integer(
+    "embed_batches",
+    default=2,
+    help="Number of chunk batches embedded concurrently",
+)
+flags.DEFINE_integer(
+    "queue_size",
+    default=4,
+    help="Number of batches buffered between two stages before the faster one blocks",
+)
+flags.DEFINE_integer(
+    "batch_size",
+    default=256,
+    help="Number of points sent to Qdrant in a single request",
+)
+
+
+def make_embedder() -> Embedder:
+    # SQLite connections can only be used by the thread that created them
+    cache = EmbeddingCache(FLAGS.cache_file) if FLAGS.cache_file else None
+    return Embedder(
+        # Retries are handled by the embedder which knows about rate limits
+        client=AsyncOpenAI(max_retries=0),
+        model=FLAGS.model,
+        cache=cache,
+        max_batch_tokens=FLAGS.batch_tokens,
+        max_batch_inputs=FLAGS.batch_inputs,
+        max_concurrency=FLAGS.concurrency,
+        requests_per_minute=FLAGS.requests_per_minute,
+        tokens_per_minute=FLAGS.tokens_per_minute,
+        max_retries=FLAGS.max_retries,
+    )
+
+
+def main(argv):
+    del argv  # Unused.
+
+    client = QdrantClient(FLAGS.qdrant_host)
+    create_code = functools.partial(
+        create_code_collection, config=code_collection_config()
+    )
+
+    previous_manifest = None
+    if FLAGS.manifest_file is not None:
+        previous_manifest = load_manifest(FLAGS.manifest_file)
+    code_collection, incremental = begin_update(
+        client,
+        alias=FLAGS.code_collection,
+        incremental=previous_manifest is not None,
+        create_collection=create_code,
+    )
+    file_collection, incremental_files = begin_update(
+        client,
+        alias=FLAGS.file_collection,
+        incremental=incremental,
+        create_collection=create_file_collection,
+    )
+    if incremental and not incremental_files:
+        # Both collections have to be rebuilt from the same files
+        code_collection, incremental = begin_update(
+            client,
+            alias=FLAGS.code_collection,
+            incremental=False,
+            create_collection=create_code,
+        )
+    if incremental:
+        # Collections created before the indexes existed get them too
+        create_code_indexes(client, code_collection)
+        create_file_indexes(client, file_collection)
+    else:
+        previous_manifest = None
+
+    pipeline = Pipeline(
+        client,
+        code_collection=code_collection,
+        file_collection=file_collection,
+        previous_manifest=previous_manifest,
+        input_dir=FLAGS.input_dir,
+        make_embedder=make_embedder,
+        embedding_dim=FLAGS.embedding_dim,
+        max_size=FLAGS.max_size,
+        workers=FLAGS.workers,
+        chunks_file=FLAGS.chunks_file,
+        embeddings_file=FLAGS.embeddings_file,
+        row_group_size=FLAGS.row_group_size,
+        embed_batch_size=FLAGS.embed_batch_size,
+        embed_batches=FLAGS.embed_batches,
+        queue_size=FLAGS.queue_size,
+        batch_size=FLAGS.batch_size,
+    )
+    start = time.perf_counter()
+    pipeline.run()
+    elapsed = time.perf_counter() - start
+
+    changes = diff_manifests(previous_manifest, pipeline.manifest)
+    pipeline.delete_stale(changes)
+    logger.info(
+        f"Ingested {len(pipeline.manifest)} files in {FLAGS.input_dir}: "
+        f"{len(changes.added)} added, {len(changes.changed)} changed, "
+        f"{len(changes.removed)} removed"
+    )
+    logger.info(
+        f"Uploaded {pipeline.num_points} points to collection {code_collection} and "
+        f"{pipeline.num_files} files to collection {file_collection} in "
+        f"{elapsed:.1f}s: {len(pipeline.manifest) / elapsed:.1f} files/s, "
+        f"{pipeline.num_points / elapsed:.1f} points/s"
+    )
+    # A stage that keeps its consumer waiting is the bottleneck
+    for name, channel in [
+        ("split -> embed", pipeline.chunks),
+        ("embed -> upload-code", pipeline.points),
+        ("split -> upload-files", pipeline.files),
+    ]:
+        logger.info(
+            f"Channel {name}: producer blocked {channel.put_wait:.1f}s, "
+            f"consumer waited {channel.get_wait:.1f}s"
+        )
+
+    if not incremental:
+        for alias, collection_name in [
+            (FLAGS.code_collection, code_collection),
+            (FLAGS.file_collection, file_collection),
+        ]:
+            publish(
+                client,
+                alias=alias,
+                collection_name=collection_name,
+                keep_versions=FLAGS.keep_versions,
+                timeout=FLAGS.index_timeout,
+            )
+
+    if FLAGS.changes_file is not None:
+        save_changes(changes, FLAGS.changes_file)
+        logger.info(f"Saved changes to {FLAGS.changes_file}")
+    if FLAGS.manifest_file is not None:
+        save_manifest(pipeline.manifest, FLAGS.manifest_file)
+        logger.info(f"Saved manifest to {FLAGS.manifest_file}")
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,237 @@
+import asyncio
+import functools
+import logging
+from collections.abc import Callable
+from typing import Any
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from qdrant_client import QdrantClient
+
+from chunking import CHUNK_SCHEMA, map_files, process_file
+from code_collection import delete_chunks, upload_chunks
+from embedder import Embedder
+from file_collection import delete_files, upload_files
+from manifest import Changes
+from source_file import find_files
+from streaming import Channel, RowGroupWriter, run_stages
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_FIELD = "embedding"
+
+# Chunks and their embeddings, in the same order
+EmbeddedChunks = tuple[list[dict[str, Any]], list[list[float]]]
+
+
+class Pipeline:
+    """Splits, embeds and indexes files with all stages running concurrently.
+
+    The split stage feeds chunks to the embed stage and file payloads to the
+    file upload stage, and the embed stage feeds embedded chunks to the code
+    upload stage. Stages are connected by bounded channels, so memory stays
+    flat and the run takes about as long as its slowest stage.
+
+    `make_embedder` is called in the embed stage's own thread and event loop.
+    """
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        code_collection: str,
+        file_collection: str,
+        previous_manifest: dict[str, str] | None,
+        input_dir: str,
+        make_embedder: Callable[[], Embedder],
+        embedding_dim: int,
+        max_size: int = 256,
+        workers: int = 1,
+        chunks_file: str | None = None,
+        embeddings_file: str | None = None,
+        row_group_size: int = 10_000,
+        embed_batch_size: int = 4096,
+        embed_batches: int = 2,
+        queue_size: int = 4,
+        batch_size: int = 256,
+    ) -> None:
+        self.client = client
+        self.code_collection = code_collection
+        self.file_collection = file_collection
+        self.previous_manifest = previous_manifest
+        self.input_dir = input_dir
+        self.make_embedder = make_embedder
+        self.embedding_dim = embedding_dim
+        self.max_size = max_size
+        self.workers = workers
+        self.chunks_file = chunks_file
+        self.embeddings_file = embeddings_file
+        self.row_group_size = row_group_size
+        self.embed_batch_size = embed_batch_size
+        self.embed_batches = embed_batches
+        self.batch_size = batch_size
+        self.manifest: dict[str, str] = {}
+        self.num_files = 0
+        self.num_points = 0
+        # Files whose previous chunks were replaced by the upload-code stage
+        self.replaced: set[str] = set()
+        self.chunks: Channel[list[dict[str, Any]]] = Channel(queue_size)
+        self.files: Channel[list[dict[str, Any]]] = Channel(queue_size)
+        self.points: Channel[EmbeddedChunks] = Channel(queue_size)
+
+    def run(self) -> None:
+        run_stages(
+            {
+                "split": self.split,
+                "embed": lambda: asyncio.run(self.embed()),
+                "upload-code": self.upload_code,
+                "upload-files": self.upload_files,
+            },
+            channels=[self.chunks, self.files, self.points],
+        )
+
+    def changed(self, paths: set[str]) -> list[str]:
+        """Paths that were ingested by a previous run."""
+        if self.previous_manifest is None:
+            return []
+        return [path for path in paths if path in self.previous_manifest]
+
+    def split(self) -> None:
+        chunks = []
+        payloads = []
+        writer = None
+        if self.chunks_file is not None:
+            writer = RowGroupWriter(
+                self.chunks_file,
+                row_group_size=self.row_group_size,
+                schema=CHUNK_SCHEMA,
+            )
+
+        for processed in map_files(
+            functools.partial(
+                process_file,
+                dir=self.input_dir,
+                manifest=self.previous_manifest,
+                with_payload=True,
+            ),
+            find_files(self.input_dir),
+            max_size=self.max_size,
+            workers=self.workers,
+        ):
+            self.manifest[processed.path] = processed.hash
+            if processed.chunks is None:
+                continue
+
+            self.num_files += 1
+            if writer is not None:
+                writer.write(processed.chunks)
+            chunks.extend(chunk for chunk in processed.chunks if chunk["text"].strip())
+            payloads.extend(processed.payloads)
+            if len(chunks) >= self.embed_batch_size:
+                self.chunks.put(chunks)
+                chunks = []
+            if len(payloads) >= self.batch_size:
+                self.files.put(payloads)
+                payloads = []
+
+        if chunks:
+            self.chunks.put(chunks)
+        if payloads:
+            self.files.put(payloads)
+        self.chunks.close()
+        self.files.close()
+        if writer is not None:
+            writer.close()
+
+    async def embed(self) -> None:
+        embedder = self.make_embedder()
+        # Embedding the next batch while the previous one finishes keeps
+        # requests in flight between batches
+        slots = asyncio.Semaphore(self.embed_batches)
+
+        async def embed_batch(chunks: list[dict[str, Any]]) -> None:
+            try:
+                embeddings = await embedder.embed([chunk["text"] for chunk in chunks])
+                await asyncio.to_thread(self.points.put, (chunks, embeddings))
+            finally:
+                slots.release()
+
+        batches = iter(self.chunks)
+        try:
+            async with asyncio.TaskGroup() as tasks:
+                while True:
+                    await slots.acquire()
+                    chunks = await asyncio.to_thread(next, batches, None)
+                    if chunks is None:
+                        break
+                    tasks.create_task(embed_batch(chunks))
+        finally:
+            if embedder.cache is not None:
+                logger.info(
+                    f"Embedding cache: {embedder.cache.hits} hits, "
+                    f"{embedder.cache.misses} misses"
+                )
+                embedder.cache.close()
+        logger.info(
+            f"Embedded {embedder.num_texts} chunks with {embedder.num_requests} "
+            f"requests and {embedder.num_retries} retries, dedup ratio "
+            f"{embedder.dedup_ratio:.1%}"
+        )
+        self.points.close()
+
+    def upload_code(self) -> None:
+        writer = None
+        for chunks, embeddings in self.points:
+            batch = embedded_batch(chunks, embeddings)
+            # Changed files replace all of their previous chunks, once
+            paths = {chunk["file_path"] for chunk in chunks} - self.replaced
+            delete_chunks(self.client, self.code_collection, self.changed(paths))
+            self.replaced |= paths
+            upload_chunks(
+                self.client,
+                collection_name=self.code_collection,
+                batch=batch,
+                embedding_dim=self.embedding_dim,
+                batch_size=self.batch_size,
+            )
+            self.num_points += batch.num_rows
+
+            if self.embeddings_file is not None:
+                if writer is None:
+                    writer = pq.ParquetWriter(self.embeddings_file, batch.schema)
+                writer.write_batch(batch)
+        if writer is not None:
+            writer.close()
+
+    def upload_files(self) -> None:
+        for payloads in self.files:
+            paths = {payload["path"] for payload in payloads}
+            delete_files(self.client, self.file_collection, self.changed(paths))
+            upload_files(
+                self.client,
+                collection_name=self.file_collection,
+                payloads=payloads,
+                batch_size=self.batch_size,
+            )
+
+    def delete_stale(self, changes: Changes) -> None:
+        """Deletes the points of files that are gone after the run.
+
+        Changed files that no longer have any chunks to embed never reach the
+        upload-code stage, so their previous chunks are deleted here as well.
+        """
+        emptied = [path for path in changes.changed if path not in self.replaced]
+        delete_chunks(self.client, self.code_collection, changes.removed + emptied)
+        delete_files(self.client, self.file_collection, changes.removed)
+
+
+def embedded_batch(
+    chunks: list[dict[str, Any]], embeddings: list[list[float]]
+) -> pa.RecordBatch:
+    """Code chunks with an `embedding` column, as written by code_embed."""
+    batch = pa.RecordBatch.from_pylist(chunks, schema=CHUNK_SCHEMA)
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    column = pa.FixedSizeListArray.from_arrays(matrix.ravel(), matrix.shape[1])
+    return pa.RecordBatch.from_arrays(
+        [*batch.columns, column], names=[*batch.schema.names, EMBEDDING_FIELD]
+    )
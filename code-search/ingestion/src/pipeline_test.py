@@ -0,0 +1,87 @@
+import os
+from typing import Any
+
+from openai import AsyncOpenAI
+from qdrant_client import QdrantClient
+from qdrant_client.models import FieldCondition, Filter, MatchValue
+
+from code_collection import CodeCollectionConfig, create_code_collection
+from embedder import Embedder
+from embedder_test import WordEncoding
+from fake_openai import FakeEmbeddingsServer
+from file_collection import create_file_collection
+from manifest import diff_manifests
+from pipeline_stages import Pipeline
+
+DIM = 8
+CODE_COLLECTION = "qdrant-code"
+FILE_COLLECTION = "qdrant-file"
+
+LIB = """pub fn add(a: i32, b: i32) -> i32 {
+    a + b
+}
+"""
+MAIN = """fn main() {
+    println!("{}", lib::add(1, 2));
+}
+"""
+
+
+def run_pipeline(
+    client: QdrantClient,
+    server: FakeEmbeddingsServer,
+    input_dir: str,
+    previous_manifest: dict[str, str] | None,
+) -> dict[str, str]:
+    def make_embedder() -> Embedder:
+        return Embedder(
+            client=AsyncOpenAI(base_url=server.base_url, api_key="fake", max_retries=0),
+            model="text-embedding-3-small",
+            encoding=WordEncoding(),
+        )
+
+    pipeline = Pipeline(
+        client,
+        code_collection=CODE_COLLECTION,
+        file_collection=FILE_COLLECTION,
+        previous_manifest=previous_manifest,
+        input_dir=input_dir,
+        make_embedder=make_embedder,
+        embedding_dim=DIM,
+    )
+    pipeline.run()
+    pipeline.delete_stale(diff_manifests(previous_manifest, pipeline.manifest))
+    return pipeline.manifest
+
+
+def num_chunks(client: QdrantClient, file_path: str) -> int:
+    return client.count(
+        CODE_COLLECTION,
+        count_filter=Filter(
+            must=[FieldCondition(key="file_path", match=MatchValue(value=file_path))]
+        ),
+    ).count
+
+
+def test_changed_file_without_chunks_loses_its_chunks(tmp_path: Any) -> None:
+    input_dir = str(tmp_path)
+    for name, source in [("lib.rs", LIB), ("main.rs", MAIN)]:
+        with open(os.path.join(input_dir, name), mode="w") as f:
+            f.write(source)
+    client = QdrantClient(":memory:")
+    create_code_collection(
+        client, CODE_COLLECTION, config=CodeCollectionConfig(embedding_dim=DIM)
+    )
+    create_file_collection(client, FILE_COLLECTION)
+
+    with FakeEmbeddingsServer(dim=DIM) as server:
+        manifest = run_pipeline(client, server, input_dir, previous_manifest=None)
+        assert num_chunks(client, "lib.rs") > 0
+        assert num_chunks(client, "main.rs") > 0
+
+        with open(os.path.join(input_dir, "lib.rs"), mode="w") as f:
+            f.write("\n  \n")
+        run_pipeline(client, server, input_dir, previous_manifest=manifest)
+
+    assert num_chunks(client, "lib.rs") == 0
+    assert num_chunks(client, "main.rs") > 0
@@ -0,0 +1,63 @@
+import hashlib
+import os
+from collections.abc import Generator
+from dataclasses import dataclass
+from itertools import pairwise
+
+import numpy as np
+
+
+def find_files(dir: str) -> Generator[str, None, None]:
+    for root, _, files in os.walk(dir):
+        for file in files:
+            if file.endswith(".rs"):
+                yield os.path.join(root, file)
+
+
+@dataclass
+class SourceFile:
+    """A source file read into a single buffer, indexed by line."""
+
+    # Path relative to the input directory
+    path: str
+    code: bytes
+    # Byte offset of the start of every line, followed by the end of the file
+    line_offsets: np.ndarray
+
+    @classmethod
+    def read(cls, dir: str, path: str) -> "SourceFile":
+        with open(os.path.join(dir, path), mode="rb") as f:
+            code = f.read()
+
+        newlines = np.flatnonzero(np.frombuffer(code, dtype=np.uint8) == ord("\n"))
+        line_offsets = np.concatenate(([0], newlines + 1))
+        if line_offsets[-1] != len(code):
+            # Last line without a trailing newline
+            line_offsets = np.append(line_offsets, len(code))
+        return cls(path=path, code=code, line_offsets=line_offsets)
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    @property
+    def num_lines(self) -> int:
+        return len(self.line_offsets) - 1
+
+    @property
+    def hash(self) -> str:
+        return hashlib.sha256(self.code).hexdigest()
+
+    def text(self, start: int, end: int) -> str:
+        """Text of the lines in [start, end), sliced straight from the buffer."""
+        start = min(start, self.num_lines)
+        end = min(end, self.num_lines)
+        code = self.code[self.line_offsets[start] : self.line_offsets[max(start, end)]]
+        return code.decode("utf-8", errors="ignore")
+
+    def lines(self) -> list[str]:
+        offsets = self.line_offsets.tolist()
+        return [
+            self.code[start:end].decode("utf-8", errors="ignore")
+            for start, end in pairwise(offsets)
+        ]
@@ -0,0 +1,180 @@
+import queue
+import threading
+import time
+from collections.abc import Callable, Generator, Iterable
+from itertools import islice
+from typing import Any, Generic, Self, TypeVar
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+T = TypeVar("T")
+
+
+def batched(iterable: Iterable[T], n: int) -> Generator[list[T], None, None]:
+    # Same as `itertools.batched` which is only available from Python 3.12
+    it = iter(iterable)
+    while batch := list(islice(it, n)):
+        yield batch
+
+
+class RowGroupWriter:
+    """Writes records to a parquet file one row group at a time.
+
+    Only up to `row_group_size` records are buffered in memory. Unless `schema`
+    is given, it is inferred from the first row group.
+    """
+
+    def __init__(
+        self, output_file: str, row_group_size: int, schema: pa.Schema | None = None
+    ) -> None:
+        self.output_file = output_file
+        self.row_group_size = row_group_size
+        self.schema = schema
+        self.num_records = 0
+        self._buffer: list[dict[str, Any]] = []
+        self._writer: pq.ParquetWriter | None = None
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def write(self, records: Iterable[dict[str, Any]]) -> None:
+        self._buffer.extend(records)
+        while len(self._buffer) >= self.row_group_size:
+            self._flush(self._buffer[: self.row_group_size])
+            del self._buffer[: self.row_group_size]
+
+    def close(self) -> None:
+        if self._buffer:
+            self._flush(self._buffer)
+            self._buffer = []
+
+        if self._writer is not None:
+            self._writer.close()
+        elif self.schema is not None:
+            pq.write_table(self.schema.empty_table(), self.output_file)
+        else:
+            pq.write_table(pa.table({}), self.output_file)
+
+    def _flush(self, records: list[dict[str, Any]]) -> None:
+        table = pa.Table.from_pylist(records, schema=self.schema)
+        if self._writer is None:
+            self.schema = table.schema
+            self._writer = pq.ParquetWriter(self.output_file, self.schema)
+        self._writer.write_table(table)
+        self.num_records += len(records)
+
+
+def write_parquet(
+    records: Iterable[dict[str, Any]],
+    output_file: str,
+    row_group_size: int,
+    schema: pa.Schema | None = None,
+) -> int:
+    """Streams records to a parquet file. Returns the number of records written."""
+    with RowGroupWriter(output_file, row_group_size, schema=schema) as writer:
+        for batch in batched(records, row_group_size):
+            writer.write(batch)
+    return writer.num_records
+
+
+class ChannelAborted(Exception):
+    """Raised in a pipeline stage when another stage has failed."""
+
+
+class Channel(Generic[T]):
+    """Bounded queue handing items from one pipeline stage thread to the next.
+
+    `put` blocks while the channel is full, so a slow consumer applies
+    backpressure to its producer instead of letting items pile up in memory.
+    Iterating yields items until the producer calls `close`. After `abort`, both
+    sides raise `ChannelAborted` instead of blocking forever.
+
+    Time spent blocked is recorded: a producer blocked on a full channel waits
+    for a slower consumer, and a consumer blocked on an empty one waits for a
+    slower producer.
+    """
+
+    _CLOSED = object()
+    _POLL_INTERVAL = 0.1
+
+    def __init__(self, maxsize: int) -> None:
+        self.put_wait = 0.0
+        self.get_wait = 0.0
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize)
+        self._aborted = threading.Event()
+
+    def put(self, item: T) -> None:
+        self._put(item)
+
+    def close(self) -> None:
+        self._put(self._CLOSED)
+
+    def abort(self) -> None:
+        self._aborted.set()
+
+    def __iter__(self) -> Generator[T, None, None]:
+        while True:
+            start = time.perf_counter()
+            while True:
+                self._check_aborted()
+                try:
+                    item = self._queue.get(timeout=self._POLL_INTERVAL)
+                    break
+                except queue.Empty:
+                    pass
+            self.get_wait += time.perf_counter() - start
+            if item is self._CLOSED:
+                return
+            yield item
+
+    def _put(self, item: Any) -> None:
+        start = time.perf_counter()
+        while True:
+            self._check_aborted()
+            try:
+                self._queue.put(item, timeout=self._POLL_INTERVAL)
+                break
+            except queue.Full:
+                pass
+        self.put_wait += time.perf_counter() - start
+
+    def _check_aborted(self) -> None:
+        if self._aborted.is_set():
+            raise ChannelAborted()
+
+
+def run_stages(
+    stages: dict[str, Callable[[], None]], channels: Iterable[Channel]
+) -> None:
+    """Runs pipeline stages concurrently, one thread each, until all finish.
+
+    When a stage fails, every channel is aborted so that the other stages stop,
+    and the first error is raised.
+    """
+    channels = list(channels)
+    errors: list[BaseException] = []
+    lock = threading.Lock()
+
+    def run(stage: Callable[[], None]) -> None:
+        try:
+            stage()
+        except BaseException as e:  # noqa: BLE001 - re-raised by run_stages
+            with lock:
+                errors.append(e)
+            for channel in channels:
+                channel.abort()
+
+    threads = [
+        threading.Thread(target=run, args=(stage,), name=name, daemon=True)
+        for name, stage in stages.items()
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
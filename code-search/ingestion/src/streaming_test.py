@@ -0,0 +1,199 @@
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable, Generator
+from typing import Any
+
+import pyarrow.parquet as pq
+import pytest
+
+from file_collection import LINES_PER_POINT, upload_files
+from file_index import walk
+from streaming import Channel, ChannelAborted, batched, run_stages, write_parquet
+
+# Ceiling on the memory growth while ingesting inputs that are several times
+# larger, i.e. memory must not grow with the size of the input
+MEMORY_CEILING = 16 * 1024 * 1024
+
+# Writes synthetic chunks in a fresh process and prints its peak RSS in bytes,
+# which unlike tracemalloc includes pyarrow's native buffers
+WRITE_PARQUET_SCRIPT = """
+import resource
+import sys
+
+from streaming import write_parquet
+from streaming_test import synthetic_chunks
+
+num_chunks, output_file = int(sys.argv[1]), sys.argv[2]
+write_parquet(
+    synthetic_chunks(num_chunks), output_file=output_file, row_group_size=1_000
+)
+max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# Kilobytes on Linux, bytes on macOS
+print(max_rss if sys.platform == "darwin" else max_rss * 1024)
+"""
+
+NUM_FILES = 1_000
+NUM_LINES = 500
+
+
+class FakeQdrantClient:
+    """Counts uploaded payloads without keeping references to them."""
+
+    def __init__(self) -> None:
+        self.num_points = 0
+        self.num_uploads = 0
+
+    def upload_collection(self, payload: list[dict[str, Any]], **kwargs: Any) -> None:
+        self.num_points += len(payload)
+        self.num_uploads += 1
+
+
+def peak_memory(fn: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def write_parquet_peak_rss(num_chunks: int, output_file: str) -> int:
+    result = subprocess.run(
+        [sys.executable, "-c", WRITE_PARQUET_SCRIPT, str(num_chunks), output_file],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return int(result.stdout)
+
+
+@pytest.fixture
+def large_tree(tmp_path: Any) -> str:
+    line = "    let value = compute(value, 42); // keep the line reasonably long\n"
+    for i in range(NUM_FILES):
+        crate_dir = tmp_path / f"crate_{i % 20}" / "src"
+        crate_dir.mkdir(parents=True, exist_ok=True)
+        (crate_dir / f"module_{i}.rs").write_text(line * NUM_LINES)
+        (crate_dir / f"module_{i}.md").write_text("not rust")
+    return str(tmp_path)
+
+
+def synthetic_chunks(n: int) -> Generator[dict[str, Any], None, None]:
+    for i in range(n):
+        yield {
+            "file_path": f"crate/src/module_{i // 10}.rs",
+            "file_name": f"module_{i // 10}.rs",
+            "start_line": i % 10 * 20,
+            "end_line": i % 10 * 20 + 20,
+            "text": f"fn function_{i}() {{}}\n" * 40,
+            "size": 256,
+        }
+
+
+def test_batched() -> None:
+    assert list(batched(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(batched([], 3)) == []
+
+
+def test_run_stages() -> None:
+    channel: Channel[int] = Channel(maxsize=2)
+    received = []
+
+    def produce() -> None:
+        for i in range(10):
+            channel.put(i)
+            # The consumer can never fall more than the channel size behind
+            assert i - len(received) <= 3
+        channel.close()
+
+    def consume() -> None:
+        for item in channel:
+            time.sleep(0.001)
+            received.append(item)
+
+    run_stages({"produce": produce, "consume": consume}, channels=[channel])
+
+    assert received == list(range(10))
+    assert channel.put_wait > 0
+
+
+def test_run_stages_failure() -> None:
+    channel: Channel[int] = Channel(maxsize=1)
+
+    def produce() -> None:
+        # Blocks on the full channel until the consumer fails
+        for i in range(10):
+            channel.put(i)
+        channel.close()
+
+    def consume() -> None:
+        for _ in channel:
+            raise ValueError("consumer failed")
+
+    with pytest.raises(ValueError, match="consumer failed"):
+        run_stages({"produce": produce, "consume": consume}, channels=[channel])
+    with pytest.raises(ChannelAborted):
+        channel.put(0)
+
+
+def test_write_parquet(tmp_path: Any) -> None:
+    output_file = str(tmp_path / "chunks.parquet")
+
+    num_records = write_parquet(
+        synthetic_chunks(25), output_file=output_file, row_group_size=10
+    )
+
+    assert num_records == 25
+    parquet_file = pq.ParquetFile(output_file)
+    assert parquet_file.metadata.num_row_groups == 3
+    assert parquet_file.read().to_pylist() == list(synthetic_chunks(25))
+
+
+def test_write_parquet_empty(tmp_path: Any) -> None:
+    output_file = str(tmp_path / "chunks.parquet")
+
+    assert write_parquet(iter([]), output_file=output_file, row_group_size=10) == 0
+    assert pq.read_table(output_file).num_rows == 0
+
+
+def test_write_parquet_memory_ceiling(tmp_path: Any) -> None:
+    output_file = str(tmp_path / "chunks.parquet")
+    # The interpreter, its imports and the steady state of pyarrow's memory pool
+    # after a few row groups
+    baseline = write_parquet_peak_rss(10_000, output_file)
+
+    # About 100 MB of chunk text
+    num_chunks = 100_000
+    peak = write_parquet_peak_rss(num_chunks, output_file)
+
+    assert pq.ParquetFile(output_file).metadata.num_rows == num_chunks
+    assert peak - baseline < MEMORY_CEILING
+
+
+def test_upload_files_memory_ceiling(large_tree: str) -> None:
+    client = FakeQdrantClient()
+    total_size = sum(
+        os.path.getsize(os.path.join(root, file))
+        for root, _, files in os.walk(large_tree)
+        for file in files
+    )
+
+    peak = peak_memory(
+        lambda: upload_files(
+            client,
+            collection_name="qdrant-file",
+            payloads=walk(large_tree),
+            batch_size=32,
+        )
+    )
+
+    num_points = NUM_FILES * -(-NUM_LINES // LINES_PER_POINT)
+    assert client.num_points == num_points
+    assert client.num_uploads == -(-num_points // 32)
+    assert total_size > 2 * MEMORY_CEILING
+    assert peak < MEMORY_CEILING
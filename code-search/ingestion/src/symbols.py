@@ -0,0 +1,107 @@
+import os
+import re
+from typing import Any
+
+# Rust items a chunk can define, matched at the start of a line. The name group
+# is the symbol; for impl blocks it is the implementing type.
+_VISIBILITY = r"(?:pub(?:\([^)]*\))?\s+)?"
+_QUALIFIERS = r"(?:(?:const|async|unsafe|extern\s+\"[^\"]*\"|default)\s+)*"
+_IMPL = (
+    r"(?:unsafe\s+)?impl(?:\s*<[^{]*?>)?\s+"
+    r"(?:!?[\w:]+(?:<[^{]*?>)?\s+for\s+)?(?:&?[\w:]+::)?(?P<name>\w+)"
+)
+_ITEMS = [
+    ("function", rf"{_VISIBILITY}{_QUALIFIERS}fn\s+(?P<name>\w+)"),
+    ("struct", rf"{_VISIBILITY}struct\s+(?P<name>\w+)"),
+    ("enum", rf"{_VISIBILITY}enum\s+(?P<name>\w+)"),
+    ("union", rf"{_VISIBILITY}union\s+(?P<name>\w+)"),
+    ("trait", rf"{_VISIBILITY}(?:unsafe\s+)?(?:auto\s+)?trait\s+(?P<name>\w+)"),
+    ("impl", _IMPL),
+    ("module", rf"{_VISIBILITY}mod\s+(?P<name>\w+)"),
+    ("macro", r"macro_rules!\s*(?P<name>\w+)"),
+    ("type", rf"{_VISIBILITY}type\s+(?P<name>\w+)"),
+    ("const", rf"{_VISIBILITY}(?:const|static(?:\s+mut)?)\s+(?P<name>\w+)\s*:"),
+]
+_PATTERNS = {
+    kind: re.compile(rf"^[ \t]*{pattern}", re.MULTILINE) for kind, pattern in _ITEMS
+}
+# Crate roots and module files that do not add a segment to the module path
+_MODULE_FILES = {"lib.rs", "main.rs", "mod.rs"}
+
+
+def chunk_symbol(text: str) -> dict[str, Any]:
+    """Symbol metadata of the first item a chunk defines.
+
+    `code_type` is the kind of item, `name` its name and `signature` its
+    declaration up to the body. `struct_name` is the type of the impl block
+    enclosing a method, when the chunk includes its header. All fields are None
+    if the chunk defines no item, e.g. when it starts in the middle of a body.
+    """
+    first = None
+    for kind, pattern in _PATTERNS.items():
+        match = pattern.search(text)
+        if match is not None and (first is None or match.start() < first[1].start()):
+            first = (kind, match)
+    if first is None:
+        return {"name": None, "signature": None, "code_type": None, "struct_name": None}
+
+    kind, match = first
+    struct_name = None
+    if kind == "impl":
+        struct_name = match.group("name")
+    elif kind == "function":
+        # The innermost impl block opened before the method
+        impls = list(_PATTERNS["impl"].finditer(text, 0, match.start()))
+        if impls:
+            struct_name = impls[-1].group("name")
+    return {
+        "name": match.group("name"),
+        "signature": signature(text, match.start()),
+        "code_type": kind,
+        "struct_name": struct_name,
+    }
+
+
+def signature(text: str, start: int) -> str:
+    """Declaration starting at `start`, up to its body or terminating semicolon."""
+    end = len(text)
+    for delimiter in ("{", ";"):
+        position = text.find(delimiter, start)
+        if position != -1:
+            end = min(end, position)
+    return " ".join(text[start:end].split())
+
+
+def module_path(file_path: str) -> str:
+    """Rust module path of a file, prefixed by the name of its crate.
+
+    `lib/collection/src/operations/types.rs` is `collection::operations::types`.
+    Files outside a `src` directory are named by their full path.
+    """
+    parts = file_path.split("/")
+    if "src" in parts[:-1]:
+        src = len(parts) - 1 - parts[::-1].index("src")
+        crate = parts[src - 1] if src > 0 else None
+        parts = ([crate] if crate else []) + parts[src + 1 :]
+    if parts[-1] in _MODULE_FILES:
+        parts = parts[:-1]
+    else:
+        parts[-1] = os.path.splitext(parts[-1])[0]
+    return "::".join(parts)
+
+
+def path_prefixes(file_path: str) -> list[str]:
+    """Directories containing a file, so that a keyword index matches path prefixes.
+
+    `a/b/c.rs` has the prefixes `a` and `a/b`.
+    """
+    parts = file_path.split("/")[:-1]
+    return ["/".join(parts[: i + 1]) for i in range(len(parts))]
+
+
+def symbol_payload(file_path: str, text: str) -> dict[str, Any]:
+    return {
+        **chunk_symbol(text),
+        "module": module_path(file_path),
+        "path_prefixes": path_prefixes(file_path),
+    }
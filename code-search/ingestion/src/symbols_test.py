@@ -0,0 +1,70 @@
+from symbols import chunk_symbol, module_path, path_prefixes
+
+IMPL = """use std::fmt;
+
+/// Formats a point.
+impl<T: fmt::Debug> fmt::Display for Point<T> {
+    pub(crate) fn fmt(&self, f: &mut fmt::Formatter) -> fmt::Result {
+        write!(f, "({:?}, {:?})", self.x, self.y)
+    }
+}
+"""
+
+
+def test_chunk_symbol_of_impl() -> None:
+    assert chunk_symbol(IMPL) == {
+        "name": "Point",
+        "signature": "impl<T: fmt::Debug> fmt::Display for Point<T>",
+        "code_type": "impl",
+        "struct_name": "Point",
+    }
+
+
+def test_chunk_symbol_of_method_in_impl() -> None:
+    text = "impl Segment {\n    pub async fn flush(&self) -> Result<()> {\n"
+
+    assert chunk_symbol(text[text.index("    pub") :])["struct_name"] is None
+    assert chunk_symbol("#[derive(Debug)]\n" + text)["code_type"] == "impl"
+
+
+def test_chunk_symbol_of_items() -> None:
+    cases = {
+        "pub struct Segment<'a> {\n    id: u64,\n}": ("struct", "Segment"),
+        "pub(crate) enum Kind { A, B }": ("enum", "Kind"),
+        "pub unsafe trait Storage: Send {}": ("trait", "Storage"),
+        "mod tests {": ("module", "tests"),
+        "macro_rules! check {": ("macro", "check"),
+        "pub type Result<T> = std::result::Result<T, Error>;": ("type", "Result"),
+        "static mut COUNTER: usize = 0;": ("const", "COUNTER"),
+        "    }\n}\n\nconst fn max(a: u64, b: u64) -> u64 {": ("function", "max"),
+    }
+    for text, (code_type, name) in cases.items():
+        symbol = chunk_symbol(text)
+        assert (symbol["code_type"], symbol["name"]) == (code_type, name), text
+
+
+def test_chunk_symbol_without_item() -> None:
+    assert chunk_symbol("        x + 1\n    }\n}") == {
+        "name": None,
+        "signature": None,
+        "code_type": None,
+        "struct_name": None,
+    }
+
+
+def test_module_path() -> None:
+    assert module_path("lib/collection/src/operations/types.rs") == (
+        "collection::operations::types"
+    )
+    assert module_path("lib/segment/src/lib.rs") == "segment"
+    assert module_path("lib/segment/src/index/mod.rs") == "segment::index"
+    assert module_path("benches/search.rs") == "benches::search"
+
+
+def test_path_prefixes() -> None:
+    assert path_prefixes("lib/segment/src/lib.rs") == [
+        "lib",
+        "lib/segment",
+        "lib/segment/src",
+    ]
+    assert path_prefixes("build.rs") == []
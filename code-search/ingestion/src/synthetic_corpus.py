@@ -0,0 +1,109 @@
+import collections
+import os
+import random
+
+_TYPES = ["u32", "u64", "i64", "f64", "String", "Vec<u8>", "Option<usize>"]
+_WORDS = [
+    "buffer",
+    "cursor",
+    "index",
+    "offset",
+    "payload",
+    "segment",
+    "shard",
+    "snapshot",
+    "token",
+    "vector",
+]
+
+
+def _name(rng: random.Random, *parts: str) -> str:
+    return "_".join([*parts, rng.choice(_WORDS), str(rng.randrange(1000))])
+
+
+def _struct(rng: random.Random, name: str) -> list[str]:
+    fields = [
+        f"    pub {_name(rng)}: {rng.choice(_TYPES)}," for _ in range(rng.randint(2, 6))
+    ]
+    return [
+        "#[derive(Debug, Clone)]",
+        f"pub struct {name} {{",
+        *fields,
+        "}",
+        "",
+    ]
+
+
+def _method(rng: random.Random) -> list[str]:
+    var = _name(rng, "value")
+    body = []
+    for _ in range(rng.randint(2, 8)):
+        kind = rng.randrange(3)
+        if kind == 0:
+            body += [
+                f"        for i in 0..{rng.randint(2, 64)} {{",
+                f"            {var} = {var}.wrapping_mul(31).wrapping_add(i);",
+                "        }",
+            ]
+        elif kind == 1:
+            body += [
+                f"        match {var} % {rng.randint(2, 5)} {{",
+                f"            0 => {var} += {rng.randrange(100)},",
+                f"            _ => {var} ^= {rng.randrange(100)},",
+                "        }",
+            ]
+        else:
+            body.append(f"        {var} = {var}.rotate_left({rng.randint(1, 31)});")
+    return [
+        f"    /// Computes the {rng.choice(_WORDS)} of this value.",
+        f"    pub fn {_name(rng, 'compute')}(&self, seed: u64) -> u64 {{",
+        f"        let mut {var} = seed;",
+        *body,
+        f"        {var}",
+        "    }",
+        "",
+    ]
+
+
+def rust_file(rng: random.Random, num_lines: int) -> str:
+    """Plausible Rust source of about `num_lines` lines."""
+    lines = ["use std::collections::HashMap;", "use std::fmt;", ""]
+    while len(lines) < num_lines:
+        name = _name(rng, "Type").title().replace("_", "")
+        lines += _struct(rng, name)
+        lines.append(f"impl {name} {{")
+        for _ in range(rng.randint(1, 4)):
+            lines += _method(rng)
+        lines += ["}", ""]
+    return "\n".join(lines)
+
+
+def write_corpus(
+    dir: str,
+    num_files: int,
+    lines_per_file: int,
+    duplicate_ratio: float = 0.0,
+    seed: int = 0,
+) -> int:
+    """Writes a deterministic synthetic Rust codebase to `dir`.
+
+    Files are spread over crates of 50 files each. A `duplicate_ratio` fraction
+    of them are copies of earlier files, like vendored crates. Returns the total
+    size of the corpus in bytes.
+    """
+    rng = random.Random(seed)
+    # Duplicates are drawn from recent files to bound memory on large corpora
+    written: collections.deque[str] = collections.deque(maxlen=100)
+    total_size = 0
+    for i in range(num_files):
+        if written and rng.random() < duplicate_ratio:
+            code = rng.choice(written)
+        else:
+            code = rust_file(rng, lines_per_file)
+            written.append(code)
+        crate_dir = os.path.join(dir, f"crate_{i // 50}", "src")
+        os.makedirs(crate_dir, exist_ok=True)
+        with open(os.path.join(crate_dir, f"module_{i}.rs"), "w") as f:
+            f.write(code)
+        total_size += len(code)
+    return total_size
@@ -0,0 +1,32 @@
+import os
+from typing import Any
+
+from source_file import find_files
+from synthetic_corpus import write_corpus
+
+
+def read_corpus(dir: str) -> dict[str, str]:
+    corpus = {}
+    for path in find_files(dir):
+        with open(path) as f:
+            corpus[os.path.relpath(path, dir)] = f.read()
+    return corpus
+
+
+def test_write_corpus(tmp_path: Any) -> None:
+    size = write_corpus(str(tmp_path / "a"), num_files=120, lines_per_file=50)
+    write_corpus(str(tmp_path / "b"), num_files=120, lines_per_file=50)
+
+    corpus = read_corpus(str(tmp_path / "a"))
+    assert len(corpus) == 120
+    assert size == sum(len(code) for code in corpus.values())
+    assert corpus == read_corpus(str(tmp_path / "b"))
+    assert len(set(corpus.values())) == 120
+    assert all(code.count("\n") >= 49 for code in corpus.values())
+
+
+def test_write_corpus_duplicates(tmp_path: Any) -> None:
+    write_corpus(str(tmp_path), num_files=200, lines_per_file=20, duplicate_ratio=0.5)
+
+    corpus = read_corpus(str(tmp_path))
+    assert 50 < len(set(corpus.values())) < 150
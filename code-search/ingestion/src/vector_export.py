@@ -0,0 +1,102 @@
+import logging
+import os
+import time
+
+from absl import app, flags
+from qdrant_client import QdrantClient
+
+from manifest import load_changes
+from vector_store import (
+    current_version,
+    export_collection,
+    load_version_manifest,
+    new_version,
+    publish,
+    update_export,
+)
+
+FLAGS = flags.FLAGS
+logger = logging.getLogger(__name__)
+
+flags.DEFINE_string(
+    "qdrant_host",
+    default="http://localhost:6333",
+    help="Qdrant host to connect to",
+)
+flags.DEFINE_string(
+    "code_collection",
+    default="qdrant-code",
+    help="Qdrant alias for code snippets to export",
+)
+flags.DEFINE_string(
+    "output_dir",
+    default="/data/vector_index",
+    help="Output directory of the vector index searched in process by the backend",
+)
+flags.DEFINE_string(
+    "changes_file",
+    default=None,
+    help="Changes file of the ingestion run. Unless it describes a full run, "
+    "only the chunks of files changed since the last export are read from Qdrant",
+)
+flags.DEFINE_integer(
+    "keep_exports",
+    default=1,
+    help="Number of previous exports kept for backends still loading them",
+)
+flags.DEFINE_integer(
+    "batch_size",
+    default=1_000,
+    help="Number of points scrolled from Qdrant at a time",
+)
+
+
+def main(argv):
+    del argv  # Unused.
+
+    client = QdrantClient(FLAGS.qdrant_host)
+    os.makedirs(FLAGS.output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    version_dir = new_version(FLAGS.output_dir)
+    tmp_dir = f"{version_dir}.tmp"
+    os.makedirs(tmp_dir)
+    changes = load_changes(FLAGS.changes_file) if FLAGS.changes_file else None
+    previous_dir = current_version(FLAGS.output_dir)
+    if (
+        changes is not None
+        and not changes.full
+        and previous_dir is not None
+        and load_version_manifest(previous_dir) is not None
+    ):
+        update = update_export(
+            client,
+            FLAGS.code_collection,
+            previous_dir,
+            tmp_dir,
+            manifest=changes.manifest,
+            batch_size=FLAGS.batch_size,
+        )
+        logger.info(
+            f"Updated the vector export for {len(update.added)} added, "
+            f"{len(update.changed)} changed and {len(update.removed)} removed files"
+        )
+    else:
+        export_collection(
+            client,
+            FLAGS.code_collection,
+            tmp_dir,
+            batch_size=FLAGS.batch_size,
+            manifest=changes.manifest if changes is not None else None,
+        )
+    os.rename(tmp_dir, version_dir)
+    publish(FLAGS.output_dir, version_dir, keep_versions=FLAGS.keep_exports)
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Exported vector index version {os.path.basename(version_dir)} of "
+        f"collection {FLAGS.code_collection} to {FLAGS.output_dir} in {elapsed:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,256 @@
+import gzip
+import json
+import os
+import re
+import shutil
+import time
+from collections.abc import Iterable
+from typing import Any
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import FieldCondition, Filter, MatchAny
+
+from manifest import Changes, diff_manifests
+from streaming import batched
+
+PAYLOAD_FIELDS = [
+    "file_path",
+    "file_name",
+    "start_line",
+    "end_line",
+    "text",
+    "name",
+    "signature",
+    "code_type",
+    "struct_name",
+    "module",
+]
+# Symlink to the version the backend loads, swapped atomically by `publish`
+CURRENT = "current"
+EMBEDDINGS_FILE = "embeddings.npy"
+PAYLOADS_FILE = "payloads.json.gz"
+# Files the version was exported from, to update it incrementally
+MANIFEST_FILE = "manifest.json"
+VERSION_PATTERN = re.compile(r"v(\d+)")
+
+
+def new_version(output_dir: str) -> str:
+    """Directory of a new export version in `output_dir`.
+
+    Exports are written to the directory with a `.tmp` suffix and renamed once
+    complete, so that a failed export is never mistaken for a version.
+    """
+    return os.path.join(output_dir, f"v{time.time_ns()}")
+
+
+def list_versions(output_dir: str) -> list[str]:
+    """Directories of the export versions from oldest to newest."""
+    if not os.path.isdir(output_dir):
+        return []
+    versions = [
+        (int(match.group(1)), name)
+        for name in os.listdir(output_dir)
+        if (match := VERSION_PATTERN.fullmatch(name))
+    ]
+    return [os.path.join(output_dir, name) for _, name in sorted(versions)]
+
+
+def current_version(output_dir: str) -> str | None:
+    """Directory of the published version, or None if there is none."""
+    current = os.path.join(output_dir, CURRENT)
+    if not os.path.islink(current):
+        return None
+    return os.path.realpath(current)
+
+
+def publish(output_dir: str, version_dir: str, keep_versions: int) -> None:
+    """Points the backend at `version_dir`, keeping `keep_versions` previous ones.
+
+    The symlink is replaced atomically, so the backend sees either the
+    previous version or the new one, never a mix of their files. A previous
+    version is kept by default, so that a backend loading it when the symlink
+    moves can finish.
+    """
+    tmp_link = os.path.join(output_dir, f"{CURRENT}.tmp")
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    # Relative, so that the export can be mounted anywhere
+    os.symlink(os.path.basename(version_dir), tmp_link)
+    os.replace(tmp_link, os.path.join(output_dir, CURRENT))
+
+    version_dir = os.path.realpath(version_dir)
+    previous = [
+        path
+        for path in list_versions(output_dir)
+        if os.path.realpath(path) != version_dir
+    ]
+    for path in previous[: max(0, len(previous) - keep_versions)]:
+        shutil.rmtree(path)
+    # Left behind by failed exports
+    for name in os.listdir(output_dir):
+        if name.endswith(".tmp") and VERSION_PATTERN.fullmatch(name[: -len(".tmp")]):
+            shutil.rmtree(os.path.join(output_dir, name))
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    # Normalized, so that the backend ranks them by dot product
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def scroll_points(
+    client: QdrantClient,
+    collection_name: str,
+    batch_size: int,
+    file_paths: list[str] | None = None,
+) -> Iterable[tuple[np.ndarray, list[dict[str, Any]]]]:
+    """Normalized vectors and payloads of the chunks in the collection, a batch
+    at a time, or only of the chunks of `file_paths`."""
+    filters = [None]
+    if file_paths is not None:
+        filters = [
+            Filter(must=[FieldCondition(key="file_path", match=MatchAny(any=batch))])
+            for batch in batched(file_paths, 1_000)
+        ]
+    for scroll_filter in filters:
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name=collection_name,
+                scroll_filter=scroll_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=PAYLOAD_FIELDS,
+                with_vectors=True,
+            )
+            if points:
+                vectors = np.asarray([point.vector for point in points], np.float32)
+                yield normalize(vectors), [point.payload for point in points]
+            if offset is None:
+                break
+
+
+def append_payloads(
+    columns: dict[str, list[Any]], payloads: Iterable[dict[str, Any]]
+) -> None:
+    for payload in payloads:
+        for field in PAYLOAD_FIELDS:
+            # Chunks indexed before symbol metadata existed lack it
+            columns[field].append(payload.get(field))
+
+
+def save_payloads(
+    version_dir: str,
+    payloads: dict[str, list[Any]],
+    manifest: dict[str, str] | None,
+) -> None:
+    with gzip.open(
+        os.path.join(version_dir, PAYLOADS_FILE), "wt", encoding="utf-8"
+    ) as f:
+        json.dump(payloads, f, separators=(",", ":"))
+    with open(os.path.join(version_dir, MANIFEST_FILE), mode="w") as f:
+        json.dump(manifest, f)
+
+
+def load_version(version_dir: str) -> tuple[np.ndarray, dict[str, list[Any]]]:
+    embeddings = np.load(os.path.join(version_dir, EMBEDDINGS_FILE), mmap_mode="r")
+    with gzip.open(
+        os.path.join(version_dir, PAYLOADS_FILE), "rt", encoding="utf-8"
+    ) as f:
+        return embeddings, json.load(f)
+
+
+def load_version_manifest(version_dir: str) -> dict[str, str] | None:
+    path = os.path.join(version_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def export_collection(
+    client: QdrantClient,
+    collection_name: str,
+    version_dir: str,
+    batch_size: int,
+    manifest: dict[str, str] | None = None,
+) -> int:
+    """Exports every chunk of the collection and returns how many there were."""
+    num_points = client.count(collection_name, exact=True).count
+    dim = client.get_collection(collection_name).config.params.vectors.size
+
+    # Written straight to disk so that the collection never has to fit in memory
+    embeddings = np.lib.format.open_memmap(
+        os.path.join(version_dir, EMBEDDINGS_FILE),
+        mode="w+",
+        dtype=np.float32,
+        shape=(num_points, dim),
+    )
+    payloads: dict[str, list[Any]] = {field: [] for field in PAYLOAD_FIELDS}
+    row = 0
+    for vectors, batch in scroll_points(client, collection_name, batch_size):
+        if row + len(vectors) > num_points:
+            break
+        embeddings[row : row + len(vectors)] = vectors
+        append_payloads(payloads, batch)
+        row += len(vectors)
+    if row != num_points:
+        raise RuntimeError(f"Collection {collection_name} changed during the export")
+    embeddings.flush()
+    del embeddings
+
+    save_payloads(version_dir, payloads, manifest)
+    return num_points
+
+
+def update_export(
+    client: QdrantClient,
+    collection_name: str,
+    previous_dir: str,
+    version_dir: str,
+    manifest: dict[str, str],
+    batch_size: int,
+) -> Changes:
+    """Exports the chunks of `previous_dir` updated to `manifest` as a new version.
+
+    The chunks of unchanged files are copied from the previous version, and
+    only those of added and changed files are read from the collection. Files
+    are diffed against the manifest of the previous version rather than a
+    single run's changes, so that a version skipped by a failed run catches up.
+    """
+    changes = diff_manifests(load_version_manifest(previous_dir), manifest)
+    touched = set(changes.stale) | set(changes.updated)
+    previous_embeddings, previous_payloads = load_version(previous_dir)
+    keep = np.asarray(
+        [path not in touched for path in previous_payloads["file_path"]], dtype=bool
+    )
+
+    # Only the chunks of updated files are held in memory
+    new_vectors = []
+    payloads = {
+        field: [value for value, kept in zip(values, keep) if kept]
+        for field, values in previous_payloads.items()
+    }
+    for vectors, batch in scroll_points(
+        client, collection_name, batch_size, file_paths=changes.updated
+    ):
+        new_vectors.append(vectors)
+        append_payloads(payloads, batch)
+
+    num_kept = int(keep.sum())
+    num_new = sum(len(vectors) for vectors in new_vectors)
+    embeddings = np.lib.format.open_memmap(
+        os.path.join(version_dir, EMBEDDINGS_FILE),
+        mode="w+",
+        dtype=np.float32,
+        shape=(num_kept + num_new, previous_embeddings.shape[1]),
+    )
+    embeddings[:num_kept] = previous_embeddings[keep]
+    if new_vectors:
+        embeddings[num_kept:] = np.concatenate(new_vectors)
+    embeddings.flush()
+    del embeddings
+
+    save_payloads(version_dir, payloads, manifest)
+    return changes
@@ -0,0 +1,132 @@
+import os
+from typing import Any
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+
+from code_collection import (
+    CodeCollectionConfig,
+    chunk_id,
+    create_code_collection,
+    delete_chunks,
+)
+from vector_store import (
+    current_version,
+    export_collection,
+    list_versions,
+    load_version,
+    new_version,
+    publish,
+    update_export,
+)
+
+COLLECTION = "qdrant-code"
+
+
+def upsert_chunks(client: QdrantClient, file_path: str, texts: list[str]) -> None:
+    client.upsert(
+        COLLECTION,
+        points=[
+            PointStruct(
+                id=chunk_id(file_path, line, line),
+                vector=[float(line), float(len(text)), 1.0, 0.0],
+                payload={
+                    "file_path": file_path,
+                    "file_name": file_path.rsplit("/", 1)[-1],
+                    "start_line": line,
+                    "end_line": line,
+                    "text": text,
+                },
+            )
+            for line, text in enumerate(texts, start=1)
+        ],
+    )
+
+
+def create_collection() -> QdrantClient:
+    client = QdrantClient(":memory:")
+    create_code_collection(
+        client, COLLECTION, config=CodeCollectionConfig(embedding_dim=4)
+    )
+    upsert_chunks(client, "src/map.rs", ["let map = HashMap::new();", "map.len()"])
+    upsert_chunks(client, "src/vec.rs", ["let v = Vec::with_capacity(16);"])
+    upsert_chunks(client, "src/set.rs", ["let set = HashSet::new();"])
+    return client
+
+
+def export(client: QdrantClient, output_dir: str, **kwargs: Any) -> str:
+    version_dir = new_version(output_dir)
+    os.makedirs(version_dir)
+    export_collection(client, COLLECTION, version_dir, batch_size=2, **kwargs)
+    return version_dir
+
+
+def chunks(version_dir: str) -> dict[tuple[str, int], tuple[str, list[float]]]:
+    """Text and embedding of the chunks by file path and start line."""
+    embeddings, payloads = load_version(version_dir)
+    return {
+        (file_path, start_line): (text, embedding.round(6).tolist())
+        for file_path, start_line, text, embedding in zip(
+            payloads["file_path"], payloads["start_line"], payloads["text"], embeddings
+        )
+    }
+
+
+def test_export_collection(tmp_path: Any) -> None:
+    version_dir = export(create_collection(), str(tmp_path))
+
+    embeddings, payloads = load_version(version_dir)
+    assert embeddings.shape == (4, 4)
+    np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1.0, rtol=1e-6)
+    assert sorted(payloads["file_path"]) == [
+        "src/map.rs",
+        "src/map.rs",
+        "src/set.rs",
+        "src/vec.rs",
+    ]
+    assert payloads["name"] == [None] * 4
+
+
+def test_update_export_replaces_chunks_of_changed_files(tmp_path: Any) -> None:
+    client = create_collection()
+    manifest = {"src/map.rs": "1", "src/vec.rs": "1", "src/set.rs": "1"}
+    previous_dir = export(client, str(tmp_path), manifest=manifest)
+
+    # vec.rs is removed, set.rs changed and lib.rs added
+    delete_chunks(client, COLLECTION, ["src/vec.rs", "src/set.rs"])
+    upsert_chunks(client, "src/set.rs", ["let set = BTreeSet::new();"])
+    upsert_chunks(client, "src/lib.rs", ["pub mod map;", "pub mod set;"])
+    manifest = {"src/map.rs": "1", "src/set.rs": "2", "src/lib.rs": "1"}
+    version_dir = new_version(str(tmp_path))
+    os.makedirs(version_dir)
+    changes = update_export(
+        client, COLLECTION, previous_dir, version_dir, manifest, batch_size=2
+    )
+
+    assert (changes.added, changes.changed, changes.removed) == (
+        ["src/lib.rs"],
+        ["src/set.rs"],
+        ["src/vec.rs"],
+    )
+    assert chunks(version_dir) == chunks(export(client, str(tmp_path)))
+
+
+def test_publish_swaps_the_current_version(tmp_path: Any) -> None:
+    client = create_collection()
+    output_dir = str(tmp_path)
+    first, second, third = (export(client, output_dir) for _ in range(3))
+    # Left behind by a failed export
+    os.makedirs(f"{new_version(output_dir)}.tmp")
+
+    publish(output_dir, second, keep_versions=1)
+    assert current_version(output_dir) == os.path.realpath(second)
+    assert os.readlink(os.path.join(output_dir, "current")) == os.path.basename(second)
+    publish(output_dir, third, keep_versions=1)
+
+    assert current_version(output_dir) == os.path.realpath(third)
+    assert list_versions(output_dir) == [second, third]
+    assert sorted(os.listdir(output_dir)) == sorted(
+        ["current", os.path.basename(second), os.path.basename(third)]
+    )
+    assert not os.path.exists(first)